@@ -0,0 +1,172 @@
+from typing import Any, Dict, Optional, Tuple
+from fastapi import Request
+from .repositories.user import UserRepository
+from .repositories.wallet import WalletRepository
+from .repositories.transaction import TransactionRepository
+from .repositories.paymentlink import PaymentLinkRepository
+from .repositories.indexadvisor import run_index_advisor
+from .services.user import UserService
+from .services.wallet import WalletService
+from .services.transaction import TransactionService
+from .services.paymentlink import PaymentLinkService
+from .services.swap import JupiterSwap
+from .services.sweeper import PaymentLinkSweeper
+from .services.confirmations import ConfirmationTracker
+from .services.subscriptions import SubscriptionManager
+from .services.deposits import DepositWatcher
+from .services.webhooks import WebhookDeliveryEngine
+from .services.rpc import SolanaRPCGateway, init_rpc_gateway, close_rpc_gateway
+from .services.jupiter import JupiterClient, init_jupiter_client, close_jupiter_client
+from .services.balancecache import BalanceCache, get_balance_cache
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _claim_background_role() -> Tuple[bool, Optional[int]]:
+    """
+    Decides whether this process runs the background workers, from BACKGROUND_WORKERS_ENABLED:
+    "true" or "false" force it, "auto" (the default) gives it to the first process on the host
+    to lock BACKGROUND_WORKERS_LOCK, so extra uvicorn workers stay off. Returns the decision
+    and the lock's file descriptor, which must stay open for as long as the role is held.
+    With several hosts, set it to false on all but one replica.
+    """
+    mode = os.getenv("BACKGROUND_WORKERS_ENABLED", "auto").lower()
+    if mode != "auto":
+        return mode == "true", None
+    if fcntl is None:
+        return True, None
+    path = os.getenv("BACKGROUND_WORKERS_LOCK", "/tmp/obverse-background-workers.lock")
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False, None
+    return True, fd
+
+
+class ServiceContainer:
+    """
+    Owns the process-wide repositories, services and network clients.
+    Built once in the application lifespan and shared by the API routes and bot handlers.
+    Deployment-wide background work (sweeping, confirmation polling, deposit watching,
+    webhook delivery) only runs in the process holding the background role.
+    """
+    def __init__(self):
+        self.background_workers = False
+        self._background_lock: Optional[int] = None
+        self.rpc_gateway: Optional[SolanaRPCGateway] = None
+        self.jupiter_client: Optional[JupiterClient] = None
+        self.balance_cache: Optional[BalanceCache] = None
+
+        self.user_repository = UserRepository()
+        self.wallet_repository = WalletRepository()
+        self.transaction_repository = TransactionRepository()
+        self.payment_link_repository = PaymentLinkRepository()
+
+        self.user_service: Optional[UserService] = None
+        self.wallet_service: Optional[WalletService] = None
+        self.transaction_service: Optional[TransactionService] = None
+        self.payment_link_service: Optional[PaymentLinkService] = None
+        self.swap: Optional[JupiterSwap] = None
+        self.payment_link_sweeper: Optional[PaymentLinkSweeper] = None
+        self.subscriptions: Optional[SubscriptionManager] = None
+        self.confirmation_tracker: Optional[ConfirmationTracker] = None
+        self.deposit_watcher: Optional[DepositWatcher] = None
+        self.webhook_engine: Optional[WebhookDeliveryEngine] = None
+
+    async def start(self) -> None:
+        """Open network clients, wire services and start background tasks."""
+        if os.getenv("INDEX_ADVISOR_ENABLED", "false").lower() == "true":
+            await run_index_advisor([
+                self.user_repository,
+                self.wallet_repository,
+                self.transaction_repository,
+                self.payment_link_repository,
+            ])
+
+        self.rpc_gateway = await init_rpc_gateway()
+        self.jupiter_client = await init_jupiter_client()
+        self.balance_cache = get_balance_cache()
+
+        self.user_service = UserService(self.user_repository)
+        self.wallet_service = WalletService(self.wallet_repository, self.rpc_gateway, self.balance_cache)
+        self.transaction_service = TransactionService(self.transaction_repository, self.balance_cache)
+        self.payment_link_service = PaymentLinkService(self.payment_link_repository, broker=self.balance_cache.broker)
+        self.swap = JupiterSwap(self.rpc_gateway, self.jupiter_client)
+
+        # Every process pushes confirmations for the swaps it submits itself
+        self.subscriptions = SubscriptionManager()
+        self.subscriptions.start()
+        self.background_workers, self._background_lock = _claim_background_role()
+        self.confirmation_tracker = ConfirmationTracker(
+            self.transaction_service, self.rpc_gateway, self.subscriptions,
+            watched_only=not self.background_workers
+        )
+        self.confirmation_tracker.start()
+        if not self.background_workers:
+            logger.info("Background workers are disabled in this process")
+            logger.info("Service container started")
+            return
+
+        self.payment_link_sweeper = PaymentLinkSweeper(self.payment_link_service)
+        self.payment_link_sweeper.start()
+        if os.getenv("DEPOSIT_WATCHER_ENABLED", "true").lower() == "true":
+            self.deposit_watcher = DepositWatcher(self.wallet_service, self.transaction_service, self.rpc_gateway)
+            self.deposit_watcher.start()
+        if os.getenv("WEBHOOK_SIGNING_SECRET"):
+            self.webhook_engine = WebhookDeliveryEngine(self.payment_link_service)
+            self.webhook_engine.start()
+        else:
+            logger.warning("WEBHOOK_SIGNING_SECRET is not set; payment link webhooks will not be delivered")
+        logger.info("Service container started")
+
+    async def close(self) -> None:
+        """Stop background tasks and close network clients."""
+        if self.payment_link_sweeper is not None:
+            await self.payment_link_sweeper.stop()
+        if self.confirmation_tracker is not None:
+            await self.confirmation_tracker.stop()
+        if self.deposit_watcher is not None:
+            await self.deposit_watcher.stop()
+        if self.webhook_engine is not None:
+            await self.webhook_engine.stop()
+        if self.subscriptions is not None:
+            await self.subscriptions.stop()
+        await close_jupiter_client()
+        await close_rpc_gateway()
+        if self._background_lock is not None:
+            os.close(self._background_lock)
+            self._background_lock = None
+        logger.info("Service container closed")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters from the caches and clients this process owns."""
+        metrics: Dict[str, Any] = {"background_workers": self.background_workers}
+        if self.jupiter_client is not None:
+            metrics["jupiter_quotes"] = self.jupiter_client.quote_cache.stats()
+        if self.balance_cache is not None:
+            metrics["balance_cache"] = self.balance_cache.stats()
+        if self.subscriptions is not None:
+            metrics["subscriptions"] = self.subscriptions.metrics()
+        if self.confirmation_tracker is not None:
+            metrics["confirmations"] = self.confirmation_tracker.last_run
+        if self.deposit_watcher is not None:
+            metrics["deposits"] = self.deposit_watcher.metrics()
+        if self.webhook_engine is not None:
+            metrics["webhooks"] = self.webhook_engine.metrics()
+        return metrics
+
+
+def get_container(request: Request) -> ServiceContainer:
+    """
+    FastAPI dependency returning the container built in the lifespan
+    """
+    return request.app.state.container
@@ -4,14 +4,26 @@ from .models.wallet import Wallet
 from .models.paymentlink import PaymentLink
 from .models.transaction import Transaction
 from .models.user import User
+from .migrations import run_migrations
 from dotenv import load_dotenv
 import os
+from typing import Optional
 
 load_dotenv()
 
+# Motor client shared by Beanie and code that needs raw collections
+client: Optional[AsyncIOMotorClient] = None
+
 async def init_db():
+    global client
     MONGO_URL= os.getenv("MONGO_URL")
     client =AsyncIOMotorClient(MONGO_URL)
     await init_beanie(database=client.get_default_database(),document_models=[Wallet,PaymentLink,Transaction,User])
+    # Indexes removed from the models are dropped here, one by one, never by init_beanie
+    await run_migrations(client.get_default_database())
 
-
+def get_database():
+    """Return the default Motor database; init_db must have run."""
+    if client is None:
+        raise RuntimeError("Database not initialised")
+    return client.get_default_database()
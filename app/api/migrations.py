@@ -0,0 +1,84 @@
+from typing import Any, Awaitable, Callable, List, Tuple
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Applied migrations are recorded here by name, so each runs once per database
+MIGRATIONS_COLLECTION = "migrations"
+BATCH_SIZE = 1000
+# A claim that hasn't completed after this long belongs to a process that died mid-migration
+CLAIM_LEASE = timedelta(minutes=30)
+
+Migration = Callable[[Any], Awaitable[None]]
+
+
+async def backfill_wallet_refs(database: Any) -> None:
+    """
+    Builds User.wallet_refs from the wallets collection for users linked before the field existed
+    """
+    batch: List[UpdateOne] = []
+    cursor = database["wallets"].find({}, {"user_id": 1, "chain": 1, "address": 1}).sort("created_at", 1)
+    async for wallet in cursor:
+        batch.append(UpdateOne(
+            {"_id": wallet["user_id"], "wallet_refs.wallet_id": {"$ne": wallet["_id"]}},
+            {"$push": {"wallet_refs": {"wallet_id": wallet["_id"], "chain": wallet["chain"], "address": wallet["address"]}}}
+        ))
+        if len(batch) >= BATCH_SIZE:
+            await database["users"].bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await database["users"].bulk_write(batch, ordered=False)
+
+
+async def drop_payment_link_expiry_ttl(database: Any) -> None:
+    """
+    Drops the old TTL index on payment_links.expires_at, which deleted links before the
+    sweeper could mark them expired; retention now runs off expired_at
+    """
+    indexes = await database["payment_links"].index_information()
+    for name, index in indexes.items():
+        if [field for field, _ in index["key"]] == ["expires_at"] and "expireAfterSeconds" in index:
+            await database["payment_links"].drop_index(name)
+            logger.info(f"Dropped TTL index {name} on payment_links.expires_at")
+
+
+# Append only: names are the record of what has been applied
+MIGRATIONS: List[Tuple[str, Migration]] = [
+    ("backfill_wallet_refs", backfill_wallet_refs),
+    ("drop_payment_link_expiry_ttl", drop_payment_link_expiry_ttl),
+]
+
+
+async def run_migrations(database: Any, migrations: List[Tuple[str, Migration]] = MIGRATIONS) -> List[str]:
+    """
+    Applies every migration not yet recorded in the database, in order; returns the names applied.
+    A migration is claimed by inserting its record first, so replicas starting together run it once.
+    A failed migration releases its claim and is retried on the next startup; migrations must be
+    idempotent, since one whose process died is taken over once its claim is CLAIM_LEASE old.
+    """
+    applied = []
+    collection = database[MIGRATIONS_COLLECTION]
+    for name, migration in migrations:
+        now = datetime.utcnow()
+        try:
+            await collection.insert_one({"_id": name, "started_at": now})
+        except DuplicateKeyError:
+            abandoned = await collection.find_one_and_update(
+                {"_id": name, "applied_at": {"$exists": False}, "started_at": {"$lt": now - CLAIM_LEASE}},
+                {"$set": {"started_at": now}}
+            )
+            if abandoned is None:
+                continue
+        try:
+            await migration(database)
+        except Exception as e:
+            await collection.delete_one({"_id": name})
+            logger.error(f"Migration {name} failed: {str(e)}")
+            raise
+        await collection.update_one({"_id": name}, {"$set": {"applied_at": datetime.utcnow()}})
+        logger.info(f"Applied migration {name}")
+        applied.append(name)
+    return applied
@@ -5,6 +5,10 @@ from typing import Optional
 from pydantic import BaseModel, Field
 from pymongo import IndexModel
 from beanie import Document, Indexed
+import os
+
+# How long expired links are kept (as EXPIRED) before MongoDB purges them
+PAYMENT_LINK_RETENTION_SECONDS = int(os.getenv("PAYMENT_LINK_RETENTION_DAYS", "30")) * 24 * 60 * 60
 
 
 class Chain(str, Enum):
@@ -19,6 +23,13 @@ class Status(str, Enum):
     CANCELLED = "cancelled"
 
 
+class WebhookStatus(str, Enum):
+    PENDING = "pending"
+    DELIVERING = "delivering"
+    DELIVERED = "delivered"
+    DEAD = "dead"
+
+
 class PaymentLink(Document):
     link_id: str = Field(..., unique=True)
     merchant_user_id: str
@@ -42,14 +53,26 @@ class PaymentLink(Document):
     payment_tx_hash: Optional[str] = None
     paid_at: Optional[datetime] = None
     paid_by_user_id: Optional[str] = None
+    expired_at: Optional[datetime] = None
+
+    # Webhook delivery
+    webhook_status: Optional[WebhookStatus] = None
+    webhook_attempts: int = 0
+    webhook_next_attempt_at: Optional[datetime] = None
+    webhook_lease_until: Optional[datetime] = None
+    webhook_last_error: Optional[str] = None
+    webhook_sent: bool = False
+    webhook_delivered_at: Optional[datetime] = None
     
     class Settings:
         name = "payment_links"
         indexes = [
             IndexModel("link_id", unique=True),
-            IndexModel("merchant_user_id"),
-            IndexModel("status"),
-            IndexModel("expires_at", expireAfterSeconds=0),  # For TTL
+            IndexModel([("merchant_user_id", 1), ("status", 1), ("expires_at", 1)]),  # Merchant's active links
+            IndexModel([("status", 1), ("expires_at", 1)]),  # Expiry sweeper
+            IndexModel([("webhook_status", 1), ("webhook_next_attempt_at", 1)]),  # Webhook queue
+            # TTL runs off expired_at, not expires_at, so links are marked EXPIRED before they're purged
+            IndexModel("expired_at", expireAfterSeconds=PAYMENT_LINK_RETENTION_SECONDS),
         ]
     
     class Config:
@@ -1,8 +1,8 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
-from beanie import Document
+from beanie import Document, PydanticObjectId
 from bson import ObjectId
 from pymongo import IndexModel
 
@@ -46,13 +46,20 @@ class Transaction(Document):
 
     class Settings:
         name = "transactions"
+        # Equality fields first, then the sort/range field (ESR)
         indexes = [
-            "user_id",
-            "tx_hash",
-            "chain",
-            "tx_type",
-            "status",
-            "created_at",
+            # One record per on-chain signature; transactions without one aren't constrained
+            IndexModel(
+                "tx_hash",
+                name="tx_hash_unique",
+                unique=True,
+                partialFilterExpression={"tx_hash": {"$type": "string"}}
+            ),
+            "created_at",  # System-wide recent transactions
+            [("user_id", 1), ("created_at", -1), ("_id", -1)],  # User history, keyset pagination, age filter
+            [("user_id", 1), ("tx_type", 1), ("created_at", -1)],
+            [("user_id", 1), ("status", 1), ("created_at", -1)],
+            [("status", 1), ("chain", 1), ("created_at", 1)],  # Confirmation tracker pending scan
         ]
 
     class Config:
@@ -90,6 +97,28 @@ class TransactionCreate(BaseModel):
     usd_value: Optional[float] = None
     gas_fee: Optional[str] = None
 
+class TransactionIngest(TransactionCreate):
+    """A transaction imported from chain history"""
+    tx_hash: Optional[str] = None
+    status: TransactionStatus = TransactionStatus.PENDING  # Settled by the confirmation tracker
+    confirmations: int = 0
+    confirmed_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None  # Block time, when known
+
+class IngestFailure(BaseModel):
+    index: int  # Position in the submitted stream
+    tx_hash: Optional[str] = None
+    error: str
+
+class IngestReport(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    conflicts: int = 0  # tx_hash already on record for another user
+    invalid: int = 0
+    failed: int = 0
+    failures: List[IngestFailure] = Field(default_factory=list)  # Capped; the counters are exact
+
 class TransactionUpdate(BaseModel):
     status: Optional[TransactionStatus] = None
     tx_hash: Optional[str] = None
@@ -97,6 +126,22 @@ class TransactionUpdate(BaseModel):
     confirmed_at: Optional[datetime] = None
     usd_value: Optional[float] = None
 
+class TransactionSummary(BaseModel):
+    """Lean read model for transaction history listings"""
+    id: PydanticObjectId = Field(alias="_id")
+    tx_hash: Optional[str] = None
+    chain: Chain
+    tx_type: TransactionType
+    token_symbol: Optional[str] = None
+    amount: Optional[str] = None
+    usd_value: Optional[float] = None
+    status: TransactionStatus
+    created_at: datetime
+
+    class Config:
+        json_encoders = {ObjectId: str}
+        populate_by_name = True
+
 class TransactionResponse(Transaction):
     pass
     # class Config:
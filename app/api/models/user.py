@@ -3,7 +3,7 @@ from enum import Enum
 from typing import List, Optional
 from pydantic import BaseModel, Field
 from pymongo import IndexModel
-from beanie import Document, Link
+from beanie import Document, Link, PydanticObjectId
 from bson import ObjectId
 from .wallet import Wallet
 
@@ -13,10 +13,19 @@ class Chain(str, Enum):
 
 
 
+class WalletRef(BaseModel):
+    """Embedded summary of a linked wallet, so lookups don't have to resolve the Link"""
+    wallet_id: PydanticObjectId
+    chain: str
+    address: str
+
+
 class User(Document):
     user_id: str = Field(..., unique=True)  # telegram/discord ID
     username: Optional[str] = None
     wallets: List[Link[Wallet]] = Field(default_factory=list)
+    # Mirrors wallets; both are written in the same update by UserRepository.add_wallet
+    wallet_refs: List[WalletRef] = Field(default_factory=list)
     default_chain: str = "solana"
     notification_enabled: bool = True
     email: Optional[str] = None
@@ -25,5 +34,35 @@ class User(Document):
     class Settings:
         name = "users"
         indexes = [
-            IndexModel("user_id", unique=True)
-        ]
\ No newline at end of file
+            IndexModel("user_id", unique=True),
+            IndexModel("wallet_refs.address"),
+        ]
+
+
+class UserSummary(BaseModel):
+    """Lean read model for user listings"""
+    id: PydanticObjectId = Field(alias="_id")
+    user_id: str
+    username: Optional[str] = None
+    default_chain: str = "solana"
+    created_at: datetime
+
+    class Config:
+        json_encoders = {ObjectId: str}
+        populate_by_name = True
+
+
+class UserWalletView(BaseModel):
+    """A user joined with one of their wallets, as resolved for bot commands"""
+    id: PydanticObjectId = Field(alias="_id")
+    user_id: str
+    username: Optional[str] = None
+    wallet_id: Optional[PydanticObjectId] = None
+    address: Optional[str] = None
+    encrypted_private_key: Optional[str] = None
+    # False when the wallet is missing from User.wallet_refs (linked before the field existed)
+    wallet_ref_stored: bool = True
+
+    class Config:
+        json_encoders = {ObjectId: str}
+        populate_by_name = True
@@ -84,6 +84,18 @@ class WalletUpdate(BaseModel):
     tokens: Optional[List[TokenCreate]] = None
     encrypted_private_key: Optional[str] = None
 
+class WalletSummary(BaseModel):
+    """Lean read model for wallet listings; never carries the encrypted key"""
+    id: PydanticObjectId = Field(alias="_id")
+    user_id: PydanticObjectId
+    chain: Chain
+    address: str
+    created_at: datetime
+
+    class Config:
+        json_encoders = {ObjectId: str}
+        populate_by_name = True
+
 class WalletResponse(Wallet):
     class Config:
         json_encoders = {ObjectId: str}
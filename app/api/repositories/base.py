@@ -1,8 +1,14 @@
-from typing import Type , TypeVar , Generic , Optional , List , Dict , Any 
-from beanie import Document
+from typing import Type , TypeVar , Generic , Optional , List , Dict , Any , Tuple
+from beanie import Document , PydanticObjectId
+from pydantic import BaseModel
+from pymongo import ReturnDocument , UpdateOne
+from pymongo.errors import BulkWriteError
+from .pagination import SortSpec , paginate , encode_cursor , sort_values , sort_field_types
+from .indexadvisor import QueryShape
 # from pymango.results import DeleteResult , UpdateResult
 
 T = TypeVar('T',bound=Document)
+P = TypeVar('P',bound=BaseModel)
 
 class BaseRepository(Generic[T]):
     def __init__(self,model:Type[T]):
@@ -12,21 +18,93 @@ class BaseRepository(Generic[T]):
         await document.insert()
         return document
 
+    async def insert_many_unordered(self,documents:List[T])->Tuple[int,List[Dict[str,Any]]]:
+        """
+        Inserts documents in one unordered batch, so a rejected document doesn't stop the rest.
+        Returns the inserted count and the server's write errors (each carrying its batch index).
+        """
+        if not documents:
+            return 0,[]
+        payload = [document.model_dump(exclude={"id","revision_id"}) for document in documents]
+        try:
+            result = await self.collection().insert_many(payload,ordered=False)
+            return len(result.inserted_ids),[]
+        except BulkWriteError as e:
+            return e.details.get("nInserted",0),e.details.get("writeErrors",[])
+
     async def get_by_id(self,id:str)->Optional[T]:
         try:
             return await self.model.get(id)
         except:
             return None
     
-    async def get_all(self,skip:int=0,limit:int=100)->List[T]:
-        return await self.model.find().skip(skip).limit(limit).to_list()
+    async def get_all(self,skip:int=0,limit:int=100,projection:Optional[Type[P]]=None)->List[Any]:
+        return await self.find_many({},skip=skip,limit=limit,projection=projection)
 
-    async def update(self,id:str,data:Dict[str,Any])->Optional[T]:
-        doc = await self.get_by_id(id)
-        if doc:
-            await doc.set(data)
-            return doc
-        return None
+    async def update(self,id:str,data:Dict[str,Any],array_filters:Optional[List[Dict[str,Any]]]=None)->Optional[T]:
+        try:
+            object_id = PydanticObjectId(id)
+        except Exception:
+            return None
+        return await self.find_one_and_update({"_id":object_id},data,array_filters=array_filters)
+
+    async def find_one_and_update(
+        self,
+        query:Dict[str,Any],
+        data:Dict[str,Any],
+        *,
+        array_filters:Optional[List[Dict[str,Any]]]=None,
+        upsert:bool=False,
+        sort:Optional[SortSpec]=None
+    )->Optional[T]:
+        """
+        Applies update operators atomically and returns the updated document in one round trip.
+        Plain field dicts are treated as $set; sort picks which match is updated.
+        """
+        update = data if any(key.startswith("$") for key in data) else {"$set":data}
+        raw = await self.collection().find_one_and_update(
+            query,
+            update,
+            array_filters=array_filters,
+            upsert=upsert,
+            sort=sort,
+            return_document=ReturnDocument.AFTER
+        )
+        if raw is None:
+            return None
+        return self.model.model_validate(raw)
+
+    async def update_many(self,query:Dict[str,Any],data:Dict[str,Any])->int:
+        """
+        Applies update operators to every matching document server-side.
+        Returns the number of documents modified.
+        """
+        update = data if any(key.startswith("$") for key in data) else {"$set":data}
+        result = await self.collection().update_many(query,update)
+        return result.modified_count
+
+    async def bulk_update(self,updates:List[Tuple[Dict[str,Any],Dict[str,Any]]])->int:
+        """
+        Applies many (query, update) pairs in one unordered bulk write.
+        Returns the number of documents modified.
+        """
+        if not updates:
+            return 0
+        result = await self.collection().bulk_write(
+            [UpdateOne(query,update) for query,update in updates],
+            ordered=False
+        )
+        return result.modified_count
+
+    def query_shapes(self)->List[QueryShape]:
+        """
+        Representative queries of this repository's methods, checked by the index advisor
+        """
+        return []
+
+    def collection(self):
+        """Underlying Motor collection for operations Beanie doesn't wrap"""
+        return self.model.get_motor_collection()
     
     async def delete(self,id:str)->bool:
         doc = await self.get_by_id(id)
@@ -38,8 +116,50 @@ class BaseRepository(Generic[T]):
     async def find_one(self,query:Dict[str,Any])->Optional[T]:
         return await self.model.find_one(query)
 
-    async def find_many(self,query:Dict[str,Any],skip:int=0,limit:int=100)->List[T]:
-        return await self.model.find(query).skip(skip).limit(limit).to_list()
+    async def find_many(self,query:Dict[str,Any],skip:int=0,limit:int=100,projection:Optional[Type[P]]=None)->List[Any]:
+        """
+        Finds documents; with a projection model only its fields are fetched and validated
+        """
+        cursor = self.model.find(query).skip(skip).limit(limit)
+        if projection is not None:
+            cursor = cursor.project(projection)
+        return await cursor.to_list()
+
+    async def get_page(
+        self,
+        limit:int=100,
+        cursor:Optional[str]=None,
+        projection:Optional[Type[P]]=None
+    )->Tuple[List[Any],Optional[str]]:
+        return await self.find_page({},limit=limit,cursor=cursor,projection=projection)
+
+    async def find_page(
+        self,
+        query:Dict[str,Any],
+        *,
+        limit:int=100,
+        cursor:Optional[str]=None,
+        sort:Optional[SortSpec]=None,
+        projection:Optional[Type[P]]=None
+    )->Tuple[List[Any],Optional[str]]:
+        """
+        Keyset-paginated find: returns a page of documents and an opaque cursor for the
+        next page (None on the last page). Every page costs an index seek, unlike skip.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed or was issued for a different sort
+        """
+        sort = sort or [("_id",1)]
+        types = [sort_field_types(self.model,field) for field,_ in sort]
+        find = self.model.find(paginate(query,sort,cursor,types)).sort(sort).limit(limit+1)
+        if projection is not None:
+            # The projection model must include the sort fields for the cursor
+            find = find.project(projection)
+        docs = await find.to_list()
+        if len(docs) <= limit:
+            return docs,None
+        docs = docs[:limit]
+        return docs,encode_cursor(sort_values(docs[-1],sort))
 
     
     
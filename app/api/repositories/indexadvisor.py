@@ -0,0 +1,73 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+from .pagination import SortSpec
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QueryShape(NamedTuple):
+    """A repository query with representative values, for explain()"""
+    name: str
+    filter: Dict[str, Any]
+    sort: Optional[SortSpec] = None
+    limit: int = 100
+
+
+def _plan_stages(plan: Dict[str, Any]) -> Set[str]:
+    """Every stage name in a (classic or slot-based) winning plan tree"""
+    if "queryPlan" in plan:
+        plan = plan["queryPlan"]
+    stages = {plan.get("stage", "")}
+    if "inputStage" in plan:
+        stages |= _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages |= _plan_stages(child)
+    return stages
+
+
+async def explain_shape(collection: Any, shape: QueryShape) -> Dict[str, Any]:
+    """
+    Explains one query shape and reports whether it scans the collection or sorts in memory
+    """
+    cursor = collection.find(shape.filter).limit(shape.limit)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    explain = await cursor.explain()
+    stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+    return {
+        "collection": collection.name,
+        "query": shape.name,
+        "stages": sorted(stages),
+        "collscan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+    }
+
+
+async def run_index_advisor(repositories: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Explains every query shape declared by the given repositories and logs a warning
+    for each one that falls back to a collection scan or an in-memory sort.
+    Returns the findings for all shapes.
+    """
+    findings = []
+    for repository in repositories:
+        collection = repository.collection()
+        for shape in repository.query_shapes():
+            try:
+                finding = await explain_shape(collection, shape)
+            except Exception as e:
+                logger.error(f"Index advisor could not explain {collection.name}.{shape.name}: {str(e)}")
+                continue
+            findings.append(finding)
+            problems = [
+                label for label, flagged in (("COLLSCAN", finding["collscan"]), ("in-memory SORT", finding["in_memory_sort"]))
+                if flagged
+            ]
+            if problems:
+                logger.warning(
+                    f"Index advisor: {collection.name}.{shape.name} uses {' and '.join(problems)} "
+                    f"(plan: {', '.join(finding['stages'])})"
+                )
+    flagged = sum(1 for f in findings if f["collscan"] or f["in_memory_sort"])
+    logger.info(f"Index advisor checked {len(findings)} query shapes, {flagged} need attention")
+    return findings
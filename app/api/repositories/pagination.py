@@ -0,0 +1,101 @@
+from typing import Any, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+from datetime import datetime
+from bson import ObjectId, json_util
+from bson.errors import BSONError
+import base64
+import binascii
+import json
+
+# (field, direction) pairs, direction 1 for ascending and -1 for descending
+SortSpec = List[Tuple[str, int]]
+
+# Value types a cursor may carry; anything else (dicts, lists) could smuggle query operators
+CURSOR_SCALARS: Tuple[type, ...] = (ObjectId, datetime, str, int, float)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor can't be decoded"""
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    Encodes the sort-key values of the last returned document as an opaque token
+    """
+    raw = json_util.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def sort_field_types(model: Type[Any], field: str) -> Tuple[type, ...]:
+    """
+    Cursor value types accepted for a sort field, read from the model's annotation
+    (Optional is unwrapped, str enums accept str, float fields accept int)
+    """
+    if field == "_id":
+        return (ObjectId,)
+    info = getattr(model, "model_fields", {}).get(field)
+    annotation = info.annotation if info is not None else None
+    candidates = get_args(annotation) if get_origin(annotation) is Union else (annotation,)
+    types = set()
+    for candidate in candidates:
+        if not isinstance(candidate, type):
+            continue
+        types.update(base for base in CURSOR_SCALARS if issubclass(candidate, base))
+    if float in types:
+        types.add(int)
+    return tuple(types) or CURSOR_SCALARS
+
+
+def decode_cursor(token: str, sort: SortSpec, types: Optional[List[Tuple[type, ...]]] = None) -> List[Any]:
+    """
+    Decodes a token from encode_cursor and checks it matches the sort spec.
+    Each value must be a scalar of its field's type (see sort_field_types) before it
+    goes anywhere near a query filter.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, TypeError, ArithmeticError, json.JSONDecodeError, BSONError) as e:
+        raise InvalidCursor("Malformed pagination cursor") from e
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursor("Pagination cursor doesn't match this listing")
+    for value, expected in zip(values, types or [CURSOR_SCALARS] * len(sort)):
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise InvalidCursor("Pagination cursor doesn't match this listing")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> Dict[str, Any]:
+    """
+    Builds the filter selecting documents strictly after `values` in `sort` order, e.g.
+    (created_at desc, _id desc) -> created_at < v0 OR (created_at == v0 AND _id < v1)
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def sort_values(document: Any, sort: SortSpec) -> List[Any]:
+    """Reads the sort-key values off a returned document"""
+    values = []
+    for field, _ in sort:
+        if isinstance(document, dict):
+            values.append(document[field])
+        else:
+            values.append(document.id if field == "_id" else getattr(document, field))
+    return values
+
+
+def paginate(
+    query: Dict[str, Any],
+    sort: SortSpec,
+    cursor: Optional[str],
+    types: Optional[List[Tuple[type, ...]]] = None
+) -> Dict[str, Any]:
+    """Combines a query with the keyset filter for a cursor, if any"""
+    if not cursor:
+        return query
+    after = keyset_filter(sort, decode_cursor(cursor, sort, types))
+    return {"$and": [query, after]} if query else after
@@ -1,6 +1,7 @@
-from app.api.repositories.base import BaseRepository
-from app.api.models.paymentlink import PaymentLink
-from typing import Optional, List
+from api.repositories.base import BaseRepository
+from api.repositories.indexadvisor import QueryShape
+from api.models.paymentlink import PaymentLink
+from typing import Optional, List, Collection
 from datetime import datetime, timedelta
 
 class PaymentLinkRepository(BaseRepository[PaymentLink]):
@@ -28,27 +29,40 @@ class PaymentLinkRepository(BaseRepository[PaymentLink]):
             "expires_at": {"$lt": datetime.utcnow()},
             "status": "active"
         })
+
+    async def expire_links(self, now: Optional[datetime] = None) -> int:
+        """
+        Marks every active link past its expiry as expired in one server-side update
+        """
+        now = now or datetime.utcnow()
+        return await self.update_many(
+            {"status": "active", "expires_at": {"$lt": now}},
+            {"$set": {"status": "expired", "expired_at": now}}
+        )
     async def mark_as_paid(
         self,
         link_id: str,
         tx_hash: str,
         paid_by_user_id: str
     ) -> Optional[PaymentLink]:
-        return await self.update(
-            link_id,
+        return await self.find_one_and_update(
+            {"link_id": link_id, "status": "active"},
             {
                 "$set": {
                     "status": "paid",
                     "payment_tx_hash": tx_hash,
                     "paid_by_user_id": paid_by_user_id,
-                    "paid_at": datetime.utcnow()
+                    "paid_at": datetime.utcnow(),
+                    # Queues the webhook; links without a webhook_url are never claimed
+                    "webhook_status": "pending",
+                    "webhook_next_attempt_at": datetime.utcnow()
                 }
             }
         )
 
     async def cancel_link(self, link_id: str) -> Optional[PaymentLink]:
-        return await self.update(
-            link_id,
+        return await self.find_one_and_update(
+            {"link_id": link_id, "status": "active"},
             {"$set": {"status": "cancelled"}}
         )
 
@@ -60,8 +74,124 @@ class PaymentLinkRepository(BaseRepository[PaymentLink]):
         })
 
     async def mark_webhook_sent(self, link_id: str) -> Optional[PaymentLink]:
-        return await self.update(
-            link_id,
-            {"$set": {"webhook_sent": True}}
+        return await self.find_one_and_update(
+            {"link_id": link_id},
+            {"$set": {"webhook_sent": True, "webhook_status": "delivered", "webhook_delivered_at": datetime.utcnow()}}
+        )
+
+    async def claim_webhook(
+        self,
+        lease: timedelta,
+        exclude_merchants: Collection[str] = (),
+        now: Optional[datetime] = None
+    ) -> Optional[PaymentLink]:
+        """
+        Atomically takes the oldest due webhook and leases it to the caller.
+        Deliveries whose lease ran out (a worker died mid-send) are claimable again.
+        """
+        now = now or datetime.utcnow()
+        query = {
+            "status": "paid",
+            "webhook_url": {"$ne": None},
+            "$or": [
+                {"webhook_status": "pending", "webhook_next_attempt_at": {"$lte": now}},
+                {"webhook_status": "delivering", "webhook_lease_until": {"$lt": now}},
+            ]
+        }
+        if exclude_merchants:
+            query["merchant_user_id"] = {"$nin": list(exclude_merchants)}
+        return await self.find_one_and_update(
+            query,
+            {
+                "$set": {"webhook_status": "delivering", "webhook_lease_until": now + lease},
+                "$inc": {"webhook_attempts": 1}
+            },
+            sort=[("webhook_next_attempt_at", 1)]
         )
 
+    async def complete_webhook(self, link_id: str, attempt: int) -> Optional[PaymentLink]:
+        """
+        Marks a claimed delivery as sent; a no-op if the lease was lost to another worker
+        """
+        now = datetime.utcnow()
+        return await self.find_one_and_update(
+            {"link_id": link_id, "webhook_status": "delivering", "webhook_attempts": attempt},
+            {"$set": {
+                "webhook_status": "delivered",
+                "webhook_sent": True,
+                "webhook_delivered_at": now,
+                "webhook_lease_until": None,
+                "webhook_last_error": None
+            }}
+        )
+
+    async def fail_webhook(
+        self,
+        link_id: str,
+        attempt: int,
+        error: str,
+        next_attempt_at: Optional[datetime]
+    ) -> Optional[PaymentLink]:
+        """
+        Schedules a retry of a claimed delivery, or dead-letters it when next_attempt_at is None
+        """
+        fields = {
+            "webhook_status": "pending" if next_attempt_at else "dead",
+            "webhook_next_attempt_at": next_attempt_at,
+            "webhook_lease_until": None,
+            "webhook_last_error": error[:500]
+        }
+        return await self.find_one_and_update(
+            {"link_id": link_id, "webhook_status": "delivering", "webhook_attempts": attempt},
+            {"$set": fields}
+        )
+
+    async def release_webhook(self, link_id: str, attempt: int) -> Optional[PaymentLink]:
+        """
+        Hands a claimed delivery back to the queue untried, refunding the attempt the claim counted
+        """
+        return await self.find_one_and_update(
+            {"link_id": link_id, "webhook_status": "delivering", "webhook_attempts": attempt},
+            {
+                "$set": {"webhook_status": "pending", "webhook_lease_until": None},
+                "$inc": {"webhook_attempts": -1}
+            }
+        )
+
+    async def get_dead_webhooks(self, limit: int = 100) -> List[PaymentLink]:
+        return await self.find_many({"webhook_status": "dead"}, limit=limit)
+
+    async def requeue_webhook(self, link_id: str) -> Optional[PaymentLink]:
+        """
+        Puts a dead-lettered webhook back on the queue with a fresh attempt budget
+        """
+        return await self.find_one_and_update(
+            {"link_id": link_id, "webhook_status": "dead"},
+            {"$set": {
+                "webhook_status": "pending",
+                "webhook_attempts": 0,
+                "webhook_next_attempt_at": datetime.utcnow()
+            }}
+        )
+
+
+
+    def query_shapes(self) -> List[QueryShape]:
+        now = datetime.utcnow()
+        return [
+            QueryShape("get_by_link_id", {"link_id": ""}, limit=1),
+            QueryShape("get_active_links_by_merchant", {
+                "merchant_user_id": "",
+                "status": "active",
+                "$or": [{"expires_at": {"$gt": now}}, {"expires_at": None}]
+            }),
+            QueryShape("expire_links", {"status": "active", "expires_at": {"$lt": now}}),
+            QueryShape("claim_webhook", {
+                "status": "paid",
+                "webhook_url": {"$ne": None},
+                "$or": [
+                    {"webhook_status": "pending", "webhook_next_attempt_at": {"$lte": now}},
+                    {"webhook_status": "delivering", "webhook_lease_until": {"$lt": now}},
+                ]
+            }, [("webhook_next_attempt_at", 1)], limit=1),
+        ]
@@ -1,7 +1,10 @@
-from app.api.models.transaction import Transaction
-from app.api.repositories.base import BaseRepository
-from typing import List
-from datetime import datetime
+from api.models.transaction import Transaction
+from pydantic import BaseModel
+from api.repositories.base import BaseRepository
+from api.repositories.indexadvisor import QueryShape
+from typing import Any, Dict, List, Optional, Tuple, Type
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
 
 class TransactionRepository(BaseRepository[Transaction]):
     def __init__(self):
@@ -10,8 +13,101 @@ class TransactionRepository(BaseRepository[Transaction]):
     async def get_by_user_id(self, user_id: str, limit: int = 100) -> List[Transaction]:
         return await self.find_many({"user_id": user_id}, limit=limit)
 
+    async def get_user_transactions_page(
+        self,
+        user_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        projection: Optional[Type[BaseModel]] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Newest-first page of a user's transactions, keyed on (created_at, _id)
+        """
+        return await self.find_page(
+            {"user_id": user_id},
+            limit=limit,
+            cursor=cursor,
+            sort=[("created_at", -1), ("_id", -1)],
+            projection=projection
+        )
+
+    async def get_user_transactions(
+        self,
+        user_id: str,
+        *,
+        since: Optional[datetime] = None,
+        tx_type: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Transaction]:
+        """
+        Newest-first transactions of a user, optionally narrowed by type, status and age
+        """
+        query = {"user_id": user_id}
+        if tx_type:
+            query["tx_type"] = tx_type
+        if status:
+            query["status"] = status
+        if since:
+            query["created_at"] = {"$gte": since}
+        return await self.model.find(query).sort([("created_at", -1)]).limit(limit).to_list()
+
+    @staticmethod
+    def _by_tx_hash(tx_hash: str) -> Dict[str, Any]:
+        # The $type clause lets the planner prove the query matches the partial unique index
+        return {"$and": [{"tx_hash": tx_hash}, {"tx_hash": {"$type": "string"}}]}
+
     async def get_by_tx_hash(self, tx_hash: str) -> Optional[Transaction]:
-        return await self.find_one({"tx_hash": tx_hash})
+        return await self.find_one(self._by_tx_hash(tx_hash))
+
+    async def upsert_by_tx_hash(
+        self,
+        tx_hash: str,
+        on_insert: Dict[str, Any],
+        merge: Optional[Dict[str, Any]] = None
+    ) -> Transaction:
+        """
+        Records the transaction for a signature, or merges into the existing record, in one
+        atomic round trip. on_insert fields are written only when the record is created;
+        merge fields are written either way. Safe to call concurrently for the same signature.
+        """
+        now = datetime.utcnow()
+        set_fields = {**(merge or {}), "updated_at": now}
+        insert_fields = {
+            key: value for key, value in on_insert.items()
+            if key not in set_fields and key not in ("_id", "id", "revision_id", "tx_hash")
+        }
+        insert_fields.setdefault("created_at", now)
+        update = {"$setOnInsert": insert_fields, "$set": set_fields}
+        try:
+            return await self.find_one_and_update(self._by_tx_hash(tx_hash), update, upsert=True)
+        except DuplicateKeyError:
+            # A concurrent upsert inserted first; the document exists now, so this is a plain update
+            return await self.find_one_and_update(self._by_tx_hash(tx_hash), update, upsert=True)
+
+    async def get_owners_by_tx_hash(self, tx_hashes: List[str]) -> Dict[str, str]:
+        """
+        tx_hash -> user_id for the signatures already on record
+        """
+        if not tx_hashes:
+            return {}
+        cursor = self.collection().find(
+            {"$and": [{"tx_hash": {"$in": tx_hashes}}, {"tx_hash": {"$type": "string"}}]},
+            {"tx_hash": 1, "user_id": 1}
+        )
+        return {doc["tx_hash"]: doc["user_id"] async for doc in cursor}
+
+    async def get_pending_with_hash(self, limit: int = 5000, tx_hashes: Optional[List[str]] = None) -> List[Transaction]:
+        """
+        Oldest-first pending Solana transactions that have an on-chain signature,
+        optionally only those with one of the given signatures
+        """
+        query: Dict[str, Any] = {"status": "pending", "chain": "solana", "tx_hash": {"$ne": None}}
+        if tx_hashes is not None:
+            query = {"status": "pending", "chain": "solana", "$and": [
+                {"tx_hash": {"$in": tx_hashes}}, {"tx_hash": {"$type": "string"}}
+            ]}
+        return await self.model.find(query).sort([("created_at", 1)]).limit(limit).to_list()
 
     async def get_recent_transactions(self, days: int = 7) -> List[Transaction]:
         cutoff_date = datetime.utcnow() - timedelta(days=days)
@@ -24,4 +120,20 @@ class TransactionRepository(BaseRepository[Transaction]):
         }
         if status == "confirmed":
             update_data["confirmed_at"] = datetime.utcnow()
-        return await self.update(tx_id, {"$set": update_data})
\ No newline at end of file
+        return await self.update(tx_id, {"$set": update_data})
+
+    def query_shapes(self) -> List[QueryShape]:
+        now = datetime.utcnow()
+        return [
+            QueryShape("get_user_transactions_page", {"user_id": ""}, [("created_at", -1), ("_id", -1)]),
+            QueryShape("get_user_transactions", {"user_id": "", "created_at": {"$gte": now}}, [("created_at", -1)]),
+            QueryShape("get_user_transactions(tx_type)", {"user_id": "", "tx_type": "buy"}, [("created_at", -1)]),
+            QueryShape("get_user_transactions(status)", {"user_id": "", "status": "pending"}, [("created_at", -1)]),
+            QueryShape("get_by_tx_hash", self._by_tx_hash(""), limit=1),
+            QueryShape(
+                "get_pending_with_hash",
+                {"status": "pending", "chain": "solana", "tx_hash": {"$ne": None}},
+                [("created_at", 1)]
+            ),
+            QueryShape("get_recent_transactions", {"created_at": {"$gte": now}}),
+        ]
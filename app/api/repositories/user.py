@@ -1,6 +1,9 @@
-from api.models.user import User
-from typing import Optional
+from api.models.user import User, UserWalletView
+from typing import Optional, Dict, Any, List
 from api.repositories.base import BaseRepository
+from api.repositories.indexadvisor import QueryShape
+from beanie import PydanticObjectId
+from bson import DBRef
 
 class UserRepository(BaseRepository[User]):
     def __init__(self):
@@ -12,8 +15,78 @@ class UserRepository(BaseRepository[User]):
     async def get_by_username(self,username:str)->Optional[User]:
         return await self.find_one({"username":username})
     
+    async def update_by_user_id(self,user_id:str,data:Dict[str,Any])->Optional[User]:
+        return await self.find_one_and_update({"user_id":user_id},data)
+
     async def update_wallet(self,user_id:str,wallet_data:dict)->Optional[User]:
-        return await self.update(user_id,{"$set":{"wallets":wallet_data}})
+        return await self.update_by_user_id(user_id,{"$set":{"wallets":wallet_data}})
+
+    async def add_wallet(self,user_id:str,wallet_id:PydanticObjectId,address:str,chain:str)->Optional[User]:
+        """
+        Links a wallet and its embedded summary in one atomic update
+        """
+        return await self.update_by_user_id(
+            user_id,
+            {"$addToSet":{
+                "wallets":DBRef("wallets",wallet_id),
+                "wallet_refs":{"wallet_id":wallet_id,"chain":chain,"address":address}
+            }}
+        )
+
+    async def get_by_wallet_address(self,address:str,chain:Optional[str]=None,limit:int=100)->List[User]:
+        if chain:
+            query = {"wallet_refs":{"$elemMatch":{"address":address,"chain":chain}}}
+        else:
+            query = {"wallet_refs.address":address}
+        return await self.find_many(query,limit=limit)
+
+    async def get_with_wallet(self,user_id:str,chain:str="solana")->Optional[UserWalletView]:
+        """
+        Resolves a Telegram/Discord id to the user and their first wallet on a chain
+        in one aggregation round trip. address is None when the user has no wallet there.
+        A wallet missing from the user's wallet_refs is added to them on the way.
+        """
+        pipeline = [
+            {"$match":{"user_id":user_id}},
+            {"$limit":1},
+            {"$lookup":{
+                "from":"wallets",
+                "localField":"_id",
+                "foreignField":"user_id",
+                "pipeline":[
+                    {"$match":{"chain":chain}},
+                    {"$sort":{"created_at":1}},
+                    {"$limit":1},
+                    {"$project":{"_id":1,"address":1,"encrypted_private_key":1}}
+                ],
+                "as":"wallet"
+            }},
+            {"$unwind":{"path":"$wallet","preserveNullAndEmptyArrays":True}},
+            {"$project":{
+                "_id":1,
+                "user_id":1,
+                "username":1,
+                "wallet_id":"$wallet._id",
+                "address":"$wallet.address",
+                "encrypted_private_key":"$wallet.encrypted_private_key",
+                "wallet_ref_stored":{"$in":["$wallet._id",{"$ifNull":["$wallet_refs.wallet_id",[]]}]}
+            }}
+        ]
+        results = await self.model.aggregate(pipeline,projection_model=UserWalletView).to_list()
+        if not results:
+            return None
+        view = results[0]
+        if view.address is not None and not view.wallet_ref_stored:
+            # Backfills users the startup migration hasn't reached, so address lookups find them
+            await self.add_wallet(view.user_id,view.wallet_id,view.address,chain)
+            view.wallet_ref_stored = True
+        return view
 
     async def update_notification_preference(self,user_id:str,enabled:bool)->Optional[User]:
-        return await self.update(user_id,{"$set":{"notification_enabled":enabled}})
\ No newline at end of file
+        return await self.update_by_user_id(user_id,{"$set":{"notification_enabled":enabled}})
+
+    def query_shapes(self)->List[QueryShape]:
+        return [
+            QueryShape("get_by_user_id",{"user_id":""},limit=1),
+            QueryShape("get_by_wallet_address",{"wallet_refs":{"$elemMatch":{"address":"","chain":"solana"}}}),
+        ]
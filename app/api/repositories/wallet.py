@@ -1,7 +1,10 @@
-from api.models.wallet import Wallet
+from api.models.wallet import Wallet, WalletSummary
 from api.repositories.base import BaseRepository
+from api.repositories.indexadvisor import QueryShape
 from bson import ObjectId
 from typing import Optional,List
+from beanie import PydanticObjectId
+from datetime import datetime
 
 class WalletRepository(BaseRepository[Wallet]):
     def __init__(self):
@@ -23,7 +26,7 @@ class WalletRepository(BaseRepository[Wallet]):
         })
     
     async def add_token_to_wallet(self,wallet_id:str,token_data:dict)->Optional[Wallet]:
-        return await self.update(wallet_id,{"$push":{"token":token_data}})
+        return await self.update(wallet_id,{"$push":{"tokens":token_data}})
 
     async def update_token_balance(
         self,
@@ -31,9 +34,17 @@ class WalletRepository(BaseRepository[Wallet]):
         token_symbol: str,
         new_balance: str
     ) -> Optional[Wallet]:
-        return await self.update(
-            wallet_id,
-            {"$set": {"tokens.$[elem].balance": new_balance}},
+        """
+        Sets a token balance in one round trip; returns None if the wallet
+        doesn't exist or doesn't hold the token
+        """
+        try:
+            object_id = ObjectId(wallet_id)
+        except Exception:
+            return None
+        return await self.find_one_and_update(
+            {"_id": object_id, "tokens.symbol": token_symbol},
+            {"$set": {"tokens.$[elem].balance": float(new_balance), "updated_at": datetime.utcnow()}},
             array_filters=[{"elem.symbol": token_symbol}]
         )
 
@@ -45,4 +56,27 @@ class WalletRepository(BaseRepository[Wallet]):
         return await self.find_many({
             "user_id": ObjectId(user_id),
             "tokens.symbol": token_symbol
-        })
\ No newline at end of file
+        })
+
+    async def get_summaries_after(
+        self,
+        chain: str,
+        after_id: Optional[PydanticObjectId] = None,
+        limit: int = 1000
+    ) -> List[WalletSummary]:
+        """
+        Next page of wallet summaries in _id order, for streaming every wallet of a chain
+        """
+        query = {"chain": chain}
+        if after_id is not None:
+            query["_id"] = {"$gt": after_id}
+        summaries, _ = await self.find_page(query, limit=limit, projection=WalletSummary)
+        return summaries
+
+
+    def query_shapes(self) -> List[QueryShape]:
+        return [
+            QueryShape("get_by_address", {"address": ""}, limit=1),
+            QueryShape("get_by_user_and_chain", {"user_id": ObjectId(), "chain": "solana"}),
+            QueryShape("get_summaries_after", {"chain": "solana", "_id": {"$gt": ObjectId()}}, [("_id", 1)]),
+        ]
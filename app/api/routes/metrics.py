@@ -0,0 +1,13 @@
+from fastapi import Depends
+from fastapi import APIRouter
+from ..container import ServiceContainer,get_container
+
+metrics_router = APIRouter(prefix="/metrics",tags=["metrics"])
+
+
+@metrics_router.get("/")
+async def get_metrics(container:ServiceContainer=Depends(get_container)):
+    """
+    Cache and client counters for this process
+    """
+    return container.metrics()
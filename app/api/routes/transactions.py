@@ -0,0 +1,105 @@
+from fastapi import FastAPI,Depends,Header,HTTPException,Query,Request
+from fastapi import APIRouter
+from ..services.transaction import TransactionService
+from ..container import ServiceContainer,get_container
+from ..repositories.pagination import InvalidCursor
+from ..models.transaction import TransactionSummary,TransactionIngest,IngestReport
+from typing import Annotated,Any,AsyncIterator,List,Optional
+from dotenv import load_dotenv
+import json
+import os
+import secrets
+
+load_dotenv()
+
+# Longest NDJSON line accepted by /ingest
+MAX_INGEST_LINE_BYTES = 64*1024
+
+transaction_router = APIRouter(prefix="/transactions",tags=["transactions"])
+
+async def get_transaction_service(container:ServiceContainer=Depends(get_container))->TransactionService:
+    """
+    Returns the process-wide TransactionService from the service container
+    """
+    return container.transaction_service
+
+TransactionServiceDep = Annotated[TransactionService,Depends(get_transaction_service)]
+
+
+@transaction_router.get("/")
+async def get_user_transactions(
+    user_id:str,
+    transactions:TransactionService=Depends(get_transaction_service),
+    limit:int=Query(50,ge=1,le=200),
+    cursor:Optional[str]=None
+):
+    """
+    Get a user's transactions newest first; pass next_cursor back as cursor for the next page
+    """
+    try:
+        items,next_cursor = await transactions.repository.get_user_transactions_page(user_id,limit=limit,cursor=cursor,projection=TransactionSummary)
+        return {"items":items,"next_cursor":next_cursor}
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400,detail=str(e))
+
+
+def require_service_token(x_service_token:Optional[str]=Header(None))->None:
+    """
+    Admits internal callers presenting INGEST_SERVICE_TOKEN; the route is hidden when it's unset
+    """
+    expected = os.getenv("INGEST_SERVICE_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404,detail="Not Found")
+    if not x_service_token or not secrets.compare_digest(x_service_token,expected):
+        raise HTTPException(status_code=403,detail="Invalid service token")
+
+
+async def read_ndjson(request:Request)->AsyncIterator[Any]:
+    """
+    Yields one parsed record per line of a newline-delimited JSON body as it arrives.
+    Lines that aren't JSON, or exceed MAX_INGEST_LINE_BYTES, are passed through as text
+    so ingestion reports them as invalid.
+    """
+    buffer = b""
+    oversized = False
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines,buffer = buffer.split(b"\n")
+        for line in lines:
+            if oversized or len(line)>MAX_INGEST_LINE_BYTES:
+                # The end of a line whose start was already discarded, or a whole one too long
+                oversized = False
+                yield "line too long"
+            elif line.strip():
+                yield _parse_line(line)
+        if len(buffer)>MAX_INGEST_LINE_BYTES:
+            oversized = True
+            buffer = b""
+    if oversized:
+        yield "line too long"
+    elif buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line:bytes)->Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return line.decode(errors="replace")
+
+
+@transaction_router.post(
+    "/ingest",
+    response_model=IngestReport,
+    dependencies=[Depends(require_service_token)],
+    openapi_extra={"requestBody":{"required":True,"content":{"application/x-ndjson":{"schema":{"type":"string","format":"binary"}}}}}
+)
+async def ingest_transactions(
+    request:Request,
+    transactions:TransactionService=Depends(get_transaction_service)
+):
+    """
+    Internal: bulk-import transactions streamed as NDJSON (one TransactionIngest per line).
+    Requires the X-Service-Token header; duplicates, conflicts and rejected records are reported per item
+    """
+    return await transactions.ingest_transactions(read_ndjson(request))
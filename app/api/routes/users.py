@@ -1,34 +1,35 @@
-from fastapi import FastAPI,Depends
+from fastapi import FastAPI,Depends,HTTPException,Query
 from fastapi import APIRouter
 from ..services.user import UserService
-from ..repositories.user import UserRepository
-from typing import Annotated
+from ..container import ServiceContainer,get_container
+from ..repositories.pagination import InvalidCursor
+from ..models.user import UserSummary
+from typing import Annotated,Optional
 
 users_router =APIRouter(prefix="/users",tags=["users"])
 
-async def get_user_repository()->UserRepository:
+async def get_user_service(container:ServiceContainer=Depends(get_container))->UserService:
     """
-    Creates and returns a UserRepository instance
+    Returns the process-wide UserService from the service container
     """
-    return UserRepository()
-
-async def get_user_service(user_repository:UserRepository=Depends(get_user_repository))->UserService:
-    """
-    Creates and return a UserService instance with injected UserRepository
-    """
-    return UserService(user_repository)
+    return container.user_service
 
 UserServiceDep = Annotated[UserService,Depends(get_user_service)]
 
 
 @users_router.get("/")
-async def get_users(user:UserService=Depends(get_user_service)):
+async def get_users(
+    user:UserService=Depends(get_user_service),
+    limit:int=Query(50,ge=1,le=200),
+    cursor:Optional[str]=None
+):
     """
-    Gets all Users
+    Gets a page of Users; pass next_cursor back as cursor for the next page
     """
     try:
-        user = await user.repository.get_all()
-        print(user)
-        return user
+        users,next_cursor = await user.repository.get_page(limit=limit,cursor=cursor,projection=UserSummary)
+        return {"items":users,"next_cursor":next_cursor}
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400,detail=str(e))
     except RuntimeError as e:
         raise
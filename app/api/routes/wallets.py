@@ -1,33 +1,35 @@
-from fastapi import FastAPI,Depends
+from fastapi import FastAPI,Depends,HTTPException,Query
 from fastapi import APIRouter
 from ..services.wallet import WalletService
-from ..repositories.wallet import WalletRepository
-from typing import Annotated
+from ..container import ServiceContainer,get_container
+from ..repositories.pagination import InvalidCursor
+from ..models.wallet import WalletSummary
+from typing import Annotated,Optional
 
 wallet_router = APIRouter(prefix="/wallets",tags=["wallets"])
 
-async def get_wallet_repository()->WalletRepository:
+async def get_wallet_service(container:ServiceContainer=Depends(get_container))->WalletService:
     """
-    Creates and Returns a WalletRepository instance
+    Returns the process-wide WalletService from the service container
     """
-    return WalletRepository()
-
-async def get_wallet_service(wallet_repository:WalletRepository=Depends(get_wallet_repository))->WalletService:
-    """
-    Creates and Returns a UserService instance with injected dependency
-    """
-    return WalletService(wallet_repository)
+    return container.wallet_service
 
 WalletServiceDep = Annotated[WalletService,Depends(get_wallet_service)]
 
 
 @wallet_router.get("/")
-async def get_all_wallets(wallets:WalletService=Depends(get_wallet_service)):
+async def get_all_wallets(
+    wallets:WalletService=Depends(get_wallet_service),
+    limit:int=Query(50,ge=1,le=200),
+    cursor:Optional[str]=None
+):
     """
-    Get all wallets
+    Get a page of wallets; pass next_cursor back as cursor for the next page
     """
     try:
-        wallet = await wallets.repository.get_all()
-        return wallet
+        wallet,next_cursor = await wallets.repository.get_page(limit=limit,cursor=cursor,projection=WalletSummary)
+        return {"items":wallet,"next_cursor":next_cursor}
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400,detail=str(e))
     except RuntimeError as e:
         raise
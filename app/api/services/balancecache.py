@@ -0,0 +1,140 @@
+from typing import Callable, Dict, List, Optional
+from abc import ABC, abstractmethod
+from .cache import TTLCache
+from dotenv import load_dotenv
+import logging
+import os
+import uuid
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Callback receiving (key, origin) for every invalidation published on a topic
+InvalidationCallback = Callable[[str, str], None]
+
+# Topic the balance cache publishes wallet addresses on
+BALANCES_TOPIC = "balances"
+
+
+class InvalidationBroker(ABC):
+    """
+    Pub/sub channel carrying cache invalidations between processes. Each cache publishes
+    and subscribes on its own topic, so caches can share one broker without seeing each
+    other's keys. Subclass it to back the caches with a shared broker in multi-process
+    deployments.
+    """
+    @abstractmethod
+    async def publish(self, topic: str, key: str, origin: str) -> None:
+        """Deliver an invalidation to every subscriber of the topic, including other processes"""
+
+    @abstractmethod
+    def subscribe(self, topic: str, callback: InvalidationCallback) -> None:
+        """Register a callback for every invalidation published on the topic from now on"""
+
+
+class LocalInvalidationBroker(InvalidationBroker):
+    """
+    In-process stand-in broker that delivers invalidations to this process's subscribers only
+    """
+    def __init__(self):
+        self._subscribers: Dict[str, List[InvalidationCallback]] = {}
+
+    async def publish(self, topic: str, key: str, origin: str) -> None:
+        for callback in list(self._subscribers.get(topic, ())):
+            try:
+                callback(key, origin)
+            except Exception as e:
+                logger.error(f"Invalidation subscriber for {topic} failed for {key}: {str(e)}")
+
+    def subscribe(self, topic: str, callback: InvalidationCallback) -> None:
+        self._subscribers.setdefault(topic, []).append(callback)
+
+
+class BalanceCache:
+    """
+    Short-TTL LRU cache of wallet balances keyed by address, kept coherent across
+    processes by publishing invalidations through an InvalidationBroker
+    """
+    def __init__(
+        self,
+        broker: Optional[InvalidationBroker] = None,
+        *,
+        ttl: Optional[float] = None,
+        max_size: Optional[int] = None
+    ):
+        """
+        Args:
+            broker: Invalidation channel (defaults to an in-process broker)
+            ttl: Seconds a balance stays fresh (defaults to BALANCE_CACHE_TTL)
+            max_size: Maximum cached entries before LRU eviction (defaults to BALANCE_CACHE_SIZE)
+        """
+        ttl = ttl if ttl is not None else float(os.getenv("BALANCE_CACHE_TTL", "10"))
+        max_size = max_size or int(os.getenv("BALANCE_CACHE_SIZE", "10000"))
+        self.instance_id = uuid.uuid4().hex
+        self.broker = broker or LocalInvalidationBroker()
+        self._balances: TTLCache[tuple, object] = TTLCache(max_size=max_size, ttl=ttl)
+        # wallet id -> address never changes, so it can outlive the balances
+        self._addresses: TTLCache[str, str] = TTLCache(max_size=max_size, ttl=24 * 60 * 60)
+        self.broker.subscribe(BALANCES_TOPIC, self._on_invalidate)
+
+    def get_sol(self, address: str) -> Optional[float]:
+        return self._balances.get(("sol", address))
+
+    def set_sol(self, address: str, balance: float) -> None:
+        self._balances.set(("sol", address), balance)
+
+    def get_tokens(self, address: str) -> Optional[Dict[str, float]]:
+        tokens = self._balances.get(("tokens", address))
+        return dict(tokens) if tokens is not None else None
+
+    def set_tokens(self, address: str, tokens: Dict[str, float]) -> None:
+        self._balances.set(("tokens", address), dict(tokens))
+
+    def address_for_wallet(self, wallet_id: str) -> Optional[str]:
+        return self._addresses.get(str(wallet_id))
+
+    def remember_wallet(self, wallet_id: str, address: str) -> None:
+        self._addresses.set(str(wallet_id), address)
+
+    def evict(self, address: str) -> None:
+        """Drop cached balances for an address in this process only"""
+        self._balances.pop(("sol", address))
+        self._balances.pop(("tokens", address))
+
+    async def invalidate(self, address: str) -> None:
+        """
+        Drop cached balances for an address here and in every other subscribed process
+        """
+        self.evict(address)
+        await self.broker.publish(BALANCES_TOPIC, address, self.instance_id)
+
+    async def write_through(self, address: str, tokens: Dict[str, float]) -> None:
+        """
+        Store fresh token balances locally and invalidate stale copies elsewhere
+        """
+        self._balances.pop(("sol", address))
+        self.set_tokens(address, tokens)
+        await self.broker.publish(BALANCES_TOPIC, address, self.instance_id)
+
+    def _on_invalidate(self, address: str, origin: str) -> None:
+        # Our own writes were already applied locally
+        if origin != self.instance_id:
+            self.evict(address)
+
+    def stats(self) -> Dict[str, object]:
+        return self._balances.stats()
+
+
+# Process-wide balance cache shared by WalletService/TransactionService instances
+balance_cache: Optional[BalanceCache] = None
+
+
+def get_balance_cache() -> BalanceCache:
+    """
+    Returns the shared balance cache, creating it on first use
+    """
+    global balance_cache
+    if balance_cache is None:
+        balance_cache = BalanceCache()
+    return balance_cache
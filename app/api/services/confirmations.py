@@ -0,0 +1,291 @@
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+from datetime import datetime
+from solders.signature import Signature
+from solders.transaction_status import TransactionConfirmationStatus
+from ..models.transaction import Transaction, TransactionStatus
+from ..repositories.transaction import TransactionRepository
+from .transaction import TransactionService
+from .rpc import SolanaRPCGateway, MAX_SIGNATURE_STATUSES
+from .subscriptions import SubscriptionManager
+from dotenv import load_dotenv
+import asyncio
+import logging
+import os
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Called once with the settled transaction and its final status
+SettledCallback = Callable[[Transaction, TransactionStatus], Awaitable[None]]
+
+# Confirmation count reported for finalized transactions, where the node returns None
+FINALIZED_CONFIRMATIONS = 32
+
+
+class ConfirmationTracker:
+    """
+    Polls pending Solana transactions and records their on-chain status.
+
+    Each cycle collects the pending signatures that are due, resolves them with
+    batched getSignatureStatuses calls (up to 256 per request) and applies every
+    change with a single bulk write. Young transactions are checked every cycle;
+    older ones back off exponentially so a stuck backlog doesn't keep hammering the node.
+
+    Transactions passed to watch() are also settled by a websocket signature
+    subscription as soon as the node reports them; polling stays as the fallback
+    for signatures that settled while the socket was down. With watched_only, a
+    process polls just the signatures it is watching and leaves the rest of the
+    backlog to the process running the background workers.
+    """
+    def __init__(
+        self,
+        transaction_service: TransactionService,
+        rpc_gateway: SolanaRPCGateway,
+        subscriptions: Optional[SubscriptionManager] = None,
+        *,
+        interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        backoff_step: Optional[float] = None,
+        timeout: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        watched_only: bool = False
+    ):
+        """
+        Args:
+            transaction_service: Service used to invalidate balances of confirmed transactions
+            rpc_gateway: Shared RPC gateway
+            subscriptions: Websocket manager for push confirmations (polling only when None)
+            interval: Seconds between cycles and the poll interval for fresh transactions (CONFIRMATION_POLL_INTERVAL)
+            max_interval: Upper bound on a transaction's poll interval (CONFIRMATION_MAX_INTERVAL)
+            backoff_step: Age in seconds after which the poll interval doubles (CONFIRMATION_BACKOFF_STEP)
+            timeout: Age in seconds after which an unknown signature is marked failed (CONFIRMATION_TIMEOUT)
+            max_pending: Most pending transactions loaded per cycle (CONFIRMATION_MAX_PENDING)
+            watched_only: Poll only transactions passed to watch() instead of every pending one
+        """
+        self.service = transaction_service
+        self.repository: TransactionRepository = transaction_service.repository
+        self.rpc = rpc_gateway
+        self.subscriptions = subscriptions
+        self.interval = interval or float(os.getenv("CONFIRMATION_POLL_INTERVAL", "2"))
+        self.max_interval = max_interval or float(os.getenv("CONFIRMATION_MAX_INTERVAL", "60"))
+        self.backoff_step = backoff_step or float(os.getenv("CONFIRMATION_BACKOFF_STEP", "30"))
+        self.timeout = timeout or float(os.getenv("CONFIRMATION_TIMEOUT", "900"))
+        self.max_pending = max_pending or int(os.getenv("CONFIRMATION_MAX_PENDING", "5000"))
+        self.watched_only = watched_only
+
+        # tx_hash -> monotonic time of its next check
+        self._next_check: Dict[str, float] = {}
+        # tx_hash -> (subscription handle, settled callback) for watched transactions
+        self._watchers: Dict[str, Tuple[Optional[int], Optional[SettledCallback]]] = {}
+        self.last_run: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def watch(self, transaction: Transaction, on_settled: Optional[SettledCallback] = None) -> None:
+        """
+        Settles a pending transaction as soon as its signature is confirmed or fails.
+        on_settled runs exactly once, from whichever of push or polling sees the result first.
+        """
+        if not transaction.tx_hash:
+            raise ValueError("Only transactions with a signature can be watched")
+
+        async def on_notification(result: Dict[str, Any]) -> None:
+            if transaction.tx_hash not in self._watchers:
+                return  # polling got there first
+            value = result.get("value") or {}
+            status = TransactionStatus.FAILED if value.get("err") is not None else TransactionStatus.CONFIRMED
+            updated = await self.service.update_transaction_status(str(transaction.id), status)
+            self._next_check.pop(transaction.tx_hash, None)
+            await self._settle(updated or transaction, status)
+
+        handle = None
+        if self.subscriptions is not None:
+            handle = await self.subscriptions.subscribe_signature(transaction.tx_hash, on_notification)
+        self._watchers[transaction.tx_hash] = (handle, on_settled)
+
+    async def _settle(self, transaction: Transaction, status: TransactionStatus) -> None:
+        watcher = self._watchers.pop(transaction.tx_hash, None)
+        if watcher is None:
+            return
+        handle, on_settled = watcher
+        if handle is not None and self.subscriptions is not None:
+            await self.subscriptions.unsubscribe(handle)
+        if on_settled is not None:
+            try:
+                await on_settled(transaction, status)
+            except Exception as e:
+                logger.error(f"Settled callback failed for {transaction.tx_hash}: {str(e)}")
+
+    def poll_interval(self, age: float) -> float:
+        """
+        Seconds to wait before re-checking a transaction of the given age
+        """
+        doublings = min(int(max(age, 0) // self.backoff_step), 16)
+        return min(self.interval * (2 ** doublings), self.max_interval)
+
+    async def check_once(self) -> Dict[str, Any]:
+        """
+        Runs one polling cycle and returns counts of what changed
+        """
+        started = time.perf_counter()
+        if self.watched_only:
+            watched = list(self._watchers)
+            pending = await self.repository.get_pending_with_hash(limit=self.max_pending, tx_hashes=watched) if watched else []
+        else:
+            pending = await self.repository.get_pending_with_hash(limit=self.max_pending)
+        monotonic_now = time.monotonic()
+        due = [tx for tx in pending if self._next_check.get(tx.tx_hash, 0) <= monotonic_now]
+
+        # Forget schedules for transactions that are no longer pending
+        pending_hashes = {tx.tx_hash for tx in pending}
+        for tx_hash in list(self._next_check):
+            if tx_hash not in pending_hashes:
+                del self._next_check[tx_hash]
+        if self.watched_only:
+            await self._settle_resolved_elsewhere([h for h in watched if h not in pending_hashes])
+
+        statuses = await self._fetch_statuses(due)
+
+        now = datetime.utcnow()
+        updates: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        confirmed: List[Transaction] = []
+        failed: List[Transaction] = []
+        for tx in due:
+            age = (now - tx.created_at).total_seconds()
+            fields = self._resolve(tx, statuses.get(tx.tx_hash, _UNPARSEABLE), age, now)
+            if fields is None:
+                self._next_check[tx.tx_hash] = monotonic_now + self.poll_interval(age)
+                continue
+            fields["updated_at"] = now
+            updates.append(({"_id": tx.id, "status": TransactionStatus.PENDING.value}, {"$set": fields}))
+            status = fields.get("status")
+            if status == TransactionStatus.CONFIRMED.value:
+                confirmed.append(tx)
+                self._next_check.pop(tx.tx_hash, None)
+            elif status == TransactionStatus.FAILED.value:
+                failed.append(tx)
+                self._next_check.pop(tx.tx_hash, None)
+            else:
+                self._next_check[tx.tx_hash] = monotonic_now + self.poll_interval(age)
+
+        modified = await self.repository.bulk_update(updates)
+        for tx in confirmed:
+            await self.service.invalidate_balances(tx)
+            await self._settle(tx, TransactionStatus.CONFIRMED)
+        for tx in failed:
+            await self._settle(tx, TransactionStatus.FAILED)
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        self.last_run = {
+            "pending": len(pending),
+            "checked": len(due),
+            "confirmed": len(confirmed),
+            "failed": len(failed),
+            "modified": modified,
+            "duration_ms": round(duration_ms, 2),
+            "finished_at": now,
+        }
+        if due:
+            logger.info(
+                f"Checked {len(due)}/{len(pending)} pending transactions in {duration_ms:.1f}ms: "
+                f"{len(confirmed)} confirmed, {len(failed)} failed"
+            )
+        return self.last_run
+
+    async def _settle_resolved_elsewhere(self, tx_hashes: List[str]) -> None:
+        """
+        Runs the callbacks of watched transactions another process has already settled
+        """
+        for tx_hash in tx_hashes:
+            transaction = await self.repository.get_by_tx_hash(tx_hash)
+            if transaction is None or transaction.status == TransactionStatus.PENDING:
+                continue
+            await self._settle(transaction, transaction.status)
+
+    async def _fetch_statuses(self, transactions: List[Transaction]) -> Dict[str, Any]:
+        """
+        Resolves signature statuses in batches; hashes that aren't valid signatures are left out
+        """
+        signatures: List[Signature] = []
+        for tx in transactions:
+            try:
+                signatures.append(Signature.from_string(tx.tx_hash))
+            except ValueError:
+                logger.warning(f"Transaction {tx.id} has an invalid signature: {tx.tx_hash}")
+
+        batches = [
+            signatures[i:i + MAX_SIGNATURE_STATUSES]
+            for i in range(0, len(signatures), MAX_SIGNATURE_STATUSES)
+        ]
+        results = await asyncio.gather(
+            *(self.rpc.get_signature_statuses(batch, search_transaction_history=True) for batch in batches)
+        )
+
+        statuses: Dict[str, Any] = {}
+        for batch, values in zip(batches, results):
+            for signature, status in zip(batch, values):
+                statuses[str(signature)] = status
+        return statuses
+
+    def _resolve(self, tx: Transaction, status: Any, age: float, now: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Maps a signature status to the fields to set, or None when there is nothing to record yet
+        """
+        if status is _UNPARSEABLE:
+            return {"status": TransactionStatus.FAILED.value}
+
+        if status is None:
+            # Not seen by the node; once the blockhash has long expired it never will be
+            if age > self.timeout:
+                return {"status": TransactionStatus.FAILED.value}
+            return None
+
+        if status.err is not None:
+            return {"status": TransactionStatus.FAILED.value}
+
+        if status.confirmation_status == TransactionConfirmationStatus.Finalized:
+            confirmations = FINALIZED_CONFIRMATIONS
+        else:
+            confirmations = status.confirmations or 0
+
+        if status.confirmation_status in (TransactionConfirmationStatus.Confirmed, TransactionConfirmationStatus.Finalized):
+            return {
+                "status": TransactionStatus.CONFIRMED.value,
+                "confirmations": confirmations,
+                "confirmed_at": now,
+            }
+
+        if confirmations != tx.confirmations:
+            return {"confirmations": confirmations}
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check_once()
+            except Exception as e:
+                logger.error(f"Confirmation check failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start polling in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Confirmation tracker started (every {self.interval:.0f}s)")
+
+    async def stop(self) -> None:
+        """Cancel the background polling and wait for it to finish."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._task = None
+            logger.info("Confirmation tracker stopped")
+
+
+# Marker for pending transactions whose tx_hash can't be parsed as a signature
+_UNPARSEABLE = object()
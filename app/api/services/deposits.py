@@ -0,0 +1,371 @@
+from typing import Any, Dict, List, Optional, Tuple
+from functools import partial
+from solders.pubkey import Pubkey
+from beanie import PydanticObjectId
+from ..models.wallet import Chain, WalletSummary
+from ..models.transaction import TransactionType
+from .wallet import WalletService, STABLECOIN_MINTS
+from .transaction import TransactionService
+from .rpc import SolanaRPCGateway
+from .subscriptions import SubscriptionManager
+from .spl import get_associated_token_address, decode_token_amount
+from .cache import TTLCache
+from dotenv import load_dotenv
+import asyncio
+import base64
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def account_delta(transaction: Any, address: str, mint: Optional[str]) -> int:
+    """
+    Raw change one confirmed transaction (fetched with base64 encoding) made to an account's
+    lamports, or to its token amount when mint is given; 0 if it failed or didn't touch the account
+    """
+    meta = transaction.transaction.meta
+    if meta is None or meta.err is not None:
+        return 0
+    keys = [str(key) for key in transaction.transaction.transaction.message.account_keys]
+    if meta.loaded_addresses is not None:
+        keys += [str(key) for key in meta.loaded_addresses.writable]
+        keys += [str(key) for key in meta.loaded_addresses.readonly]
+    if address not in keys:
+        return 0
+    index = keys.index(address)
+    if mint is None:
+        return meta.post_balances[index] - meta.pre_balances[index]
+
+    def token_amount(balances: Any) -> int:
+        for balance in balances or []:
+            if balance.account_index == index and str(balance.mint) == mint:
+                return int(balance.ui_token_amount.amount)
+        return 0
+
+    return token_amount(meta.post_token_balances) - token_amount(meta.pre_token_balances)
+
+
+class _WatchedAccount:
+    """One account whose balance increases count as deposits to a wallet"""
+    __slots__ = ("wallet_id", "user_id", "owner", "symbol", "mint", "decimals", "raw_balance", "lock")
+
+    def __init__(self, wallet: WalletSummary, symbol: str, mint: Optional[str], decimals: int, balance: float):
+        self.wallet_id = str(wallet.id)
+        self.user_id = str(wallet.user_id)
+        self.owner = wallet.address
+        self.symbol = symbol
+        self.mint = mint
+        self.decimals = decimals
+        # Last balance accounted for, in the smallest unit so deltas compare exactly
+        self.raw_balance = round(balance * 10 ** decimals)
+        # Notifications for one account are applied in order
+        self.lock = asyncio.Lock()
+
+    def ui_amount(self, raw: int) -> float:
+        return raw / 10 ** self.decimals
+
+
+class DepositWatcher:
+    """
+    Detects incoming SOL, USDC and USDT for every Solana wallet.
+
+    Each wallet contributes three accounts (its system account and both stablecoin
+    ATAs), subscribed with accountSubscribe and spread over as many websocket
+    connections as needed to stay under DEPOSIT_SUBSCRIPTIONS_PER_CONNECTION each.
+    A notification whose balance exceeds the last known one is a deposit. The account's
+    recent signatures are walked newest first and each transaction that increased the
+    account is recorded as a RECEIVE for its own amount, until the increase is accounted
+    for; signatures already seen or on record (e.g. /buy swaps) are skipped. If recording
+    fails, the unrecorded part of the increase is handed back and the account is re-read
+    from the chain with backoff, so a deposit is never dropped by a transient error.
+    Wallets are loaded in keyset pages at startup and new ones are picked up periodically.
+    """
+    def __init__(
+        self,
+        wallet_service: WalletService,
+        transaction_service: TransactionService,
+        rpc_gateway: SolanaRPCGateway,
+        *,
+        ws_url: Optional[str] = None,
+        subscriptions_per_connection: Optional[int] = None,
+        page_size: Optional[int] = None,
+        refresh_interval: Optional[float] = None,
+        signature_lookback: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        max_retry_delay: Optional[float] = None
+    ):
+        """
+        Args:
+            wallet_service: Service used for initial balances and Wallet.tokens updates
+            transaction_service: Service deposits are recorded through
+            rpc_gateway: Shared RPC gateway for signature lookups
+            ws_url: Websocket endpoint passed to every shard
+            subscriptions_per_connection: Account subscriptions per websocket (DEPOSIT_SUBSCRIPTIONS_PER_CONNECTION)
+            page_size: Wallets loaded per page (DEPOSIT_WALLET_PAGE_SIZE)
+            refresh_interval: Seconds between scans for new wallets (DEPOSIT_WALLET_REFRESH_INTERVAL)
+            signature_lookback: Recent signatures searched to attribute a deposit (DEPOSIT_SIGNATURE_LOOKBACK)
+            retry_delay: First delay in seconds before re-reading an account after a failure (DEPOSIT_RETRY_DELAY)
+            max_retry_delay: Longest delay between re-reads (DEPOSIT_MAX_RETRY_DELAY)
+        """
+        self.wallet_service = wallet_service
+        self.transaction_service = transaction_service
+        self.rpc = rpc_gateway
+        self.ws_url = ws_url
+        self.subscriptions_per_connection = subscriptions_per_connection or int(os.getenv("DEPOSIT_SUBSCRIPTIONS_PER_CONNECTION", "5000"))
+        self.page_size = page_size or int(os.getenv("DEPOSIT_WALLET_PAGE_SIZE", "1000"))
+        self.refresh_interval = refresh_interval or float(os.getenv("DEPOSIT_WALLET_REFRESH_INTERVAL", "30"))
+        self.signature_lookback = signature_lookback or int(os.getenv("DEPOSIT_SIGNATURE_LOOKBACK", "20"))
+        self.retry_delay = retry_delay or float(os.getenv("DEPOSIT_RETRY_DELAY", "2"))
+        self.max_retry_delay = max_retry_delay or float(os.getenv("DEPOSIT_MAX_RETRY_DELAY", "300"))
+
+        self.shards: List[SubscriptionManager] = []
+        self._shard_load: List[int] = []
+        # account address -> what a balance change on it means
+        self._accounts: Dict[str, _WatchedAccount] = {}
+        self._last_wallet_id: Optional[PydanticObjectId] = None
+        self._seen_signatures: TTLCache[str, bool] = TTLCache(
+            max_size=int(os.getenv("DEPOSIT_SEEN_SIGNATURES", "100000")),
+            ttl=24 * 60 * 60
+        )
+        self.deposits = 0
+        self.unattributed = 0
+        self._task: Optional[asyncio.Task] = None
+        # address -> pending re-read after a failure, and how many failures in a row it has seen
+        self._resyncs: Dict[str, asyncio.Task] = {}
+        self._resync_attempts: Dict[str, int] = {}
+
+    def _next_shard(self) -> SubscriptionManager:
+        if not self.shards or self._shard_load[-1] >= self.subscriptions_per_connection:
+            manager = SubscriptionManager(self.ws_url, name=f"deposits-{len(self.shards)}")
+            manager.start()
+            self.shards.append(manager)
+            self._shard_load.append(0)
+        self._shard_load[-1] += 1
+        return self.shards[-1]
+
+    async def load_new_wallets(self) -> int:
+        """
+        Subscribes every Solana wallet created since the last scan; returns how many were added
+        """
+        added = 0
+        while True:
+            wallets = await self.wallet_service.repository.get_summaries_after(
+                Chain.SOLANA.value, self._last_wallet_id, self.page_size
+            )
+            if not wallets:
+                break
+            await self._watch_wallets(wallets)
+            self._last_wallet_id = wallets[-1].id
+            added += len(wallets)
+            if len(wallets) < self.page_size:
+                break
+        if added:
+            logger.info(f"Deposit watcher now covers {len(self._accounts)} accounts on {len(self.shards)} connections")
+        return added
+
+    async def _watch_wallets(self, wallets: List[WalletSummary]) -> None:
+        valid = []
+        for wallet in wallets:
+            try:
+                valid.append((wallet, Pubkey.from_string(wallet.address)))
+            except ValueError:
+                logger.warning(f"Skipping wallet {wallet.id} with invalid address {wallet.address}")
+        if not valid:
+            return
+
+        balances = await self.wallet_service.get_balances([wallet.address for wallet, _ in valid])
+        for wallet, owner in valid:
+            balance = balances[wallet.address]
+            accounts = {wallet.address: _WatchedAccount(wallet, "sol", None, 9, balance["sol"])}
+            for symbol, (mint, decimals) in STABLECOIN_MINTS.items():
+                ata = str(get_associated_token_address(owner, Pubkey.from_string(mint)))
+                accounts[ata] = _WatchedAccount(wallet, symbol.value, mint, decimals, balance[symbol.value])
+
+            for address, watched in accounts.items():
+                if address in self._accounts:
+                    continue
+                self._accounts[address] = watched
+                await self._next_shard().subscribe_account(address, partial(self._on_account, address))
+
+    async def _on_account(self, address: str, result: Dict[str, Any]) -> None:
+        watched = self._accounts.get(address)
+        if watched is None:
+            return
+        value = result.get("value")
+        if not value:
+            raw = 0
+        elif watched.mint is None:
+            raw = value["lamports"]
+        else:
+            data = base64.b64decode(value["data"][0])
+            raw = decode_token_amount(data) if data else 0
+        await self._apply(address, watched, raw)
+
+    async def _apply(self, address: str, watched: _WatchedAccount, raw: int) -> None:
+        """
+        Records whatever deposits moved the account from its last known balance to raw
+        """
+        async with watched.lock:
+            claimed = raw - watched.raw_balance
+            watched.raw_balance = raw
+            recorded = 0
+            try:
+                if claimed > 0:
+                    for signature, amount in await self._attribute(address, watched, claimed):
+                        await self._record_deposit(signature, watched, amount)
+                        recorded += amount
+                await self._sync_balance(watched, watched.ui_amount(raw))
+            except Exception as e:
+                # Hand back what wasn't recorded so the next read of the account picks it up
+                watched.raw_balance -= max(claimed - recorded, 0)
+                logger.error(f"Deposit check for {address} failed, will re-read it: {str(e)}")
+                self._schedule_resync(address)
+                return
+        self._resync_attempts.pop(address, None)
+
+    async def _attribute(self, address: str, watched: _WatchedAccount, claimed: int) -> List[Tuple[str, int]]:
+        """
+        Newest-first (signature, raw amount) pairs of unseen transactions that increased the
+        account, covering up to `claimed`
+        """
+        statuses = await self.rpc.get_signatures_for_address(Pubkey.from_string(address), limit=self.signature_lookback)
+        found: List[Tuple[str, int]] = []
+        remaining = claimed
+        for status in statuses:
+            if remaining <= 0:
+                break
+            signature = str(status.signature)
+            if status.err is not None or signature in self._seen_signatures:
+                continue
+            transaction = await self.rpc.get_transaction(
+                status.signature, encoding="base64", max_supported_transaction_version=0
+            )
+            if transaction is None:
+                continue
+            amount = account_delta(transaction, address, watched.mint)
+            if amount <= 0:
+                continue
+            found.append((signature, amount))
+            remaining -= amount
+        if remaining > 0:
+            self.unattributed += 1
+            logger.warning(
+                f"Could not attribute {watched.ui_amount(remaining)} {watched.symbol.upper()} of a deposit to "
+                f"{address} within its last {self.signature_lookback} signatures"
+            )
+        return found
+
+    async def _sync_balance(self, watched: _WatchedAccount, balance: float) -> None:
+        if watched.mint is None:
+            self.wallet_service.balance_cache.set_sol(watched.owner, balance)
+            return
+        try:
+            await self.wallet_service.update_token_balance(watched.wallet_id, watched.symbol, balance)
+        except ValueError:
+            # Wallets created before the stablecoins were seeded don't hold the token yet
+            await self.wallet_service.add_token_to_wallet(watched.wallet_id, {
+                "symbol": watched.symbol,
+                "balance": balance,
+                "contract_address": watched.mint,
+                "decimals": watched.decimals,
+            })
+
+    async def _record_deposit(self, signature: str, watched: _WatchedAccount, raw_amount: int) -> bool:
+        """Records one deposit; returns False if the signature was already on record as something else"""
+        if signature in self._seen_signatures:
+            return False
+        self._seen_signatures.set(signature, True)
+        amount = watched.ui_amount(raw_amount)
+        try:
+            # Idempotent per signature: swaps and transfers this app initiated keep their own record
+            transaction = await self.transaction_service.record_transaction(
+                watched.user_id,
+                TransactionType.RECEIVE,
+                Chain.SOLANA.value,
+                tx_hash=signature,
+                to_address=watched.owner,
+                token_address=watched.mint,
+                token_symbol=watched.symbol.upper(),
+                amount=f"{amount:.{watched.decimals}f}"
+            )
+        except Exception:
+            # Let the re-read retry the signature
+            self._seen_signatures.pop(signature)
+            raise
+        if transaction.tx_type != TransactionType.RECEIVE:
+            return False
+        self.deposits += 1
+        logger.info(f"Recorded deposit of {amount} {watched.symbol.upper()} to {watched.owner} ({signature})")
+        return True
+
+    def _schedule_resync(self, address: str) -> None:
+        task = self._resyncs.get(address)
+        if task is not None and not task.done():
+            return
+        attempt = self._resync_attempts.get(address, 0)
+        self._resync_attempts[address] = attempt + 1
+        delay = min(self.max_retry_delay, self.retry_delay * (2 ** attempt))
+        self._resyncs[address] = asyncio.create_task(self._resync(address, delay))
+
+    async def _resync(self, address: str, delay: float) -> None:
+        """Re-reads an account from the chain after a failure and applies the change"""
+        await asyncio.sleep(delay)
+        self._resyncs.pop(address, None)
+        watched = self._accounts[address]
+        try:
+            account = (await self.rpc.get_multiple_accounts([Pubkey.from_string(address)]))[0]
+        except Exception as e:
+            logger.error(f"Re-reading {address} failed: {str(e)}")
+            self._schedule_resync(address)
+            return
+        if account is None:
+            raw = 0
+        elif watched.mint is None:
+            raw = account.lamports
+        else:
+            raw = decode_token_amount(account.data)
+        await self._apply(address, watched, raw)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.load_new_wallets()
+            except Exception as e:
+                logger.error(f"Deposit watcher wallet scan failed: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """Load wallets and keep watching for new ones in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Deposit watcher started")
+
+    async def stop(self) -> None:
+        """Stop scanning and close every websocket shard."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._task = None
+        for task in self._resyncs.values():
+            task.cancel()
+        await asyncio.gather(*self._resyncs.values(), return_exceptions=True)
+        self._resyncs.clear()
+        await asyncio.gather(*(shard.stop() for shard in self.shards))
+        logger.info("Deposit watcher stopped")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "wallets_loaded_through": str(self._last_wallet_id) if self._last_wallet_id else None,
+            "accounts": len(self._accounts),
+            "connections": len(self.shards),
+            "deposits": self.deposits,
+            "unattributed": self.unattributed,
+            "pending_resyncs": len(self._resyncs),
+        }
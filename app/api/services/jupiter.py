@@ -0,0 +1,230 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from .cache import TTLCache, SingleFlight
+import httpx
+import asyncio
+import logging
+import random
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+QuoteKey = Tuple[str, str, int, int]
+
+
+class QuoteCache:
+    """
+    Short-TTL cache for Jupiter quotes with single-flight coalescing, so identical
+    concurrent quote requests share one upstream call.
+
+    Quotes are keyed on the exact input amount: a cached quote is handed to /swap
+    unchanged, so it must be for precisely the amount the caller will trade.
+    """
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        *,
+        max_size: Optional[int] = None
+    ):
+        """
+        Args:
+            ttl: Seconds a quote stays fresh; 0 disables caching (defaults to JUPITER_QUOTE_TTL)
+            max_size: Maximum number of cached quotes
+        """
+        self.ttl = ttl if ttl is not None else float(os.getenv("JUPITER_QUOTE_TTL", "1.0"))
+        max_size = max_size or int(os.getenv("JUPITER_QUOTE_CACHE_SIZE", "1024"))
+        self._cache: TTLCache[QuoteKey, Dict] = TTLCache(max_size=max_size, ttl=max(self.ttl, 0.001))
+        self._flight: SingleFlight[QuoteKey, Dict] = SingleFlight()
+
+    async def get_or_fetch(
+        self,
+        input_mint: str,
+        output_mint: str,
+        amount: int,
+        slippage_bps: int,
+        fetch: Callable[[], Awaitable[Dict]]
+    ) -> Dict:
+        """
+        Return a fresh cached quote for exactly this amount, or call fetch() once for all concurrent callers
+        """
+        if self.ttl <= 0:
+            return await fetch()
+
+        key = (input_mint, output_mint, amount, slippage_bps)
+        quote = self._cache.get(key)
+        if quote is not None:
+            return quote
+
+        async def load() -> Dict:
+            quote = await fetch()
+            self._cache.set(key, quote)
+            return quote
+
+        return await self._flight.do(key, load)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for tuning the TTL"""
+        stats = self._cache.stats()
+        stats["coalesced"] = self._flight.coalesced
+        stats["ttl"] = self.ttl
+        return stats
+
+
+class JupiterClient:
+    """
+    Async Jupiter quote/swap API client with a persistent HTTP/2 session,
+    timeouts, jittered retry and a cap on concurrent upstream requests
+    """
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        *,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        backoff_base: float = 0.2,
+        backoff_max: float = 5.0,
+        quote_cache: Optional[QuoteCache] = None
+    ):
+        """
+        Args:
+            base_url: Jupiter API root (defaults to JUPITER_API_URL)
+            timeout: Per-request timeout in seconds
+            max_retries: Retries after the first attempt for transport errors, 429 and 5xx
+            max_concurrency: Maximum upstream requests in flight at once
+            backoff_base: First retry delay ceiling in seconds, doubled on each attempt
+            backoff_max: Upper bound for a single retry delay
+            quote_cache: Cache for quotes (a default QuoteCache is created if omitted)
+        """
+        self.base_url = base_url or os.getenv("JUPITER_API_URL", "https://quote-api.jup.ag/v6")
+        self.timeout = timeout if timeout is not None else float(os.getenv("JUPITER_TIMEOUT", "10"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("JUPITER_MAX_RETRIES", "3"))
+        max_concurrency = max_concurrency or int(os.getenv("JUPITER_MAX_CONCURRENCY", "16"))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.quote_cache = quote_cache or QuoteCache()
+
+        self._session = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=True,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            headers={"Accept": "application/json"},
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def get_quote(
+        self,
+        input_mint: str,
+        output_mint: str,
+        amount: int,
+        slippage_bps: int = 50,
+        *,
+        use_cache: bool = True
+    ) -> Dict:
+        """
+        Get a quote for swapping tokens, served from the quote cache when fresh
+
+        Raises:
+            httpx.HTTPError: If the request still fails after retries
+        """
+        async def fetch() -> Dict:
+            params = {
+                "inputMint": input_mint,
+                "outputMint": output_mint,
+                "amount": amount,
+                "slippageBps": slippage_bps,
+                "onlyDirectRoutes": "false",
+                "asLegacyTransaction": "false"
+            }
+            return await self._request("GET", "/quote", params=params)
+
+        if not use_cache:
+            return await fetch()
+        return await self.quote_cache.get_or_fetch(input_mint, output_mint, amount, slippage_bps, fetch)
+
+    async def get_swap(self, quote: Dict, user_public_key: str) -> Dict:
+        """
+        Get a serialized swap transaction for a quote
+
+        Raises:
+            httpx.HTTPError: If the request still fails after retries
+        """
+        payload = {
+            "quoteResponse": quote,
+            "userPublicKey": user_public_key,
+            "wrapAndUnwrapSol": True,
+            "dynamicComputeUnitLimit": True,
+            "prioritizationFeeLamports": "auto"
+        }
+        return await self._request("POST", "/swap", json=payload)
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await self._session.request(method, path, **kwargs)
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+                delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                logger.warning(f"Jupiter {method} {path} returned {response.status_code}, retrying in {delay:.2f}s")
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning(f"Jupiter {method} {path} failed ({e!r}), retrying in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than an explicit Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except ValueError:
+                pass
+        return delay
+
+    async def close(self) -> None:
+        await self._session.aclose()
+
+
+# Process-wide client, created in the application lifespan
+jupiter_client: Optional[JupiterClient] = None
+
+
+async def init_jupiter_client() -> JupiterClient:
+    """Create the shared Jupiter client."""
+    global jupiter_client
+    if jupiter_client is None:
+        jupiter_client = JupiterClient()
+        logger.info("Jupiter client initialised")
+    return jupiter_client
+
+
+async def close_jupiter_client() -> None:
+    """Close the shared Jupiter client and its HTTP session."""
+    global jupiter_client
+    if jupiter_client is not None:
+        try:
+            await jupiter_client.close()
+            logger.info("Jupiter client closed")
+        finally:
+            jupiter_client = None
+
+
+def get_jupiter_client() -> JupiterClient:
+    """
+    Returns the shared Jupiter client, creating it lazily outside the app lifespan
+    """
+    global jupiter_client
+    if jupiter_client is None:
+        jupiter_client = JupiterClient()
+    return jupiter_client
@@ -1,17 +1,59 @@
-from typing import Optional ,List
-from datetime import datetime
-from ..models.paymentlink import PaymentLink
+from typing import Callable, Optional ,List
+from datetime import datetime, timedelta
+from ..models.paymentlink import PaymentLink, Status as PaymentLinkStatus
 from ..repositories.paymentlink import PaymentLinkRepository
+from .cache import TTLCache
+from .balancecache import InvalidationBroker, LocalInvalidationBroker
 from pydantic import HttpUrl
+from dotenv import load_dotenv
 import secrets
 import logging
+import os
+import uuid
 from beanie.odm.fields import PydanticObjectId
 
+load_dotenv()
+
 logger = logging.getLogger(__name__)
 
+# Cached in place of a link to remember that an id doesn't exist
+_NOT_FOUND = object()
+
+# Topic link ids are invalidated on, when the broker is shared with other caches
+INVALIDATION_TOPIC = "payment_links"
+
 class PaymentLinkService:
-    def __init__(self, payment_link_repo: PaymentLinkRepository):
+    def __init__(
+        self,
+        payment_link_repo: PaymentLinkRepository,
+        cache: Optional[TTLCache] = None,
+        broker: Optional[InvalidationBroker] = None
+    ):
+        """
+        Args:
+            payment_link_repo: Payment link repository
+            cache: link_id -> active link cache (defaults to an LRU sized by PAYMENT_LINK_CACHE_SIZE
+                   with PAYMENT_LINK_CACHE_TTL seconds per entry)
+            broker: Channel that evicts links paid, cancelled or created by other services on it.
+                    The default, like every broker shipped today, is in-process only, which leaves
+                    the cache TTL as the bound on staleness across processes.
+        """
         self.repository = payment_link_repo
+        self.cache = cache or TTLCache(
+            max_size=int(os.getenv("PAYMENT_LINK_CACHE_SIZE", "10000")),
+            # Bounds how long another process can show a paid or cancelled link as active
+            ttl=float(os.getenv("PAYMENT_LINK_CACHE_TTL", "10"))
+        )
+        # Short, so a link created by another process becomes visible quickly
+        self.negative_ttl = float(os.getenv("PAYMENT_LINK_NEGATIVE_TTL", "5"))
+        self.instance_id = uuid.uuid4().hex
+        self.broker = broker or LocalInvalidationBroker()
+        self.broker.subscribe(INVALIDATION_TOPIC, self._on_invalidate)
+        self._paid_listeners: List[Callable[[PaymentLink], None]] = []
+
+    def on_paid(self, listener: Callable[[PaymentLink], None]) -> None:
+        """Registers a callback run with each link this service marks as paid"""
+        self._paid_listeners.append(listener)
 
     async def create_payment_link(
         self,
@@ -54,6 +96,7 @@ class PaymentLinkService:
 
         try:
             created_link = await self.repository.create(payment_link)
+            await self._invalidate(link_id)
             logger.info(f"Created payment link {link_id} for merchant {merchant_user_id}")
             return created_link
         except Exception as e:
@@ -62,13 +105,28 @@ class PaymentLinkService:
 
     async def get_payment_link(self, link_id: str) -> Optional[PaymentLink]:
         """
-        Retrieves a payment link by its ID
+        Retrieves a payment link by its ID.
+        Active links and unknown ids are served from the cache; a cached link is
+        never served past its expires_at.
         """
+        cached = self.cache.get(link_id)
+        if cached is _NOT_FOUND:
+            return None
+        if cached is not None:
+            if not self._is_link_expired(cached):
+                return cached
+            self.cache.pop(link_id)
+
         try:
             link = await self.repository.get_by_link_id(link_id)
-            if link and self._is_link_expired(link):
+            if link is None:
+                self.cache.set(link_id, _NOT_FOUND, ttl=self.negative_ttl)
+                return None
+            if self._is_link_expired(link):
                 await self._handle_expired_link(link)
                 return None
+            if link.status == PaymentLinkStatus.ACTIVE:
+                self.cache.set(link_id, link, ttl=self._cache_ttl(link))
             return link
         except Exception as e:
             logger.error(f"Error fetching payment link {link_id}: {str(e)}")
@@ -79,9 +137,12 @@ class PaymentLinkService:
         link_id: str,
         tx_hash: str,
         paid_by_user_id: str
-    ) -> Optional[PaymentLink]:
+    ) -> PaymentLink:
         """
         Marks a payment link as paid and records transaction details
+
+        Raises:
+            ValueError: If the link is unknown, expired or no longer active
         """
         try:
             link = await self.get_payment_link(link_id)
@@ -96,7 +157,13 @@ class PaymentLinkService:
                 tx_hash,
                 paid_by_user_id
             )
-            
+            await self._invalidate(link_id)
+            if updated_link is None:
+                # Paid, cancelled or expired since it was cached, possibly by another process
+                raise ValueError("Payment link is no longer active, cannot mark as paid")
+            for listener in self._paid_listeners:
+                listener(updated_link)
+
             logger.info(f"Payment link {link_id} marked as paid with tx {tx_hash}")
             return updated_link
         except ValueError as e:
@@ -119,6 +186,9 @@ class PaymentLinkService:
                 raise ValueError(f"Cannot cancel link with status {link.status}")
                 
             cancelled_link = await self.repository.cancel_link(link_id)
+            await self._invalidate(link_id)
+            if cancelled_link is None:
+                raise ValueError("Payment link is no longer active, cannot cancel")
             logger.info(f"Cancelled payment link {link_id}")
             return cancelled_link
         except ValueError as e:
@@ -150,14 +220,7 @@ class PaymentLinkService:
         Returns count of expired links
         """
         try:
-            expired_links = await self.repository.get_expired_links()
-            count = 0
-            for link in expired_links:
-                await self.repository.update(
-                    link.id,
-                    {"$set": {"status": PaymentLinkStatus.EXPIRED}}
-                )
-                count += 1
+            count = await self.repository.expire_links()
             logger.info(f"Processed {count} expired payment links")
             return count
         except Exception as e:
@@ -172,12 +235,32 @@ class PaymentLinkService:
             and link.status == PaymentLinkStatus.ACTIVE
         )
 
+    def _cache_ttl(self, link: PaymentLink) -> float:
+        """Cache lifetime for an active link, capped at its remaining validity"""
+        if link.expires_at is None:
+            return self.cache.ttl
+        return min(self.cache.ttl, (link.expires_at - datetime.utcnow()).total_seconds())
+
+    async def _invalidate(self, link_id: str) -> None:
+        """Drop a cached link here and in every other service subscribed to the broker"""
+        self.cache.pop(link_id)
+        try:
+            await self.broker.publish(INVALIDATION_TOPIC, link_id, self.instance_id)
+        except Exception as e:
+            # Other subscribers fall back to the cache TTL
+            logger.error(f"Failed to publish invalidation for payment link {link_id}: {str(e)}")
+
+    def _on_invalidate(self, link_id: str, origin: str) -> None:
+        if origin != self.instance_id:
+            self.cache.pop(link_id)
+
     async def _handle_expired_link(self, link: PaymentLink) -> None:
         """Automatically expire links when fetched if needed"""
+        await self._invalidate(link.link_id)
         try:
             await self.repository.update(
                 link.id,
-                {"$set": {"status": PaymentLinkStatus.EXPIRED}}
+                {"$set": {"status": PaymentLinkStatus.EXPIRED, "expired_at": datetime.utcnow()}}
             )
             logger.info(f"Auto-expired payment link {link.link_id}")
         except Exception as e:
@@ -0,0 +1,175 @@
+from typing import Any, List, Optional
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.commitment import Commitment, Confirmed
+from solana.rpc.types import TxOpts
+from solana.rpc.providers.async_http import AsyncHTTPProvider
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from dotenv import load_dotenv
+import httpx
+import asyncio
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Node-side limit on keys per getMultipleAccounts request
+MAX_MULTIPLE_ACCOUNTS = 100
+# Node-side limit on signatures per getSignatureStatuses request
+MAX_SIGNATURE_STATUSES = 256
+
+
+class SolanaRPCGateway:
+    """
+    Shared async Solana RPC client with keep-alive pooling, a concurrency cap and per-call timeouts
+    """
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        *,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        commitment: Commitment = Confirmed
+    ):
+        """
+        Args:
+            endpoint: Solana RPC endpoint URL (defaults to SOLANA_RPC_URL)
+            max_connections: Upper bound on open HTTP connections to the node
+            max_keepalive_connections: Idle connections kept warm between calls
+            max_concurrency: Maximum RPC calls in flight at once
+            timeout: Default per-call timeout in seconds
+            commitment: Default commitment level for reads
+        """
+        self.endpoint = endpoint or os.getenv("SOLANA_RPC_URL")
+        self.timeout = timeout if timeout is not None else float(os.getenv("SOLANA_RPC_TIMEOUT", "10"))
+        max_connections = max_connections or int(os.getenv("SOLANA_RPC_MAX_CONNECTIONS", "50"))
+        max_keepalive_connections = max_keepalive_connections or int(os.getenv("SOLANA_RPC_MAX_KEEPALIVE", "20"))
+        max_concurrency = max_concurrency or int(os.getenv("SOLANA_RPC_MAX_CONCURRENCY", "32"))
+
+        self.client = AsyncClient(self.endpoint, commitment=commitment, timeout=self.timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self._pool_installed = False
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(self, method: str, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Invoke an AsyncClient method under the concurrency cap and a timeout
+
+        Args:
+            method: Name of the AsyncClient method, e.g. "get_balance"
+            timeout: Overrides the default per-call timeout
+        Raises:
+            asyncio.TimeoutError: If the node doesn't answer in time
+        """
+        if not self._pool_installed:
+            await self._install_pool()
+        async with self._semaphore:
+            return await asyncio.wait_for(
+                getattr(self.client, method)(*args, **kwargs),
+                timeout=timeout or self.timeout
+            )
+
+    async def _install_pool(self) -> None:
+        """
+        Swaps the provider's default-sized httpx session for one sized for the deployment.
+        solana-py has no option for pool limits, so this reaches into the client's provider;
+        if that ever changes shape the library's default pool is kept instead.
+        """
+        # Set before awaiting so concurrent first calls install only one pool
+        self._pool_installed = True
+        provider = getattr(self.client, "_provider", None)
+        if not isinstance(provider, AsyncHTTPProvider):
+            logger.warning("Solana client has no HTTP provider to resize; using its default connection pool")
+            return
+        default_session = provider.session
+        provider.session = httpx.AsyncClient(timeout=self.timeout, limits=self._limits)
+        await default_session.aclose()
+
+    async def get_balance(self, pubkey: Pubkey, **kwargs: Any) -> int:
+        """
+        Returns the lamport balance of an account
+        """
+        response = await self.call("get_balance", pubkey, **kwargs)
+        return response.value
+
+    async def get_multiple_accounts(self, pubkeys: List[Pubkey], **kwargs: Any) -> List[Any]:
+        """
+        Fetches up to 100 accounts in one call; missing accounts come back as None
+        """
+        if len(pubkeys) > MAX_MULTIPLE_ACCOUNTS:
+            raise ValueError(f"getMultipleAccounts accepts at most {MAX_MULTIPLE_ACCOUNTS} accounts")
+        response = await self.call("get_multiple_accounts", pubkeys, **kwargs)
+        return response.value
+
+    async def get_signature_statuses(self, signatures: List[Signature], **kwargs: Any) -> List[Any]:
+        """
+        Fetches up to 256 signature statuses in one call; unknown signatures come back as None
+        """
+        if len(signatures) > MAX_SIGNATURE_STATUSES:
+            raise ValueError(f"getSignatureStatuses accepts at most {MAX_SIGNATURE_STATUSES} signatures")
+        response = await self.call("get_signature_statuses", signatures, **kwargs)
+        return response.value
+
+    async def get_signatures_for_address(self, address: Pubkey, **kwargs: Any) -> List[Any]:
+        """
+        Newest-first signatures that touched an account (accepts before/until/limit)
+        """
+        response = await self.call("get_signatures_for_address", address, **kwargs)
+        return response.value
+
+    async def get_transaction(self, signature: Signature, **kwargs: Any) -> Any:
+        """
+        Fetches a confirmed transaction with its status meta; None if the node doesn't have it
+        """
+        response = await self.call("get_transaction", signature, **kwargs)
+        return response.value
+
+    async def get_token_accounts_by_owner(self, owner: Pubkey, opts: Any, **kwargs: Any) -> Any:
+        return await self.call("get_token_accounts_by_owner", owner, opts, **kwargs)
+
+    async def send_raw_transaction(self, txn: bytes, opts: Optional[TxOpts] = None, **kwargs: Any) -> Any:
+        return await self.call("send_raw_transaction", txn, opts, **kwargs)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+# Process-wide gateway, created in the application lifespan
+rpc_gateway: Optional[SolanaRPCGateway] = None
+
+
+async def init_rpc_gateway() -> SolanaRPCGateway:
+    """Create the shared RPC gateway."""
+    global rpc_gateway
+    if rpc_gateway is None:
+        rpc_gateway = SolanaRPCGateway()
+        logger.info("Solana RPC gateway initialised")
+    return rpc_gateway
+
+
+async def close_rpc_gateway() -> None:
+    """Close the shared RPC gateway and its connection pool."""
+    global rpc_gateway
+    if rpc_gateway is not None:
+        try:
+            await rpc_gateway.close()
+            logger.info("Solana RPC gateway closed")
+        finally:
+            rpc_gateway = None
+
+
+def get_rpc_gateway() -> SolanaRPCGateway:
+    """
+    Returns the shared RPC gateway, creating it lazily outside the app lifespan
+    """
+    global rpc_gateway
+    if rpc_gateway is None:
+        rpc_gateway = SolanaRPCGateway()
+    return rpc_gateway
@@ -0,0 +1,60 @@
+from typing import NamedTuple, Union
+from solders.pubkey import Pubkey
+import struct
+
+TOKEN_PROGRAM_ID = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+ASSOCIATED_TOKEN_PROGRAM_ID = Pubkey.from_string("ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL")
+
+# SPL token account layout: mint (32) | owner (32) | amount (u64 LE) | ...
+TOKEN_ACCOUNT_SIZE = 165
+_AMOUNT_OFFSET = 64
+_AMOUNT = struct.Struct("<Q")
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class TokenAccount(NamedTuple):
+    mint: Pubkey
+    owner: Pubkey
+    amount: int
+
+
+def get_associated_token_address(owner: Pubkey, mint: Pubkey, token_program_id: Pubkey = TOKEN_PROGRAM_ID) -> Pubkey:
+    """
+    Derives the associated token account for an owner and mint
+    """
+    address, _ = Pubkey.find_program_address(
+        [bytes(owner), bytes(token_program_id), bytes(mint)],
+        ASSOCIATED_TOKEN_PROGRAM_ID
+    )
+    return address
+
+
+def decode_token_amount(data: Buffer) -> int:
+    """
+    Reads the raw token amount from SPL token account data in place, without slicing
+
+    Raises:
+        ValueError: If the buffer is too short to be a token account
+    """
+    if len(data) < _AMOUNT_OFFSET + _AMOUNT.size:
+        raise ValueError(f"Not an SPL token account ({len(data)} bytes)")
+    return _AMOUNT.unpack_from(data, _AMOUNT_OFFSET)[0]
+
+
+def decode_token_account(data: Buffer) -> TokenAccount:
+    """
+    Decodes mint, owner and raw amount from a token account (Token or Token-2022, whose
+    extensions follow the same 165-byte base layout)
+
+    Raises:
+        ValueError: If the buffer is shorter than a token account
+    """
+    view = memoryview(data)
+    if len(view) < TOKEN_ACCOUNT_SIZE:
+        raise ValueError(f"Not an SPL token account ({len(view)} bytes)")
+    return TokenAccount(
+        mint=Pubkey.from_bytes(bytes(view[0:32])),
+        owner=Pubkey.from_bytes(bytes(view[32:64])),
+        amount=_AMOUNT.unpack_from(view, _AMOUNT_OFFSET)[0],
+    )
@@ -0,0 +1,290 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from dotenv import load_dotenv
+import websockets
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Receives the "result" payload of a subscription notification
+SubscriptionCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def websocket_url(http_url: Optional[str]) -> Optional[str]:
+    """Websocket endpoint for an HTTP RPC endpoint (http -> ws, https -> wss)"""
+    if not http_url:
+        return None
+    if http_url.startswith("https://"):
+        return "wss://" + http_url[len("https://"):]
+    if http_url.startswith("http://"):
+        return "ws://" + http_url[len("http://"):]
+    return http_url
+
+
+class _Subscription:
+    __slots__ = ("method", "unsubscribe_method", "params", "callback", "one_shot", "server_id")
+
+    def __init__(self, method: str, unsubscribe_method: str, params: List[Any], callback: SubscriptionCallback, one_shot: bool):
+        self.method = method
+        self.unsubscribe_method = unsubscribe_method
+        self.params = params
+        self.callback = callback
+        self.one_shot = one_shot
+        # Id the node assigned on the current connection, None until acknowledged
+        self.server_id: Optional[int] = None
+
+
+class SubscriptionManager:
+    """
+    Multiplexes Solana signature and account subscriptions over one RPC websocket.
+
+    Subscriptions are identified by a local handle that survives reconnects: when
+    the socket drops, the manager reconnects with jittered exponential backoff and
+    re-issues every live subscription. Notification callbacks run as separate tasks
+    so a slow consumer never stalls the socket reader.
+    """
+    def __init__(
+        self,
+        ws_url: Optional[str] = None,
+        *,
+        commitment: Optional[str] = None,
+        ping_interval: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        name: str = "solana-ws"
+    ):
+        """
+        Args:
+            ws_url: Websocket endpoint (defaults to SOLANA_WS_URL, else derived from SOLANA_RPC_URL)
+            commitment: Commitment for new subscriptions (defaults to SOLANA_WS_COMMITMENT)
+            ping_interval: Seconds between keepalive pings (defaults to SOLANA_WS_PING_INTERVAL)
+            max_backoff: Upper bound in seconds on the reconnect delay (defaults to SOLANA_WS_MAX_BACKOFF)
+            name: Label used in logs and metrics
+        """
+        self.ws_url = ws_url or os.getenv("SOLANA_WS_URL") or websocket_url(os.getenv("SOLANA_RPC_URL"))
+        self.commitment = commitment or os.getenv("SOLANA_WS_COMMITMENT", "confirmed")
+        self.ping_interval = ping_interval or float(os.getenv("SOLANA_WS_PING_INTERVAL", "20"))
+        self.max_backoff = max_backoff or float(os.getenv("SOLANA_WS_MAX_BACKOFF", "30"))
+        self.backoff_base = 0.5
+        self.name = name
+
+        self._subscriptions: Dict[int, _Subscription] = {}
+        self._by_server_id: Dict[int, int] = {}
+        # JSON-RPC request id -> handle of the subscription it creates, and the reverse
+        self._requests: Dict[int, int] = {}
+        self._request_for_handle: Dict[int, int] = {}
+        # handle -> unsubscribe method for subscriptions cancelled before acknowledgement
+        self._cancelled: Dict[int, str] = {}
+        self._handles = itertools.count(1)
+        self._request_ids = itertools.count(1)
+        self._ws: Any = None
+        self._send_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._callbacks: Set[asyncio.Task] = set()
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self.notifications = 0
+
+    # ---- public API ----
+
+    async def subscribe_signature(
+        self,
+        signature: str,
+        callback: SubscriptionCallback,
+        *,
+        commitment: Optional[str] = None
+    ) -> int:
+        """
+        Notifies once when the signature reaches the commitment; the node then drops the subscription
+        """
+        params = [signature, {"commitment": commitment or self.commitment}]
+        return await self._subscribe("signatureSubscribe", "signatureUnsubscribe", params, callback, one_shot=True)
+
+    async def subscribe_account(
+        self,
+        address: str,
+        callback: SubscriptionCallback,
+        *,
+        encoding: str = "base64",
+        commitment: Optional[str] = None
+    ) -> int:
+        """
+        Notifies on every change to the account's lamports or data
+        """
+        params = [address, {"encoding": encoding, "commitment": commitment or self.commitment}]
+        return await self._subscribe("accountSubscribe", "accountUnsubscribe", params, callback, one_shot=False)
+
+    async def unsubscribe(self, handle: int) -> None:
+        """Drop a subscription; unknown or already-fired handles are ignored."""
+        sub = self._subscriptions.pop(handle, None)
+        if sub is None:
+            return
+        if sub.server_id is None:
+            if handle in self._request_for_handle:
+                # Still awaiting its id; unsubscribe as soon as the node acknowledges it
+                self._cancelled[handle] = sub.unsubscribe_method
+            return
+        self._by_server_id.pop(sub.server_id, None)
+        if self._ws is not None:
+            try:
+                await self._send(sub.unsubscribe_method, [sub.server_id])
+            except Exception as e:
+                logger.debug(f"[{self.name}] Unsubscribe of {sub.server_id} failed: {str(e)}")
+
+    def start(self) -> None:
+        """Connect in the background; subscriptions made before connecting are sent once it is up."""
+        if not self.ws_url:
+            raise ValueError("SOLANA_WS_URL or SOLANA_RPC_URL must be set")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Close the socket and cancel in-flight callbacks."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._task = None
+        for task in list(self._callbacks):
+            task.cancel()
+        logger.info(f"[{self.name}] Subscription manager stopped")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected.is_set(),
+            "subscriptions": len(self._subscriptions),
+            "active": len(self._by_server_id),
+            "reconnects": self.reconnects,
+            "notifications": self.notifications,
+            "callbacks_in_flight": len(self._callbacks),
+        }
+
+    # ---- protocol ----
+
+    async def _subscribe(
+        self,
+        method: str,
+        unsubscribe_method: str,
+        params: List[Any],
+        callback: SubscriptionCallback,
+        one_shot: bool
+    ) -> int:
+        handle = next(self._handles)
+        sub = _Subscription(method, unsubscribe_method, params, callback, one_shot)
+        self._subscriptions[handle] = sub
+        if self._ws is not None:
+            try:
+                await self._send_subscribe(handle, sub)
+            except Exception as e:
+                # The reconnect loop resubscribes everything once the socket is back
+                logger.debug(f"[{self.name}] Deferred {method}: {str(e)}")
+        return handle
+
+    async def _send(self, method: str, params: List[Any], request_id: Optional[int] = None) -> int:
+        request_id = request_id if request_id is not None else next(self._request_ids)
+        payload = json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        async with self._send_lock:
+            await self._ws.send(payload)
+        return request_id
+
+    async def _send_subscribe(self, handle: int, sub: _Subscription) -> None:
+        # Registered before sending: the reply can be read while send() is still awaiting
+        request_id = next(self._request_ids)
+        self._requests[request_id] = handle
+        self._request_for_handle[handle] = request_id
+        await self._send(sub.method, sub.params, request_id)
+
+    async def _resubscribe(self) -> None:
+        for handle, sub in list(self._subscriptions.items()):
+            await self._send_subscribe(handle, sub)
+        if self._subscriptions:
+            logger.info(f"[{self.name}] Resubscribed {len(self._subscriptions)} subscriptions")
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        if "id" in message:
+            self._handle_response(message)
+            return
+
+        params = message.get("params") or {}
+        handle = self._by_server_id.get(params.get("subscription"))
+        if handle is None:
+            return
+        sub = self._subscriptions.get(handle)
+        if sub is None:
+            return
+        if sub.one_shot:
+            self._subscriptions.pop(handle, None)
+            self._by_server_id.pop(sub.server_id, None)
+        self.notifications += 1
+        self._dispatch(sub.callback, params.get("result") or {})
+
+    def _handle_response(self, message: Dict[str, Any]) -> None:
+        handle = self._requests.pop(message["id"], None)
+        if handle is None:
+            return  # unsubscribe acknowledgement
+        self._request_for_handle.pop(handle, None)
+        if "error" in message:
+            logger.error(f"[{self.name}] Subscription rejected: {message['error']}")
+            self._subscriptions.pop(handle, None)
+            self._cancelled.pop(handle, None)
+            return
+        server_id = message.get("result")
+        unsubscribe_method = self._cancelled.pop(handle, None)
+        if unsubscribe_method is not None:
+            asyncio.create_task(self._send(unsubscribe_method, [server_id]))
+            return
+        sub = self._subscriptions.get(handle)
+        if sub is not None:
+            sub.server_id = server_id
+            self._by_server_id[server_id] = handle
+
+    def _dispatch(self, callback: SubscriptionCallback, result: Dict[str, Any]) -> None:
+        task = asyncio.create_task(self._invoke(callback, result))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    async def _invoke(self, callback: SubscriptionCallback, result: Dict[str, Any]) -> None:
+        try:
+            await callback(result)
+        except Exception as e:
+            logger.error(f"[{self.name}] Subscription callback failed: {str(e)}")
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                async with websockets.connect(self.ws_url, ping_interval=self.ping_interval, max_size=None) as ws:
+                    self._ws = ws
+                    attempt = 0
+                    await self._resubscribe()
+                    self.connected.set()
+                    logger.info(f"[{self.name}] Connected to {self.ws_url}")
+                    async for raw in ws:
+                        self._handle_message(json.loads(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[{self.name}] Websocket error: {str(e)}")
+            finally:
+                self._ws = None
+                self.connected.clear()
+                self._requests.clear()
+                self._request_for_handle.clear()
+                self._cancelled.clear()
+                self._by_server_id.clear()
+                for sub in self._subscriptions.values():
+                    sub.server_id = None
+
+            attempt += 1
+            self.reconnects += 1
+            delay = random.uniform(0, min(self.max_backoff, self.backoff_base * (2 ** attempt)))
+            logger.info(f"[{self.name}] Reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
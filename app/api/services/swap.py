@@ -1,14 +1,18 @@
-import requests
+import httpx
 import json
 from typing import Dict, Any, Optional
-from solana.rpc.api import Client
+from solana.rpc.commitment import Confirmed
+from solana.rpc.types import TxOpts, TokenAccountOpts
 from ..repositories.user import UserRepository
 from ..repositories.wallet import WalletRepository
 from .wallet import WalletService
 from .user import UserService
 from solders.pubkey import Pubkey
 from solders.keypair import Keypair
-from solders.transaction import Transaction
+from solders.transaction import VersionedTransaction
+from .rpc import SolanaRPCGateway, get_rpc_gateway
+from .jupiter import JupiterClient, get_jupiter_client
+from .spl import decode_token_account
 import base64
 import time
 import os
@@ -21,14 +25,15 @@ class JupiterSwap:
     """
     A class to swap SOL for USDC/USDT using Jupiter API on Solana
     """
-    def __init__(self):
+    def __init__(self, rpc_gateway: Optional[SolanaRPCGateway] = None, jupiter_client: Optional[JupiterClient] = None):
         """
           Initialize the Jupiter swapper
           Args:
-            rpc_url: Solana RPC endpoint URL
+            rpc_gateway: Shared async Solana RPC gateway (defaults to the process-wide one)
+            jupiter_client: Shared async Jupiter client (defaults to the process-wide one)
         """
-        self.rpc_url = os.getenv("SOLANA_RPC_URL")
-        self.client = Client(self.rpc_url)
+        self.rpc = rpc_gateway or get_rpc_gateway()
+        self.jupiter = jupiter_client or get_jupiter_client()
         self.jupiter_base_url = "https://lite-api.jup.ag/swap/v1"
          # Token addresses
         self.tokens = {
@@ -37,9 +42,16 @@ class JupiterSwap:
             "USDT": "Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB",
             "PYUSD":"2b1kV6DkPAnxd5ixfnxCpjxmKwqjjaYmCZfHsFu24GXo"
         } 
+        # Mint address -> decimals, for converting raw token amounts
+        self.decimals = {
+            self.tokens["SOL"]: 9,
+            self.tokens["USDC"]: 6,
+            self.tokens["USDT"]: 6,
+            self.tokens["PYUSD"]: 6
+        }
  
 
-    def get_quote(self,input_mint: str, output_mint: str, amount: int, slippage_bps: int = 50)->Dict:
+    async def get_quote(self,input_mint: str, output_mint: str, amount: int, slippage_bps: int = 50)->Optional[Dict]:
          """
         Get a quote for swapping tokens
         Args:
@@ -52,47 +64,27 @@ class JupiterSwap:
             Quote data or None if failed
         """
          try:
-            url ="https://quote-api.jup.ag/v6/quote"
-            params = {
-                "inputMint": input_mint,
-                "outputMint": output_mint,
-                "amount": amount,
-                "slippageBps": slippage_bps,
-                "onlyDirectRoutes": "false",
-                "asLegacyTransaction": "false"
-            }
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-         except requests.exceptions.RequestException as e:
+            return await self.jupiter.get_quote(input_mint, output_mint, amount, slippage_bps)
+         except httpx.HTTPError as e:
             print(f"Error getting quote: {e}")
             return None
 
-    def get_swap(self, quote: Dict, user_public_key: str)->Optional[str]:
+    async def get_swap(self, quote: Dict, user_public_key: str)->Optional[Dict]:
         """
            Get swap transaction from Jupiter        
            Args:
                quote: Quote data from get_quote
                user_public_key: User's wallet public key as string
            Returns:
-               Serialized transaction or None if failed
+               Swap response (with 'swapTransaction') or None if failed
         """
         try:
-            url = "https://quote-api.jup.ag/v6/swap"
-            params = {
-                "quote": quote,
-                "userPublicKey": user_public_key,
-                "wrapAndUnwrapSol": True,
-                "dynamicComputeUnitLimit": True,
-                "prioritizationFeeLamports": "auto"
-            }
-            response = requests.post(url, json=params,headers={"Content-Type": "application/json"})
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return await self.jupiter.get_swap(quote, user_public_key)
+        except httpx.HTTPError as e:
             print(f"Error getting swap: {e}")
+            return None
 
-    def execute_swap(self,keypair:Keypair,swap_transaction:str)->Optional[str]:
+    async def execute_swap(self,keypair:Keypair,swap_transaction:str)->Optional[str]:
         """
         Execute the swap transaction
         Args:
@@ -103,14 +95,17 @@ class JupiterSwap:
         """
         try:
             transaction_bytes = base64.b64decode(swap_transaction)
-            transation = Transaction.deserialize(transaction_bytes)
+            transaction = VersionedTransaction.from_bytes(transaction_bytes)
             # sign transaction
-            transaction.sign(keypair)
+            signed = VersionedTransaction(transaction.message, [keypair])
             # send transaction
-            response = self.client.send_transaction(transation)
+            response = await self.rpc.send_raw_transaction(
+                bytes(signed),
+                TxOpts(skip_preflight=False, preflight_commitment=Confirmed)
+            )
             if response.value:
                 print(f"Transaction sent: {response.value}")
-                return response.value
+                return str(response.value)
             else:
                 print(f"Transaction failed to send")
                 return None
@@ -118,7 +113,7 @@ class JupiterSwap:
             print(f"Error executing swap: {e}")
             return None
 
-    def swap_sol_to_usdc(self,keypair:Keypair,sol_amount:float,slippage_bps:int=50)->Optional[str]:
+    async def swap_sol_to_usdc(self,keypair:Keypair,sol_amount:float,slippage_bps:int=50)->Optional[str]:
         """
         Swap SOL to USDC
         Args: 
@@ -131,15 +126,15 @@ class JupiterSwap:
         """
         print(f"Swapping {sol_amount} SOL for USDC")
         sol_amount_lamports = int(sol_amount * 10**9)
-        quote = self.get_quote(self.tokens["SOL"], self.tokens["USDC"], sol_amount_lamports, slippage_bps)
+        quote = await self.get_quote(self.tokens["SOL"], self.tokens["USDC"], sol_amount_lamports, slippage_bps)
         if not quote:
             return None
-        swap_transaction = self.get_swap(quote, str(keypair.pubkey()))
-        if not swap_tx:
+        swap_transaction = await self.get_swap(quote, str(keypair.pubkey()))
+        if not swap_transaction or 'swapTransaction' not in swap_transaction:
             return None
-        return self.execute_swap(keypair,swap_transaction)
+        return await self.execute_swap(keypair,swap_transaction['swapTransaction'])
     
-    def swap_sol_to_usdt(self,keypair:Keypair,sol_amount:float,slippage_bps:int=50)->Optional[str]:
+    async def swap_sol_to_usdt(self,keypair:Keypair,sol_amount:float,slippage_bps:int=50)->Optional[str]:
         """
         Swap SOL to USDT
         Args: 
@@ -152,7 +147,7 @@ class JupiterSwap:
         print(f"Swapping {sol_amount} SOL for USDT...")
         lamports = int(sol_amount * 1_000_000_000)
         # Get quote
-        quote = self.get_quote(
+        quote = await self.get_quote(
             self.tokens["SOL"],
             self.tokens["USDT"],
             lamports,
@@ -162,13 +157,13 @@ class JupiterSwap:
             return None
         print(f"Quote received: ~{float(quote['outAmount']) / 1_000_000:.2f} USDT") 
         # Get swap transaction
-        swap_tx = self.get_swap_transaction(quote, str(keypair.pubkey()))        
-        if not swap_tx:
+        swap_tx = await self.get_swap(quote, str(keypair.pubkey()))        
+        if not swap_tx or 'swapTransaction' not in swap_tx:
             return None       
         # Execute swap
-        return self.execute_swap(keypair,swap_tx)
+        return await self.execute_swap(keypair,swap_tx['swapTransaction'])
 
-    def get_token_balance(self,wallet_address:str,token_mint:str)->float:
+    async def get_token_balance(self,wallet_address:str,token_mint:str)->float:
         """
           Get token balance for a wallet
         Args:
@@ -180,25 +175,38 @@ class JupiterSwap:
         try:
             if token_mint == self.tokens["SOL"]:
                 # Get SOL balance
-                response = self.client.get_balance(Pubkey.from_string(wallet_address))
-                return response.value / 1_000_000_000  # Convert lamports to SOL
+                lamports = await self.rpc.get_balance(Pubkey.from_string(wallet_address))
+                return lamports / 1_000_000_000  # Convert lamports to SOL
             else:
-                # Get SPL token balance
-                response = self.client.get_token_accounts_by_owner(
+                # Sum every token account the wallet holds for this mint in one RPC call,
+                # decoding the amount straight from each account's raw data
+                mint = Pubkey.from_string(token_mint)
+                response = await self.rpc.get_token_accounts_by_owner(
                     Pubkey.from_string(wallet_address),
-                    {"mint": Pubkey.from_string(token_mint)}
+                    TokenAccountOpts(mint=mint, encoding="base64")
                 )
-                if response.value:
-                    account_info = self.client.get_account_info(response.value[0].pubkey)
-                    # Parse token account data (simplified)
-                    return 0.0  # You'd need to properly parse the account data
-                else:
+                raw_amount = 0
+                for keyed_account in response.value:
+                    token_account = decode_token_account(keyed_account.account.data)
+                    if token_account.mint == mint:
+                        raw_amount += token_account.amount
+                if not raw_amount:
                     return 0.0
+                decimals = await self._get_decimals(mint)
+                return raw_amount / 10 ** decimals
         except Exception as e:
             print(f"Error getting balance: {e}")
             return 0.0
 
-    def buy_usdt_with_sol(self,keypair:Keypair,usdt_amount:float,slippage_bps:int=50)->Optional[str]:
+    async def _get_decimals(self, mint: Pubkey) -> int:
+        """Decimals for a mint, looked up on-chain once for mints not in self.decimals"""
+        key = str(mint)
+        if key not in self.decimals:
+            response = await self.rpc.call("get_token_supply", mint)
+            self.decimals[key] = response.value.decimals
+        return self.decimals[key]
+
+    async def buy_usdt_with_sol(self,keypair:Keypair,usdt_amount:float,slippage_bps:int=50)->Optional[str]:
         """
         Buy a specific amount of USDT using available SOL in the wallet
 
@@ -213,7 +221,7 @@ class JupiterSwap:
             print(f"Attempting to buy {usdt_amount} USDT..")
             # Get current SOL Balance
             wallet_address = str(keypair.pubkey())
-            sol_balance = self.get_token_balance(wallet_address,self.tokens["SOL"])
+            sol_balance = await self.get_token_balance(wallet_address,self.tokens["SOL"])
 
             if sol_balance<=0:
                 print("Error: No SOL balance available")
@@ -227,7 +235,7 @@ class JupiterSwap:
             print(f"Available SOL balance: {available_sol:.4f} SOL")
             # get quote for available SOL to see how much USDT we can get
             available_sol_lamports = int(available_sol * 1_000_000_000)
-            quote = self.get_quote(
+            quote = await self.get_quote(
                 self.tokens["SOL"],
                 self.tokens["USDT"],
                 available_sol_lamports,
@@ -248,7 +256,7 @@ class JupiterSwap:
             sol_needed_lamports = int(sol_needed * 1_000_000_000)
 
             # Get a more precise quote with the calculated SOL amount
-            precise_quote = self.get_quote(
+            precise_quote = await self.get_quote(
                 self.tokens["SOL"],
                 self.tokens["USDT"],
                 sol_needed_lamports,
@@ -260,11 +268,11 @@ class JupiterSwap:
             final_usdt_amount = float(precise_quote['outAmount']) / 1_000_000
             print(f"Final quote: {sol_needed:.4f} SOL -> {final_usdt_amount:.2f} USDT")
             # get swap transaction
-            swap_transaction_data = self.get_swap(precise_quote,wallet_address)
+            swap_transaction_data = await self.get_swap(precise_quote,wallet_address)
             if not swap_transaction_data or 'swapTransaction' not in swap_transaction_data:
                 print("Error: Could not get swap transation")
                 return None
-            result = self.execute_swap(keypair,swap_transaction_data['swapTransaction'])
+            result = await self.execute_swap(keypair,swap_transaction_data['swapTransaction'])
             if result:
                 print(f"Successfully bought: {final_usdt_amount:.2f} USDT")
                 print(f"Transaction signature: {result}")
@@ -276,7 +284,7 @@ class JupiterSwap:
             print(f"Error in buy_usdt_with_sol: {e}")
             return None
 
-    def buy_usdc_with_sol(self,keypair:Keypair,usdc_amount:float,slippage_bps:int=50)->Optional[str]:
+    async def buy_usdc_with_sol(self,keypair:Keypair,usdc_amount:float,slippage_bps:int=50)->Optional[str]:
         """
         Buy a specific amount of USDC using available SOL in the wallet
         Args:
@@ -290,7 +298,7 @@ class JupiterSwap:
             print(f"Attempting to buy {usdc_amount} USDC...")
             # Get current SOL balance
             wallet_address = str(keypair.pubkey())
-            sol_balance = self.get_token_balance(wallet_address,self.tokens["SOL"])
+            sol_balance = await self.get_token_balance(wallet_address,self.tokens["SOL"])
 
             if sol_balance <= 0:
                 print("Error: No SOL Balance available")
@@ -304,7 +312,7 @@ class JupiterSwap:
             print(f"Available SOL balance: {available_sol:.4f} SOL")
             # Get quote for available SOL to see how much USDC we can get
             available_sol_lamports = int(available_sol * 1_000_000_000)
-            quote = self.get_quote(
+            quote = await self.get_quote(
                 self.tokens["SOL"],
                 self.tokens["USDC"],
                 available_sol_lamports,
@@ -313,8 +321,8 @@ class JupiterSwap:
             if not quote:
                 print("Error: Could not get quote from jupiter")
                 return None
-            expected_usdt = float(quote["outAmount"]) / 1_000_000
-            print(f"With {available_sol:.4f} SOL , you can get approximately {expected_usdt:.2f} USDC")
+            expected_usdc = float(quote["outAmount"]) / 1_000_000
+            print(f"With {available_sol:.4f} SOL , you can get approximately {expected_usdc:.2f} USDC")
             if expected_usdc < usdc_amount:
                print(f"Error: Insufficient SOL to buy {usdc_amount} USDC")
                print(f"You need more SOL. Current balance can only buy ~{expected_usdc:.2f} USDC")
@@ -322,7 +330,7 @@ class JupiterSwap:
             sol_needed = available_sol * (usdc_amount / expected_usdc)
             sol_needed_lamports = int(sol_needed * 1_000_000_000)
             # Get a more precise quote with the calculated SOL amount
-            precise_quote = self.get_quote(
+            precise_quote = await self.get_quote(
               self.tokens["SOL"],
               self.tokens["USDC"],
               sol_needed_lamports,
@@ -335,12 +343,12 @@ class JupiterSwap:
             print(f"Final quote: {sol_needed:.4f} SOL -> {final_usdc_amount:.2f} USDC")
 
             # Get Swap transaction
-            swap_transaction_data = self.get_swap(precise_quote,wallet_address)
+            swap_transaction_data = await self.get_swap(precise_quote,wallet_address)
             if not swap_transaction_data or 'swapTransaction' not in swap_transaction_data:
                 print("Error: Could not get swap transaction")
                 return None
             # Execute the swap
-            result = self.execute_swap(keypair,swap_transaction_data['swapTransaction'])
+            result = await self.execute_swap(keypair,swap_transaction_data['swapTransaction'])
             if result:
                 print(f"Successfully bought {final_usdc_amount:.2f} USDC!")
                 print(f"Transaction signature:{result}")
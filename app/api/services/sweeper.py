@@ -0,0 +1,69 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+from .paymentlink import PaymentLinkService
+from dotenv import load_dotenv
+import asyncio
+import logging
+import os
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentLinkSweeper:
+    """
+    Periodically expires overdue payment links with one bulk update per run
+    """
+    def __init__(self, payment_link_service: PaymentLinkService, interval: Optional[float] = None):
+        """
+        Args:
+            payment_link_service: Service whose process_expired_links does the bulk update
+            interval: Seconds between sweeps (defaults to PAYMENT_LINK_SWEEP_INTERVAL)
+        """
+        self.service = payment_link_service
+        self.interval = interval or float(os.getenv("PAYMENT_LINK_SWEEP_INTERVAL", "60"))
+        self.last_run: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep_once(self) -> Dict[str, Any]:
+        """
+        Runs a single sweep and returns its expired count and duration
+        """
+        started = time.perf_counter()
+        expired = await self.service.process_expired_links()
+        duration_ms = (time.perf_counter() - started) * 1000
+        self.last_run = {
+            "expired": expired,
+            "duration_ms": round(duration_ms, 2),
+            "finished_at": datetime.utcnow(),
+        }
+        logger.info(f"Payment link sweep expired {expired} links in {duration_ms:.1f}ms")
+        return self.last_run
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep_once()
+            except Exception as e:
+                logger.error(f"Payment link sweep failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start sweeping in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Payment link sweeper started (every {self.interval:.0f}s)")
+
+    async def stop(self) -> None:
+        """Cancel the background sweep and wait for it to finish."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._task = None
+            logger.info("Payment link sweeper stopped")
@@ -1,15 +1,42 @@
-from typing import List,Optional
+from typing import Any,AsyncIterable,AsyncIterator,Dict,Iterable,List,Optional,Union
 from datetime import datetime,timedelta
-from ..models.transaction import Transaction , TransactionStatus,TransactionType
+from ..models.transaction import Transaction , TransactionStatus,TransactionType,TransactionIngest,IngestFailure,IngestReport
 from ..repositories.transaction import TransactionRepository
+from .balancecache import BalanceCache, get_balance_cache
+from pydantic import ValidationError
+from dotenv import load_dotenv
 import logging
+import os
 from beanie.odm.fields import PydanticObjectId
 
+load_dotenv()
+
 logger = logging.getLogger(__name__)
 
+# Records accepted by ingest_transactions
+IngestRecord = Union[TransactionIngest, Dict[str, Any]]
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Fields the submitter of a transaction knows better than anything that merely observed it on-chain
+INITIATOR_FIELDS = (
+    "user_id", "tx_type", "from_address", "to_address",
+    "token_address", "token_symbol", "amount", "usd_value", "gas_fee",
+)
+
+
+async def _iterate(records: Union[Iterable[IngestRecord], AsyncIterable[IngestRecord]]) -> AsyncIterator[IngestRecord]:
+    if hasattr(records, "__aiter__"):
+        async for record in records:
+            yield record
+    else:
+        for record in records:
+            yield record
+
 class TransactionService:
-    def __init__(self, transaction_repo: TransactionRepository):
+    def __init__(self, transaction_repo: TransactionRepository, balance_cache: Optional[BalanceCache] = None):
         self.repository = transaction_repo
+        self.balance_cache = balance_cache or get_balance_cache()
 
     async def record_transaction(
         self,
@@ -24,10 +51,14 @@ class TransactionService:
         token_symbol: Optional[str] = None,
         amount: Optional[str] = None,
         usd_value: Optional[float] = None,
-        gas_fee: Optional[str] = None
+        gas_fee: Optional[str] = None,
+        initiated: bool = False
     ) -> Transaction:
         """
-        Records a new transaction in the system
+        Records a new transaction in the system.
+        With a tx_hash this is idempotent: recording the same signature again returns the existing record.
+        Pass initiated=True for transactions this app submitted itself (e.g. /buy swaps): their
+        details then replace a record an observer such as the deposit watcher created first.
         """
         transaction = Transaction(
             user_id=user_id,
@@ -47,6 +78,15 @@ class TransactionService:
         )
 
         try:
+            if tx_hash:
+                # Idempotent per signature: a signature already on record returns that record
+                fields = transaction.model_dump(exclude={"id", "revision_id"})
+                merge = None
+                if initiated:
+                    merge = {key: value for key, value in fields.items() if key in INITIATOR_FIELDS and value is not None}
+                created_tx = await self.repository.upsert_by_tx_hash(tx_hash, fields, merge)
+                logger.info(f"Recorded transaction {created_tx.id} ({tx_hash}) for user {created_tx.user_id}")
+                return created_tx
             created_tx = await self.repository.create(transaction)
             logger.info(f"Recorded new transaction {created_tx.id} for user {user_id}")
             return created_tx
@@ -54,6 +94,77 @@ class TransactionService:
             logger.error(f"Failed to record transaction: {str(e)}")
             raise RuntimeError("Failed to record transaction") from e
 
+    async def ingest_transactions(
+        self,
+        records: Union[Iterable[IngestRecord], AsyncIterable[IngestRecord]],
+        *,
+        chunk_size: Optional[int] = None,
+        max_reported_failures: int = 1000
+    ) -> IngestReport:
+        """
+        Bulk-imports transactions (e.g. a wallet's history) from a list, generator or async stream.
+
+        Records are written in unordered insert batches of chunk_size (defaults to
+        TRANSACTION_INGEST_CHUNK_SIZE), one round trip per chunk. Invalid records and
+        signatures already on record are reported per item and never abort the import;
+        a signature on record for a different user is reported as a conflict, never merged.
+        """
+        chunk_size = chunk_size or int(os.getenv("TRANSACTION_INGEST_CHUNK_SIZE", "1000"))
+        report = IngestReport()
+
+        def fail(index: int, tx_hash: Optional[str], error: str) -> None:
+            if len(report.failures) < max_reported_failures:
+                report.failures.append(IngestFailure(index=index, tx_hash=tx_hash, error=error))
+
+        # (stream index, document) for the chunk being built
+        chunk: List[tuple] = []
+
+        async def flush() -> None:
+            inserted, errors = await self.repository.insert_many_unordered([doc for _, doc in chunk])
+            report.inserted += inserted
+            duplicates = [chunk[error["index"]][1].tx_hash for error in errors if error.get("code") == DUPLICATE_KEY_ERROR]
+            owners = await self.repository.get_owners_by_tx_hash(duplicates)
+            for error in errors:
+                index, doc = chunk[error["index"]]
+                if error.get("code") != DUPLICATE_KEY_ERROR:
+                    report.failed += 1
+                    fail(index, doc.tx_hash, error.get("errmsg", "write error"))
+                elif owners.get(doc.tx_hash) == doc.user_id:
+                    report.duplicates += 1
+                    fail(index, doc.tx_hash, "duplicate tx_hash")
+                else:
+                    report.conflicts += 1
+                    fail(index, doc.tx_hash, "tx_hash belongs to another user")
+            chunk.clear()
+
+        now = datetime.utcnow()
+        try:
+            async for record in _iterate(records):
+                index = report.received
+                report.received += 1
+                try:
+                    data = record if isinstance(record, TransactionIngest) else TransactionIngest.model_validate(record)
+                except ValidationError as e:
+                    report.invalid += 1
+                    fail(index, record.get("tx_hash") if isinstance(record, dict) else None, str(e))
+                    continue
+                fields = data.model_dump()
+                fields["created_at"] = fields["created_at"] or now
+                chunk.append((index, Transaction(**fields, updated_at=now)))
+                if len(chunk) >= chunk_size:
+                    await flush()
+            if chunk:
+                await flush()
+        except Exception as e:
+            logger.error(f"Transaction ingestion stopped after {report.received} records: {str(e)}")
+            raise RuntimeError("Failed to ingest transactions") from e
+
+        logger.info(
+            f"Ingested {report.inserted}/{report.received} transactions ({report.duplicates} duplicates, "
+            f"{report.conflicts} conflicts, {report.invalid} invalid, {report.failed} failed)"
+        )
+        return report
+
     async def update_transaction_status(
         self,
         tx_id: str,
@@ -78,11 +189,21 @@ class TransactionService:
             updated_tx = await self.repository.update(tx_id, {"$set": update_data})
             if updated_tx:
                 logger.info(f"Updated transaction {tx_id} to status {status}")
+                if status == TransactionStatus.CONFIRMED:
+                    await self.invalidate_balances(updated_tx)
             return updated_tx
         except Exception as e:
             logger.error(f"Error updating transaction {tx_id}: {str(e)}")
             raise RuntimeError("Failed to update transaction") from e
 
+    async def invalidate_balances(self, transaction: Transaction) -> None:
+        """
+        Drops cached balances for every address a settled transaction touched
+        """
+        for address in {transaction.from_address, transaction.to_address}:
+            if address:
+                await self.balance_cache.invalidate(address)
+
     async def get_user_transactions(
         self,
         user_id: str,
@@ -95,20 +216,16 @@ class TransactionService:
         """
         Retrieves transactions for a user with optional filters
         """
-        query = {"user_id": user_id}
-        
-        if days:
-            cutoff = datetime.utcnow() - timedelta(days=days)
-            query["created_at"] = {"$gte": cutoff}
-        
-        if tx_type:
-            query["tx_type"] = tx_type
-            
-        if status:
-            query["status"] = status
+        since = datetime.utcnow() - timedelta(days=days) if days else None
 
         try:
-            transactions = await self.repository.find_many(query, limit=limit)
+            transactions = await self.repository.get_user_transactions(
+                user_id,
+                since=since,
+                tx_type=tx_type,
+                status=status,
+                limit=limit
+            )
             logger.debug(f"Fetched {len(transactions)} transactions for user {user_id}")
             return transactions
         except Exception as e:
@@ -128,30 +245,6 @@ class TransactionService:
             logger.error(f"Error finding transaction by hash {tx_hash}: {str(e)}")
             raise RuntimeError("Failed to find transaction by hash") from e
 
-    async def process_transaction_webhooks(self) -> int:
-        """
-        Processes pending transaction webhooks (system task)
-        Returns count of processed webhooks
-        """
-        try:
-            pending_webhooks = await self.repository.get_pending_webhooks()
-            count = 0
-            
-            for tx in pending_webhooks:
-                # Here you would actually call the webhook URL
-                # For simplicity, we'll just mark as processed
-                await self.repository.update(
-                    tx.id,
-                    {"$set": {"webhook_processed": True}}
-                )
-                count += 1
-                
-            logger.info(f"Processed {count} transaction webhooks")
-            return count
-        except Exception as e:
-            logger.error(f"Error processing transaction webhooks: {str(e)}")
-            raise RuntimeError("Failed to process transaction webhooks") from e
-
     async def get_recent_transactions(
         self,
         hours: int = 24,
@@ -1,17 +1,32 @@
 from typing import Optional , List
-from ..models.user import User
+from ..models.user import User, UserWalletView
 from ..repositories.user import UserRepository
+from .cache import TTLCache
 from pydantic import EmailStr
 from beanie.odm.fields import PydanticObjectId
 from datetime import datetime
 from ..models.wallet import Chain
+from dotenv import load_dotenv
 import logging
+import os
+
+load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 class UserService:
-    def __init__(self,user_repository:UserRepository):
+    def __init__(self,user_repository:UserRepository,wallet_view_cache:Optional[TTLCache]=None):
+        """
+        Args:
+            user_repository: User repository
+            wallet_view_cache: (user_id, chain) -> UserWalletView cache for bot commands
+                (defaults to USER_WALLET_CACHE_SIZE entries for USER_WALLET_CACHE_TTL seconds)
+        """
         self.repository = user_repository
+        self.wallet_view_cache = wallet_view_cache or TTLCache(
+            max_size=int(os.getenv("USER_WALLET_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("USER_WALLET_CACHE_TTL", "300"))
+        )
     
     async def create_user(self,user_id:str,username:Optional[EmailStr]=None,default_chain:str=Chain.SOLANA):
         """
@@ -48,6 +63,25 @@ class UserService:
             raise RuntimeError("Failed to fetch user") from e
     
 
+    async def get_user_with_wallet(self,user_id:str,chain:str=Chain.SOLANA.value)->Optional[UserWalletView]:
+        """
+        Resolves a user and their wallet on a chain in one query, cached per process.
+        Users without a wallet on the chain aren't cached, so a new wallet shows up at once.
+        """
+        chain = Chain(chain).value
+        key = (user_id, chain)
+        cached = self.wallet_view_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            view = await self.repository.get_with_wallet(user_id, chain)
+        except Exception as e:
+            logger.error(f"Error resolving wallet for user {user_id}: {str(e)}")
+            raise RuntimeError("Failed to fetch user wallet") from e
+        if view is not None and view.address is not None:
+            self.wallet_view_cache.set(key, view)
+        return view
+
     async def update_user_profile(
         self,
         user_id: str,
@@ -74,7 +108,7 @@ class UserService:
             raise ValueError("No valid fields provided for update")
             
         try:
-            updated_user = await self.repository.update(user_id, {"$set": update_data})
+            updated_user = await self.repository.update_by_user_id(user_id, {"$set": update_data})
             if updated_user:
                 logger.info(f"Updated profile for user: {user_id}")
             return updated_user
@@ -85,16 +119,18 @@ class UserService:
     async def add_wallet_to_user(
         self,
         user_id: str,
-        wallet_id: PydanticObjectId
+        wallet_id: PydanticObjectId,
+        address: str,
+        chain: str = Chain.SOLANA.value
     ) -> Optional[User]:
         """
-        Associates a wallet with a user
+        Associates a wallet with a user, storing its link and summary together
         """
         try:
-            return await self.repository.update(
-                user_id,
-                {"$addToSet": {"wallets": wallet_id}}
-            )
+            chain = Chain(chain).value
+            updated_user = await self.repository.add_wallet(user_id, wallet_id, address, chain)
+            self.wallet_view_cache.pop((user_id, chain))
+            return updated_user
         except Exception as e:
             logger.error(f"Error adding wallet to user {user_id}: {str(e)}")
             raise RuntimeError("Failed to add wallet to user") from e
@@ -109,10 +145,7 @@ class UserService:
         Finds users associated with a specific wallet address
         """
         try:
-            query = {"wallets.address": address}
-            if chain:
-                query["wallets.chain"] = chain
-            return await self.repository.find_many(query)
+            return await self.repository.get_by_wallet_address(address, chain)
         except Exception as e:
             logger.error(f"Error finding users by wallet {address}: {str(e)}")
             raise RuntimeError("Failed to find users by wallet") from e
@@ -1,4 +1,4 @@
-from typing import Optional , List,Dict
+from typing import Optional , List,Dict,Union
 from ..models.wallet import Wallet,Chain
 from ..repositories.wallet import WalletRepository
 import logging
@@ -16,19 +16,49 @@ from dotenv import load_dotenv
 from ..models.wallet import Token,Wallet,Chain,StableCoin
 from cryptography.hazmat.backends import default_backend
 from beanie.odm.fields import PydanticObjectId
-from solana.rpc.api import Client
+from .rpc import SolanaRPCGateway, get_rpc_gateway, MAX_MULTIPLE_ACCOUNTS
+from .spl import get_associated_token_address, decode_token_amount
+from .balancecache import BalanceCache, get_balance_cache
+from .cache import TTLCache, SingleFlight
 import bcrypt
 import os
 import base64
+import asyncio
+import hashlib
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Derived Fernet instances, shared across WalletService instances so /balance
+# doesn't rerun 100,000 PBKDF2 iterations per request
+_fernet_cache: TTLCache[bytes, Fernet] = TTLCache(
+    max_size=int(os.getenv("KDF_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("KDF_CACHE_TTL", "900"))
+)
+_fernet_flight: SingleFlight[bytes, Fernet] = SingleFlight()
+
+
+# Stablecoins tracked on every Solana wallet: symbol -> (mint, decimals)
+STABLECOIN_MINTS: Dict[StableCoin, tuple] = {
+    StableCoin.USDC: ("EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v", 6),
+    StableCoin.USDT: ("Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB", 6),
+}
+
+def _kdf_cache_key(password: str, salt: bytes) -> bytes:
+    """Digest of (password, salt) so the cache never holds the plaintext password"""
+    return hashlib.sha256(len(salt).to_bytes(4, "big") + salt + password.encode()).digest()
+
 class WalletService:
-    def __init__(self, wallet_repository: WalletRepository):
+    def __init__(
+        self,
+        wallet_repository: WalletRepository,
+        rpc_gateway: Optional[SolanaRPCGateway] = None,
+        balance_cache: Optional[BalanceCache] = None
+    ):
         self.repository = wallet_repository
-        self.rpc = os.getenv("SOLANA_RPC_URL")
+        self.rpc = rpc_gateway or get_rpc_gateway()
+        self.balance_cache = balance_cache or get_balance_cache()
         # self.encrypt_private_key = os.getenv("ENCRYPTION_KEY")
 
     async def create_wallet(
@@ -132,19 +162,16 @@ class WalletService:
         Updates the balance of a specific token in a wallet
         """
         try:
-            wallet = await self.get_wallet(wallet_id)
-            if not wallet:
-                raise ValueError("Wallet not found")
-            
-            token_exists = any(t.symbol == token_symbol for t in wallet.tokens)
-            if not token_exists:
-                raise ValueError("Token not found in wallet")
-            
-            return await self.repository.update_token_balance(
+            wallet = await self.repository.update_token_balance(
                 wallet_id,
                 token_symbol,
                 new_balance
             )
+            if not wallet:
+                raise ValueError("Wallet not found or token not in wallet")
+            self.balance_cache.remember_wallet(wallet_id, wallet.address)
+            await self.balance_cache.write_through(wallet.address, self._token_summary(wallet))
+            return wallet
         except ValueError as e:
             logger.warning(f"Balance update validation failed: {str(e)}")
             raise
@@ -160,14 +187,20 @@ class WalletService:
         Returns a summary of all token balances in a wallet
         """
         try:
+            address = self.balance_cache.address_for_wallet(wallet_id)
+            if address:
+                cached = self.balance_cache.get_tokens(address)
+                if cached is not None:
+                    return cached
+
             wallet = await self.get_wallet(wallet_id)
             if not wallet:
                 raise ValueError("Wallet not found")
             
-            return {
-                token.symbol: float(token.balance)
-                for token in wallet.tokens
-            }
+            summary = self._token_summary(wallet)
+            self.balance_cache.remember_wallet(wallet_id, wallet.address)
+            self.balance_cache.set_tokens(wallet.address, summary)
+            return summary
         except ValueError as e:
             logger.warning(f"Balance summary failed: {str(e)}")
             raise
@@ -175,6 +208,13 @@ class WalletService:
             logger.error(f"Error generating balance summary for wallet {wallet_id}: {str(e)}")
             raise RuntimeError("Failed to generate balance summary") from e
 
+    @staticmethod
+    def _token_summary(wallet: Wallet) -> Dict[str, float]:
+        return {
+            token.symbol: float(token.balance)
+            for token in wallet.tokens
+        }
+
     async def get_wallets_with_token(
         self,
         user_id: str,
@@ -211,16 +251,14 @@ class WalletService:
         Deletes a wallet (soft delete implementation)
         """
         try:
-            wallet = await self.get_wallet(wallet_id)
-            if not wallet:
-                raise ValueError("Wallet not found")
-            
             # Instead of actual deletion, mark as inactive
             result = await self.repository.update(
                 wallet_id,
                 {"$set": {"is_active": False, "deleted_at": datetime.utcnow()}}
             )
-            return result is not None
+            if result is None:
+                raise ValueError("Wallet not found")
+            return True
         except ValueError as e:
             logger.warning(f"Wallet deletion failed: {str(e)}")
             raise
@@ -253,43 +291,63 @@ class WalletService:
         else:
             return Fernet.generate_key(),    
 
+    async def get_fernet(self, password: str, salt: bytes) -> Fernet:
+        """
+        Return a ready Fernet for (password, salt), deriving it at most once.
+
+        Derivation runs in a worker thread so PBKDF2 never blocks the event loop;
+        concurrent callers for the same key share a single derivation.
+        """
+        cache_key = _kdf_cache_key(password, salt)
+        fernet = _fernet_cache.get(cache_key)
+        if fernet is not None:
+            return fernet
+
+        async def derive() -> Fernet:
+            derived_key, _ = await asyncio.to_thread(self.generate_fernet_key, password, salt)
+            fernet = Fernet(derived_key)
+            _fernet_cache.set(cache_key, fernet)
+            return fernet
+
+        return await _fernet_flight.do(cache_key, derive)
+
     def generate_encryption_key():
        """Generate and return a Fernet key"""
        return Fernet.generate_key()
     
-    def encrypt_private_key(self,keypair: Keypair, encryption_key: bytes) -> str:
+    def encrypt_private_key(self,keypair: Keypair, encryption_key: Union[bytes, Fernet]) -> str:
         """
         Encrypt a Solana private key.
     
         Args:
             keypair: Keypair from solders library
-            encryption_key: Fernet encryption key
+            encryption_key: Fernet encryption key, or a ready Fernet instance
         
         Returns:
             str: Base64 encoded encrypted private key
         """
-        fernet = Fernet(encryption_key)
+        fernet = encryption_key if isinstance(encryption_key, Fernet) else Fernet(encryption_key)
         private_key_bytes = bytes(keypair)
         encrypted = fernet.encrypt(private_key_bytes)
         return base64.b64encode(encrypted).decode('utf-8')
 
-    def decrypt_to_keypair(self,encrypted_key: str, encryption_key: bytes) -> Keypair:
+    def decrypt_to_keypair(self,encrypted_key: str, encryption_key: Union[bytes, Fernet]) -> Keypair:
         """
         Decrypt an encrypted private key back to Keypair.
     
         Args:
             encrypted_key: Base64 encoded encrypted private key
-            encryption_key: Fernet encryption key used to encrypt
+            encryption_key: Fernet encryption key used to encrypt, or a ready Fernet instance
         
         Returns:
             Keypair: Restored Solana keypair
         """
-        fernet = Fernet(encryption_key)
+        fernet = encryption_key if isinstance(encryption_key, Fernet) else Fernet(encryption_key)
         encrypted_bytes = base64.b64decode(encrypted_key.encode('utf-8'))
         private_key_bytes = fernet.decrypt(encrypted_bytes)
         return Keypair.from_bytes(private_key_bytes)
     
-    def generate_new_keypair(self,encryption_key: bytes) -> tuple:
+    def generate_new_keypair(self,encryption_key: Union[bytes, Fernet]) -> tuple:
         """
         Generate new keypair and return both keypair and encrypted private key.
         Args:
@@ -325,10 +383,10 @@ class WalletService:
            # Derive the encryption key using the same password and method as creation
            # Note: In production, you should store the salt with the wallet or derive it consistently
            salt = b"obverse-109/*767^&%^%"  # In production, store this with the wallet
-           derived_key, _ = self.generate_fernet_key(password=password, salt=salt)
+           fernet = await self.get_fernet(password, salt)
         
            # Decrypt the private key to restore the keypair
-           restored_keypair = self.decrypt_to_keypair(wallet.encrypted_private_key, derived_key)
+           restored_keypair = self.decrypt_to_keypair(wallet.encrypted_private_key, fernet)
         
            # Verify the restored keypair matches the wallet address
            if str(restored_keypair.pubkey()) != wallet.address:
@@ -364,14 +422,12 @@ class WalletService:
            if salt is None:
               salt = b"obverse-109/*767^&%^%"  # Should match the salt used during encryption
         
-           # Derive the encryption key
-           derived_key, _ = self.generate_fernet_key(password=password, salt=salt)
+           # Derive the encryption key (cached after the first call)
+           fernet = await self.get_fernet(password, salt)
         
            # Decrypt and restore the keypair
-           restored_keypair = self.decrypt_to_keypair(encrypted_private_key, derived_key)
-           print(restored_keypair.pubkey()) 
-
-           logger.info("Successfully restored keypair from encrypted key")
+           restored_keypair = self.decrypt_to_keypair(encrypted_private_key, fernet)
+           logger.info(f"Successfully restored keypair {restored_keypair.pubkey()} from encrypted key")
         #    print(restored_keypair)
            return restored_keypair 
         except Exception as e:
@@ -389,15 +445,15 @@ class WalletService:
         # Password-based encryption
         password = "my-strong-password-123"
         salt = b"obverse-109/*767^&%^%"
-        derived_key ,salt = self.generate_fernet_key(password=password,salt=salt)
-        kp,enc_priv = self.generate_new_keypair(derived_key)
+        fernet = await self.get_fernet(password, salt)
+        kp,enc_priv = self.generate_new_keypair(fernet)
 
         # Encrypt existing keypair with password
-        pw_encrypted = self.encrypt_private_key(kp,derived_key)
+        pw_encrypted = self.encrypt_private_key(kp,fernet)
         # print(f"Password-Encrypted: {pw_encrypted}")
         # Decrypt with password (must use same password and salt)
-        pw_restored = self.decrypt_to_keypair(pw_encrypted, derived_key)
-        print(f"Password-Restored: {pw_restored.pubkey()}")
+        pw_restored = self.decrypt_to_keypair(pw_encrypted, fernet)
+        logger.debug(f"Restored new keypair {pw_restored.pubkey()}")
         public_key = str(pw_restored.pubkey())
         private_key = pw_encrypted
 
@@ -414,7 +470,7 @@ class WalletService:
             contract_address="Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB",
             decimals=6
         )
-        print(f"Public Key: {public_key}")
+        logger.info(f"Creating Solana wallet {public_key} for user {user_id}")
         wallet = Wallet(
             user_id=PydanticObjectId(user_id),
             chain=Chain.SOLANA,
@@ -428,11 +484,10 @@ class WalletService:
 
     async def check_wallet_balance(self,wallet_address)->float:
         """
-        Check the SOL balance of a Solana wallet address using a Helium RPC endpoint.
+        Check the SOL balance of a Solana wallet address through the shared RPC gateway.
 
         Args:
         wallet_address (str): The public key of the wallet to check (base-58 encoded string).
-        helium_rpc_url (str): The Helium RPC endpoint URL.
     
         Returns:
         float: The wallet balance in SOL.
@@ -442,30 +497,82 @@ class WalletService:
         Exception: If there's an error connecting to the RPC or fetching the balance.
         """
         try:
-            # Initialise solana client with Helium RPC endpoint
-            client = Client(self.rpc)
+            cached = self.balance_cache.get_sol(wallet_address)
+            if cached is not None:
+                return cached
             try:
                 pubkey = Pubkey.from_string(wallet_address)
             except ValueError as e:
                 raise ValueError(f"Invalid wallet address: {str(e)}")
-            response = client.get_balance(pubkey)
-            # Check if response is valid and access balance
-            if not hasattr(response, 'value'):
+            balance_lamports = await self.rpc.get_balance(pubkey)
+            if balance_lamports is None:
                 raise Exception("Failed to fetch balance: Invalid RPC response")
         
-            balance_lamports = response.value
-        
             # Convert lamports to SOL (1 SOL = 1_000_000_000 lamports)
             balance_sol = balance_lamports / 1_000_000_000
+            self.balance_cache.set_sol(wallet_address, balance_sol)
         
             return balance_sol
-            
-            # if "results" not in response or "value" not in response["result"]:
-            #     raise Exception("Failed to fetch balance:Invalid RPC Response")
-            # balance_lamports = response["result"]["value"]
-            # balance_sol = balance_lamports / 1_000_000_000
-            # return balance_sol
         except Exception as e:
             raise Exception(f"Error fetching wallet balance : {str(e)}")
 
- 
+    async def get_balances(
+        self,
+        addresses: List[str],
+        *,
+        include_tokens: bool = True,
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Fetches SOL and stablecoin balances for many wallets with batched getMultipleAccounts calls.
+
+        Args:
+            addresses: Wallet public keys (base-58)
+            include_tokens: Also read the USDC/USDT associated token accounts
+            max_concurrency: Chunks of 100 accounts fetched at once (defaults to BALANCE_BATCH_CONCURRENCY)
+
+        Returns:
+            Dict mapping each address to {"sol": ..., "usdc": ..., "usdt": ...}
+
+        Raises:
+            ValueError: If an address is invalid
+        """
+        try:
+            owners = [Pubkey.from_string(address) for address in addresses]
+        except ValueError as e:
+            raise ValueError(f"Invalid wallet address: {str(e)}")
+
+        # (address, balance key, decimals, pubkey) for every account to read
+        lookups = []
+        for address, owner in zip(addresses, owners):
+            lookups.append((address, "sol", 9, owner))
+            if include_tokens:
+                for symbol, (mint, decimals) in STABLECOIN_MINTS.items():
+                    ata = get_associated_token_address(owner, Pubkey.from_string(mint))
+                    lookups.append((address, symbol.value, decimals, ata))
+
+        chunks = [lookups[i:i + MAX_MULTIPLE_ACCOUNTS] for i in range(0, len(lookups), MAX_MULTIPLE_ACCOUNTS)]
+        semaphore = asyncio.Semaphore(max_concurrency or int(os.getenv("BALANCE_BATCH_CONCURRENCY", "4")))
+
+        async def fetch(chunk: list) -> list:
+            async with semaphore:
+                return await self.rpc.get_multiple_accounts([pubkey for *_, pubkey in chunk])
+
+        try:
+            results = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+        except Exception as e:
+            raise Exception(f"Error fetching wallet balances : {str(e)}")
+
+        balances: Dict[str, Dict[str, float]] = {address: {} for address in addresses}
+        for chunk, accounts in zip(chunks, results):
+            for (address, key, decimals, _), account in zip(chunk, accounts):
+                if account is None:
+                    raw = 0
+                elif key == "sol":
+                    raw = account.lamports
+                else:
+                    raw = decode_token_amount(account.data)
+                balances[address][key] = raw / 10 ** decimals
+        for address, balance in balances.items():
+            self.balance_cache.set_sol(address, balance["sol"])
+        return balances
@@ -0,0 +1,239 @@
+from typing import Any, Dict, List, Optional, Set
+from datetime import datetime, timedelta
+from ..models.paymentlink import PaymentLink
+from ..repositories.paymentlink import PaymentLinkRepository
+from .paymentlink import PaymentLinkService
+from dotenv import load_dotenv
+import httpx
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Obverse-Signature"
+EVENT_HEADER = "X-Obverse-Event"
+DELIVERY_HEADER = "X-Obverse-Delivery"
+PAYMENT_LINK_PAID = "payment_link.paid"
+
+
+def sign_payload(secret: str, timestamp: int, body: bytes) -> str:
+    """
+    Signature header value for a webhook body: "t=<unix>,v1=<hex HMAC-SHA256 of '<t>.<body>'>".
+    Merchants recompute it with the shared secret and reject stale timestamps.
+    """
+    message = str(timestamp).encode() + b"." + body
+    digest = hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+class WebhookDeliveryEngine:
+    """
+    Delivers payment_link.paid webhooks for paid links.
+
+    Workers claim deliveries with an atomic find-and-modify lease, so any number of
+    workers across processes can drain the queue without sending the same webhook
+    twice at once. Each merchant gets at most WEBHOOK_MERCHANT_CONCURRENCY deliveries
+    in flight, failures retry with jittered exponential backoff, and deliveries that
+    exhaust WEBHOOK_MAX_ATTEMPTS are dead-lettered for requeue_webhook.
+
+    The merchant cap is counted per process: an engine only knows its own deliveries.
+    The container runs the engine in the single background process, which makes it
+    deployment-wide; running engines in several processes multiplies it by their number.
+    Workers wake as soon as a link is paid in this process, and poll otherwise.
+    """
+    def __init__(
+        self,
+        payment_link_service: PaymentLinkService,
+        *,
+        signing_secret: Optional[str] = None,
+        workers: Optional[int] = None,
+        merchant_concurrency: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        timeout: Optional[float] = None,
+        lease: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None
+    ):
+        """
+        Args:
+            payment_link_service: Service owning the payment link repository
+            signing_secret: HMAC key for the signature header (defaults to WEBHOOK_SIGNING_SECRET)
+            workers: Concurrent delivery workers in this process (WEBHOOK_WORKERS)
+            merchant_concurrency: In-flight deliveries per merchant from this process (WEBHOOK_MERCHANT_CONCURRENCY)
+            max_attempts: Attempts before a delivery is dead-lettered (WEBHOOK_MAX_ATTEMPTS)
+            timeout: Seconds per HTTP attempt (WEBHOOK_TIMEOUT)
+            lease: Seconds a claim stays exclusive; must exceed timeout (WEBHOOK_LEASE)
+            poll_interval: Seconds an idle worker waits before claiming again (WEBHOOK_POLL_INTERVAL)
+            backoff_base: First retry delay in seconds (WEBHOOK_BACKOFF_BASE)
+            backoff_max: Longest retry delay in seconds (WEBHOOK_BACKOFF_MAX)
+
+        Raises:
+            ValueError: If no signing secret is configured
+        """
+        self.repository: PaymentLinkRepository = payment_link_service.repository
+        self.signing_secret = signing_secret or os.getenv("WEBHOOK_SIGNING_SECRET")
+        if not self.signing_secret:
+            raise ValueError("WEBHOOK_SIGNING_SECRET is required to deliver webhooks")
+        self.workers = workers or int(os.getenv("WEBHOOK_WORKERS", "8"))
+        self.merchant_concurrency = merchant_concurrency or int(os.getenv("WEBHOOK_MERCHANT_CONCURRENCY", "4"))
+        self.max_attempts = max_attempts or int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+        self.timeout = timeout or float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+        self.lease = timedelta(seconds=lease or float(os.getenv("WEBHOOK_LEASE", "60")))
+        self.poll_interval = poll_interval or float(os.getenv("WEBHOOK_POLL_INTERVAL", "1"))
+        self.backoff_base = backoff_base or float(os.getenv("WEBHOOK_BACKOFF_BASE", "10"))
+        self.backoff_max = backoff_max or float(os.getenv("WEBHOOK_BACKOFF_MAX", "3600"))
+
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.workers * 2, max_keepalive_connections=self.workers),
+            follow_redirects=False,
+        )
+        # merchant_user_id -> deliveries in flight from this process
+        self._in_flight: Dict[str, int] = {}
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.delivered = 0
+        self.retried = 0
+        self.dead = 0
+        self.released = 0
+        payment_link_service.on_paid(lambda link: self.notify())
+
+    def _saturated_merchants(self) -> Set[str]:
+        return {merchant for merchant, count in self._in_flight.items() if count >= self.merchant_concurrency}
+
+    def retry_delay(self, attempt: int) -> float:
+        """Seconds before retrying after the given failed attempt (equal jitter)."""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def build_payload(self, link: PaymentLink) -> Dict[str, Any]:
+        return {
+            "event": PAYMENT_LINK_PAID,
+            "link_id": link.link_id,
+            "merchant_user_id": link.merchant_user_id,
+            "amount": link.amount,
+            "token_symbol": link.token_symbol,
+            "token_address": link.token_address,
+            "chain": link.chain,
+            "payment_tx_hash": link.payment_tx_hash,
+            "paid_by_user_id": link.paid_by_user_id,
+            "paid_at": link.paid_at.isoformat() if link.paid_at else None,
+            "attempt": link.webhook_attempts,
+        }
+
+    async def deliver(self, link: PaymentLink) -> None:
+        """
+        Sends one claimed delivery and records the outcome
+        """
+        body = json.dumps(self.build_payload(link), separators=(",", ":")).encode()
+        headers = {
+            "Content-Type": "application/json",
+            SIGNATURE_HEADER: sign_payload(self.signing_secret, int(time.time()), body),
+            EVENT_HEADER: PAYMENT_LINK_PAID,
+            DELIVERY_HEADER: link.link_id,
+        }
+        attempt = link.webhook_attempts
+        try:
+            response = await self.client.post(link.webhook_url, content=body, headers=headers)
+            if 200 <= response.status_code < 300:
+                await self.repository.complete_webhook(link.link_id, attempt)
+                self.delivered += 1
+                logger.info(f"Delivered webhook for {link.link_id} on attempt {attempt}")
+                return
+            error = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {str(e)}"
+
+        if attempt >= self.max_attempts:
+            await self.repository.fail_webhook(link.link_id, attempt, error, None)
+            self.dead += 1
+            logger.error(f"Dead-lettered webhook for {link.link_id} after {attempt} attempts: {error}")
+            return
+        next_attempt_at = datetime.utcnow() + timedelta(seconds=self.retry_delay(attempt))
+        await self.repository.fail_webhook(link.link_id, attempt, error, next_attempt_at)
+        self.retried += 1
+        logger.warning(f"Webhook for {link.link_id} failed ({error}); retrying at {next_attempt_at.isoformat()}")
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                link = await self.repository.claim_webhook(self.lease, self._saturated_merchants())
+            except Exception as e:
+                logger.error(f"Webhook claim failed: {str(e)}")
+                link = None
+            if link is None:
+                self._wake.clear()
+                # asyncio.wait rather than wait_for: on 3.11, wait_for can swallow a stop()
+                # cancellation that lands as the poll times out, leaving stop() waiting forever
+                wake = asyncio.ensure_future(self._wake.wait())
+                try:
+                    await asyncio.wait({wake}, timeout=self.poll_interval)
+                finally:
+                    wake.cancel()
+                continue
+
+            merchant = link.merchant_user_id
+            # Other workers may have claimed for this merchant while our claim was in flight,
+            # so the slot is only taken once the claim returns
+            if self._in_flight.get(merchant, 0) >= self.merchant_concurrency:
+                await self._release(link)
+                continue
+            self._in_flight[merchant] = self._in_flight.get(merchant, 0) + 1
+            try:
+                await self.deliver(link)
+            except Exception as e:
+                # The lease expires and another claim retries it
+                logger.error(f"Webhook delivery for {link.link_id} crashed: {str(e)}")
+            finally:
+                self._in_flight[merchant] -= 1
+                if self._in_flight[merchant] == 0:
+                    del self._in_flight[merchant]
+                # A merchant slot freed up; let idle workers look again
+                self._wake.set()
+
+    async def _release(self, link: PaymentLink) -> None:
+        """Gives back a claim that would exceed its merchant's cap"""
+        try:
+            await self.repository.release_webhook(link.link_id, link.webhook_attempts)
+            self.released += 1
+        except Exception as e:
+            # The lease expires and another claim retries it
+            logger.error(f"Releasing webhook claim for {link.link_id} failed: {str(e)}")
+
+    def notify(self) -> None:
+        """Wake idle workers, e.g. right after a link is paid."""
+        self._wake.set()
+
+    def start(self) -> None:
+        """Start the delivery workers."""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            logger.info(f"Webhook delivery engine started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Cancel the workers and close the HTTP pool; leased deliveries are retried after their lease."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.client.aclose()
+        logger.info("Webhook delivery engine stopped")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "in_flight": sum(self._in_flight.values()),
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dead": self.dead,
+            "released": self.released,
+        }
@@ -16,8 +16,12 @@ from .handler.fund import fund_command
 from .handler.balance import balance_command
 from .handler.buy import start_transaction, cancel_transaction, amount_received,timeout_handler,transaction_confirmed,currency_selected,CHOOSE_CURRENCY,INPUT_AMOUNT,CONFIRM_TRANSACTION
 from .config.config import config
+from .processor import ChatOrderedUpdateProcessor
+from .persistence import MongoPersistence, SharedStateApplication
+from api.container import ServiceContainer
+from api.database import get_database
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
 
 # Configure logging
 logging.basicConfig(
@@ -56,6 +60,7 @@ async def setup_handlers(application: Application) -> None:
         ],
         conversation_timeout=300,  # 5 minutes timeout
         name="transaction_conversation",
+        persistent=True,
     )
     application.add_handler(conversation_handler)
     
@@ -63,12 +68,26 @@ async def setup_handlers(application: Application) -> None:
     # Example:
     # application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, echo_handler))
 
-async def start_bot() -> None:
-    """Initialize and start the bot."""
+async def start_bot(container: ServiceContainer) -> None:
+    """Initialize and start the bot with the application's service container."""
     global bot_app
     try:
-        # Create application
-        bot_app = Application.builder().token(config.TELEGRAM_BOT).build()
+        webhook_mode = config.TELEGRAM_MODE == "webhook"
+        if webhook_mode and not config.TELEGRAM_WEBHOOK_SECRET:
+            raise ValueError("TELEGRAM_WEBHOOK_SECRET is required in webhook mode")
+
+        # Create application; in webhook mode updates arrive via FastAPI, so no updater
+        builder = (
+            Application.builder()
+            .application_class(SharedStateApplication)
+            .token(config.TELEGRAM_BOT)
+            .concurrent_updates(ChatOrderedUpdateProcessor(config.BOT_MAX_CONCURRENT_UPDATES))
+            .persistence(MongoPersistence(get_database()))
+        )
+        if webhook_mode:
+            builder = builder.updater(None)
+        bot_app = builder.build()
+        bot_app.bot_data["container"] = container
         
         # Set up handlers
         await setup_handlers(bot_app)
@@ -77,11 +96,18 @@ async def start_bot() -> None:
         await bot_app.initialize()
         await bot_app.start()
         
+        if webhook_mode:
+            if config.TELEGRAM_WEBHOOK_REGISTER:
+                await bot_app.bot.set_webhook(
+                    url=config.TELEGRAM_WEBHOOK_URL,
+                    secret_token=config.TELEGRAM_WEBHOOK_SECRET,
+                    allowed_updates=Update.ALL_TYPES
+                )
         # Start polling
-        if bot_app.updater:
+        elif bot_app.updater:
             await bot_app.updater.start_polling()
         
-        logger.info("Bot started successfully")
+        logger.info(f"Bot started successfully in {config.TELEGRAM_MODE} mode")
         
     except Exception as e:
         logger.error(f"Failed to start bot: {e}")
@@ -108,4 +134,24 @@ async def stop_bot() -> None:
             logger.error(f"Error while stopping bot: {e}")
             raise
         finally:
-            bot_app = None
\ No newline at end of file
+            bot_app = None
+
+def get_bot_app() -> Optional[Application]:
+    """Return the running bot application, if any."""
+    return bot_app
+
+def get_bot_metrics() -> Dict[str, Any]:
+    """
+    Queue depth and update processing counters for the running bot.
+    queue_depth counts every update not yet being handled: those still in the update
+    queue plus those the processor holds behind a chat lock or waiting for a worker.
+    """
+    if bot_app is None:
+        return {"running": False}
+    queued = bot_app.update_queue.qsize()
+    metrics: Dict[str, Any] = {"running": True, "update_queue": queued, "queue_depth": queued}
+    processor = bot_app.update_processor
+    if isinstance(processor, ChatOrderedUpdateProcessor):
+        metrics.update(processor.metrics())
+        metrics["queue_depth"] = queued + metrics["backlog"]
+    return metrics
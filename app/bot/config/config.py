@@ -6,5 +6,14 @@ class Config:
     TELEGRAM_BOT = os.getenv("TELEGRAM_BOT")
     # GEMINI=os.getenv("GOOGLE_API_KEY")
     MONGO_URI=os.getenv("MONGO_URL")
+    # "polling" (dev default) or "webhook" (updates POSTed to the FastAPI app)
+    TELEGRAM_MODE=os.getenv("TELEGRAM_MODE","polling").lower()
+    # Public URL Telegram should POST updates to, e.g. https://api.example.com/telegram/webhook
+    TELEGRAM_WEBHOOK_URL=os.getenv("TELEGRAM_WEBHOOK_URL")
+    TELEGRAM_WEBHOOK_SECRET=os.getenv("TELEGRAM_WEBHOOK_SECRET")
+    # Set to false on all but one replica to avoid every worker re-registering the webhook
+    TELEGRAM_WEBHOOK_REGISTER=os.getenv("TELEGRAM_WEBHOOK_REGISTER","true").lower() == "true"
+    # Updates handled at once across chats; each chat's updates still run in order
+    BOT_MAX_CONCURRENT_UPDATES=int(os.getenv("BOT_MAX_CONCURRENT_UPDATES","32"))
 
 config = Config()
\ No newline at end of file
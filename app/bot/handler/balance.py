@@ -1,12 +1,8 @@
 from telegram import Update,ReplyKeyboardMarkup, ReplyKeyboardRemove,InlineKeyboardButton,InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler,CallbackContext, CallbackQueryHandler
-from api.repositories.user import UserRepository
-from api.services.user import UserService
-from api.services.wallet import WalletService
-from api.repositories.wallet import WalletRepository
 from api.models.wallet import Chain
-from api.services.swap import JupiterSwap
 from dotenv import load_dotenv
+from ..utils.utils import get_container
 import os
 import logging
 
@@ -14,41 +10,21 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-async def get_user_service():
-    # Assuming you have access to user_repository here
-    user_repository = UserRepository()  # You'll need to create this
-    return UserService(user_repository)  # Return an INSTANCE, not the class
-
-async def get_wallet_service():
-    wallet_repository = WalletRepository()
-    return WalletService(wallet_repository)
-
 
 async def balance_command(update: Update,
     context: ContextTypes.DEFAULT_TYPE)->None:
     """Handle the /balance command."""
     user = update.effective_user
     user_info = update.message.from_user
-    user_service = await get_user_service()
-    wallet_service = await get_wallet_service()
-    swap = JupiterSwap()
+    container = get_container(context)
+    user_service = container.user_service
+    wallet_service = container.wallet_service
     try:
-        user = await user_service.get_user(str(user.id))
-        if not user:
-            raise ValueError("User not Found in DB")
-        wallets = await wallet_service.get_user_wallets(str(user.id),chain=Chain.SOLANA)
-        # print(wallets)
-        address = wallets[0].address
-        sol_mint = swap.tokens["SOL"]
+        user_wallet = await user_service.get_user_with_wallet(str(user.id), Chain.SOLANA.value)
+        if not user_wallet or not user_wallet.address:
+            raise ValueError("User or wallet not Found in DB")
+        address = user_wallet.address
         balance = await wallet_service.check_wallet_balance(address)
-        # bal =  swap.get_token_balance(address,sol_mint)
-        encrypt_private_key = wallets[0].encrypted_private_key
-        print(wallets[0].encrypted_private_key)
-        keypair = await wallet_service.restore_keypair_from_encrypted_key(encrypted_private_key=encrypt_private_key)
-        # assert(keypair.pubkey() == address)
-        # print(keypair)
-        print(address)
-        # print(bal)
         balance_message = (
                 f"""
 Thank you for using Obverse! Here's the current balance for your Solana wallet:
@@ -1,12 +1,9 @@
 from telegram import Update,ReplyKeyboardMarkup, ReplyKeyboardRemove,InlineKeyboardButton,InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler,CallbackContext, CallbackQueryHandler
 from dotenv import load_dotenv
-from api.repositories.user import UserRepository
-from api.services.user import UserService
-from api.services.wallet import WalletService
-from api.repositories.wallet import WalletRepository
-from api.services.swap import JupiterSwap
+from ..utils.utils import get_container
 from api.models.wallet import Chain
+from api.models.transaction import Transaction, TransactionStatus, TransactionType
 import os
 import logging
 
@@ -16,15 +13,6 @@ logger = logging.getLogger(__name__)
 # Define conversation states
 CHOOSE_CURRENCY, INPUT_AMOUNT, CONFIRM_TRANSACTION = range(3)
 
-async def get_user_service():
-    # Assuming you have access to user_repository here
-    user_repository = UserRepository()  # You'll need to create this
-    return UserService(user_repository)  # Return an INSTANCE, not the class
-
-async def get_wallet_service():
-    wallet_repository = WalletRepository()
-    return WalletService(wallet_repository)
-
 async def start_transaction(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start the transaction conversation and show currency selection."""
     keyboard = [
@@ -93,6 +81,22 @@ async def amount_received(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return INPUT_AMOUNT
 
+def notify_settled(bot, chat_id: int, currency: str, amount: float):
+    """Build the callback that tells the user how their swap settled."""
+    async def notify(transaction: Transaction, status: TransactionStatus) -> None:
+        if status == TransactionStatus.CONFIRMED:
+            text = (
+                f"🎉 Your purchase of {amount:,.2f} {currency} is complete!\n\n"
+                f"Signature: `{transaction.tx_hash}`"
+            )
+        else:
+            text = (
+                f"❌ Your purchase of {amount:,.2f} {currency} failed on-chain.\n\n"
+                f"Signature: `{transaction.tx_hash}`"
+            )
+        await bot.send_message(chat_id=chat_id, text=text, parse_mode='markdown')
+    return notify
+
 async def transaction_confirmed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle transaction confirmation or cancellation."""
     query = update.callback_query
@@ -102,36 +106,61 @@ async def transaction_confirmed(update: Update, context: ContextTypes.DEFAULT_TY
     if query.data == 'confirm':
         currency = context.user_data['currency']
         amount = context.user_data['amount']
-        amount_lamports = int(amount * 1_000_000_000)
-        swap = JupiterSwap()
-        user_service = await get_user_service()
-        wallet_service = await get_wallet_service()
-        # Here you would implement your actual transaction logic
-        # For now, we'll just simulate a successful transaction
-        token_map = {
-            "SOL":swap.tokens["SOL"],
-            "USDC": swap.tokens["USDC"],
-            "USDT": swap.tokens["USDT"],
-            "PYUSD": swap.tokens["PYUSD"]
+        container = get_container(context)
+        swap = container.swap
+        user_service = container.user_service
+        wallet_service = container.wallet_service
+        buy_functions = {
+            "USDC": swap.buy_usdc_with_sol,
+            "USDT": swap.buy_usdt_with_sol,
         }
-        input_mint = token_map.get("SOL")
-        output_mint = token_map.get(currency, swap.tokens["SOL"])
-        quote = swap.get_quote(input_mint,output_mint,amount_lamports)
-        print(quote["routePlan"])
+        buy = buy_functions.get(currency)
+        if buy is None:
+            await query.edit_message_text(
+                f"⚠️ Buying {currency} is not available yet.\n\n"
+                "Use /buy to choose another stablecoin."
+            )
+            context.user_data.clear()
+            return ConversationHandler.END
+
         try:
-            existing_user = await user_service.get_user(str(user.id))
-            if existing_user:
-               wallets = await wallet_service.get_user_wallets(str(existing_user.id),chain=Chain.SOLANA)
-               address = wallets[0].address
-            #    swap = swap.get_swap(quote,address)
+            user_wallet = await user_service.get_user_with_wallet(str(user.id), Chain.SOLANA.value)
+            if not user_wallet or not user_wallet.address:
+                raise ValueError("User or wallet not Found in DB")
+            keypair = await wallet_service.restore_keypair_from_encrypted_key(user_wallet.encrypted_private_key)
+            signature = await buy(keypair, amount)
+            if not signature:
+                await query.edit_message_text(
+                    f"❌ Transaction Failed\n\n"
+                    f"Could not buy {amount:,.2f} {currency}. Make sure your wallet holds enough SOL (/balance, /fund)."
+                )
+                context.user_data.clear()
+                return ConversationHandler.END
+
+            transaction = await container.transaction_service.record_transaction(
+                str(user_wallet.id),
+                TransactionType.BUY,
+                Chain.SOLANA.value,
+                tx_hash=signature,
+                from_address=user_wallet.address,
+                to_address=user_wallet.address,
+                token_address=swap.tokens[currency],
+                token_symbol=currency,
+                amount=str(amount),
+                initiated=True
+            )
+            await container.confirmation_tracker.watch(
+                transaction,
+                notify_settled(context.bot, query.message.chat_id, currency, amount)
+            )
         except Exception as e:
-            logger.error(f"Error in start command for user {user.id}: {str(e)}")
-            await update.message.reply_text(
+            logger.error(f"Error in buy confirmation for user {user.id}: {str(e)}")
+            await query.edit_message_text(
                 "⚠️ An error occurred while processing your request. Please try again later."
             )
-            raise
-        # swaps = swap.get_swap(quote)
-        
+            context.user_data.clear()
+            return ConversationHandler.END
+
         await query.edit_message_text(
             f"✅ Transaction Confirmed!\n\n"
             f"Currency: {currency}\n"
@@ -143,9 +172,6 @@ async def transaction_confirmed(update: Update, context: ContextTypes.DEFAULT_TY
         # Clear user data
         context.user_data.clear()
         
-        # Here you could add your transaction processing logic
-        # process_transaction(currency, amount, update.effective_user.id)
-        
     elif query.data == 'cancel':
         await query.edit_message_text(
             "❌ Transaction cancelled.\n\n"
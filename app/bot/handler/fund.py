@@ -1,12 +1,9 @@
 import os
 from telegram import Update,ReplyKeyboardMarkup, ReplyKeyboardRemove,InlineKeyboardButton,InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler,CallbackContext, CallbackQueryHandler
-from api.repositories.user import UserRepository
-from api.services.user import UserService
-from api.services.wallet import WalletService
-from api.repositories.wallet import WalletRepository
 from api.models.wallet import Chain
 from dotenv import load_dotenv
+from ..utils.utils import get_container
 from fastapi import FastAPI,Depends
 import logging
 
@@ -14,28 +11,18 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-async def get_user_service():
-    # Assuming you have access to user_repository here
-    user_repository = UserRepository()  # You'll need to create this
-    return UserService(user_repository)  # Return an INSTANCE, not the class
-
-async def get_wallet_service():
-    wallet_repository = WalletRepository()
-    return WalletService(wallet_repository)
-
 async def fund_command( update: Update,
     context: ContextTypes.DEFAULT_TYPE)->None:
     """Handle the /fund command."""
     user = update.effective_user
     user_info = update.message.from_user
-    user_service = await get_user_service()
-    wallet_service = await get_wallet_service()
+    container = get_container(context)
+    user_service = container.user_service
 
     try:
-        existing_user = await user_service.get_user(str(user.id))
-        if existing_user:
-            wallets = await wallet_service.get_user_wallets(str(existing_user.id),chain=Chain.SOLANA)
-            address = wallets[0].address
+        user_wallet = await user_service.get_user_with_wallet(str(user.id), Chain.SOLANA.value)
+        if user_wallet and user_wallet.address:
+            address = user_wallet.address
             fund_message = (
                  f"""
 Ready to fund your Obverse wallet? Follow these simple steps to deposit SOL:
@@ -1,11 +1,8 @@
 import os
 from telegram import Update,ReplyKeyboardMarkup, ReplyKeyboardRemove,InlineKeyboardButton,InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler,CallbackContext, CallbackQueryHandler
-from api.repositories.user import UserRepository
-from api.services.user import UserService
-from api.services.wallet import WalletService
-from api.repositories.wallet import WalletRepository
 from dotenv import load_dotenv
+from ..utils.utils import get_container
 from fastapi import FastAPI,Depends
 import logging
 
@@ -13,15 +10,6 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-async def get_user_service():
-    # Assuming you have access to user_repository here
-    user_repository = UserRepository()  # You'll need to create this
-    return UserService(user_repository)  # Return an INSTANCE, not the class
-
-async def get_wallet_service():
-    wallet_repository = WalletRepository()
-    return WalletService(wallet_repository)
-
 async def start_command(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
@@ -30,8 +18,9 @@ async def start_command(
     user = update.effective_user
     user_info = update.message.from_user
 
-    user_service = await get_user_service()
-    wallet_service = await get_wallet_service()
+    container = get_container(context)
+    user_service = container.user_service
+    wallet_service = container.wallet_service
     
     try:
         existing_user = await user_service.get_user(str(user.id))
@@ -58,7 +47,12 @@ async def start_command(
                 # wallets = await wallet_service.get_user_wallets(str(user_created.id))
                 new_wallet = await wallet_service.create_solana_wallet(str(user_created.id))
                 # logger.info("Created new Solana wallet for user")
-                await user_service.add_wallet_to_user(str(user.id), wallet_id=new_wallet.id)
+                await user_service.add_wallet_to_user(
+                    str(user.id),
+                    wallet_id=new_wallet.id,
+                    address=new_wallet.address,
+                    chain=new_wallet.chain.value
+                )
                 welcome_message += "\n\nA new Solana wallet has been created for you!"
         
         # Send welcome message to all users
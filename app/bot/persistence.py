@@ -0,0 +1,315 @@
+from telegram import Update
+from telegram.ext import Application, BaseHandler, BasePersistence, ConversationHandler, PersistenceInput
+from pymongo import DeleteOne, ReplaceOne
+from typing import Any, Dict, List, Optional, Tuple, Union
+from copy import deepcopy
+from dotenv import load_dotenv
+import asyncio
+import logging
+import os
+import random
+import uuid
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ConversationKey = Tuple[Union[int, str], ...]
+ConversationDict = Dict[ConversationKey, object]
+
+
+class MongoPersistence(BasePersistence):
+    """
+    python-telegram-bot persistence stored in MongoDB through the shared Motor client.
+
+    Conversation states and user_data are kept in a local in-memory copy; writes
+    are buffered per document and flushed as one unordered bulk write after a short
+    debounce window, so a chatty conversation doesn't cost a write per message.
+    Failed flushes are retried with jittered backoff.
+
+    Every stored document carries a revision token. Before an update is handled the
+    chat's conversation state and the user's user_data are re-read, and the stored
+    copy replaces the local one only when another replica wrote a newer revision, so
+    replicas behind a load balancer can carry on each other's conversations (see
+    SharedStateApplication). bot_data is not persisted because it holds the process's
+    service container.
+    """
+    def __init__(
+        self,
+        database: Any,
+        *,
+        collection_name: Optional[str] = None,
+        flush_delay: Optional[float] = None,
+        update_interval: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        flush_attempts: Optional[int] = None
+    ):
+        """
+        Args:
+            database: Motor database to store state in
+            collection_name: Collection for bot state (defaults to BOT_PERSISTENCE_COLLECTION)
+            flush_delay: Seconds to collect writes before flushing (defaults to BOT_PERSISTENCE_FLUSH_DELAY)
+            update_interval: How often PTB pushes user_data/conversations to the persistence
+            max_backoff: Longest delay in seconds between retries of a failed flush (BOT_PERSISTENCE_MAX_BACKOFF)
+            flush_attempts: Attempts flush() makes on shutdown before giving up (BOT_PERSISTENCE_FLUSH_ATTEMPTS)
+        """
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval or float(os.getenv("BOT_PERSISTENCE_UPDATE_INTERVAL", "5")),
+        )
+        self.collection = database[collection_name or os.getenv("BOT_PERSISTENCE_COLLECTION", "bot_state")]
+        self.flush_delay = flush_delay if flush_delay is not None else float(os.getenv("BOT_PERSISTENCE_FLUSH_DELAY", "1.0"))
+        self.max_backoff = max_backoff or float(os.getenv("BOT_PERSISTENCE_MAX_BACKOFF", "60"))
+        self.flush_attempts = flush_attempts or int(os.getenv("BOT_PERSISTENCE_FLUSH_ATTEMPTS", "5"))
+
+        self._user_data: Optional[Dict[int, Dict[Any, Any]]] = None
+        self._conversations: Dict[str, ConversationDict] = {}
+        # document _id -> replacement document, or None to delete it
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        # the batch currently being written, still newer than what MongoDB holds
+        self._writing: Dict[str, Optional[Dict[str, Any]]] = {}
+        # document _id -> revision this process last read or wrote (None: no document)
+        self._revisions: Dict[str, Optional[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        self._failures = 0
+
+    @staticmethod
+    def _conversation_id(name: str, key: ConversationKey) -> str:
+        return f"conversation:{name}:{':'.join(map(str, key))}"
+
+    @staticmethod
+    def _user_data_id(user_id: int) -> str:
+        return f"user_data:{user_id}"
+
+    # ---- reads: loaded at startup, refreshed per update ----
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        if self._user_data is None:
+            self._user_data = {}
+            async for doc in self.collection.find({"kind": "user_data"}):
+                self._user_data[doc["user_id"]] = doc["data"]
+                self._revisions[doc["_id"]] = doc.get("rev")
+        return deepcopy(self._user_data)
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> Optional[Any]:
+        return None
+
+    async def get_conversations(self, name: str) -> ConversationDict:
+        if name not in self._conversations:
+            conversations: ConversationDict = {}
+            async for doc in self.collection.find({"kind": "conversation", "name": name}):
+                conversations[tuple(doc["key"])] = doc["state"]
+                self._revisions[doc["_id"]] = doc.get("rev")
+            self._conversations[name] = conversations
+        return dict(self._conversations[name])
+
+    async def _load_if_changed(self, doc_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Re-reads one document and reports whether another replica changed it since this
+        process last read or wrote it. Documents with local changes still to be written
+        are never reloaded: the local copy is newer.
+        """
+        if doc_id in self._pending or doc_id in self._writing:
+            return False, None
+        doc = await self.collection.find_one({"_id": doc_id})
+        revision = doc.get("rev") if doc is not None else None
+        if self._revisions.get(doc_id) == revision:
+            return False, None
+        if doc_id in self._pending or doc_id in self._writing:
+            return False, None  # written locally while we were reading
+        self._revisions[doc_id] = revision
+        return True, doc
+
+    async def refresh_conversation(self, name: str, key: ConversationKey) -> Tuple[bool, Optional[object]]:
+        """
+        Returns (changed, state) for one conversation; state is None when it has ended
+        """
+        changed, doc = await self._load_if_changed(self._conversation_id(name, key))
+        if not changed:
+            return False, None
+        conversations = self._conversations.setdefault(name, {})
+        if doc is None:
+            conversations.pop(key, None)
+            return True, None
+        conversations[key] = doc["state"]
+        return True, doc["state"]
+
+    async def refresh_conversations(self, update: Update, handlers: Dict[int, List[BaseHandler]]) -> None:
+        """
+        Brings the persistent conversations' state for this update's chat up to date with
+        MongoDB before the handlers look at it. PTB has no public hook for this, so the
+        handler's key and state dict are reached through its protected members.
+        """
+        for group in handlers.values():
+            for handler in group:
+                if not (isinstance(handler, ConversationHandler) and handler.persistent and handler.name):
+                    continue
+                try:
+                    key = handler._get_key(update)
+                except (AttributeError, RuntimeError):
+                    continue  # no chat/user to key on; the handler will ignore it too
+                changed, state = await self.refresh_conversation(handler.name, key)
+                if not changed:
+                    continue
+                conversations = handler._conversations
+                if state is None or state == ConversationHandler.END:
+                    conversations.data.pop(key, None)
+                else:
+                    conversations.update_no_track({key: state})
+
+    # ---- writes: applied locally, buffered for MongoDB ----
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]) -> None:
+        conversations = self._conversations.setdefault(name, {})
+        if conversations.get(key) == new_state:
+            return
+        doc_id = self._conversation_id(name, key)
+        if new_state is None:
+            conversations.pop(key, None)
+            self._buffer(doc_id, None)
+        else:
+            conversations[key] = new_state
+            self._buffer(doc_id, {"kind": "conversation", "name": name, "key": list(key), "state": new_state})
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        if self._user_data is None:
+            self._user_data = {}
+        if self._user_data.get(user_id) == data:
+            return
+        self._user_data[user_id] = deepcopy(data)
+        if data:
+            self._buffer(self._user_data_id(user_id), {"kind": "user_data", "user_id": user_id, "data": deepcopy(data)})
+        else:
+            self._buffer(self._user_data_id(user_id), None)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        if self._user_data is not None:
+            self._user_data.pop(user_id, None)
+        self._buffer(self._user_data_id(user_id), None)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        """Replaces user_data in place if another replica stored a newer copy."""
+        changed, doc = await self._load_if_changed(self._user_data_id(user_id))
+        if not changed:
+            return
+        data = doc["data"] if doc is not None else {}
+        if self._user_data is not None:
+            if data:
+                self._user_data[user_id] = deepcopy(data)
+            else:
+                self._user_data.pop(user_id, None)
+        user_data.clear()
+        user_data.update(deepcopy(data))
+
+    # chat_data and bot_data aren't persisted
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    # ---- batching ----
+
+    def _buffer(self, doc_id: str, doc: Optional[Dict[str, Any]]) -> None:
+        if doc is not None:
+            doc["rev"] = uuid.uuid4().hex
+        self._revisions[doc_id] = doc["rev"] if doc is not None else None
+        self._pending[doc_id] = doc
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush(self.flush_delay))
+
+    def _backoff(self, failures: int) -> float:
+        """Jittered exponential delay before retrying after the given number of failed flushes."""
+        delay = min(self.max_backoff, self.flush_delay * (2 ** failures))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _delayed_flush(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # A write already in progress must finish even if flush() cancels this task
+        if await asyncio.shield(self._write_pending()):
+            self._failures = 0
+            return
+        self._failures += 1
+        retry_in = self._backoff(self._failures)
+        logger.warning(f"Retrying {len(self._pending)} bot state changes in {retry_in:.1f}s")
+        self._flush_task = asyncio.create_task(self._delayed_flush(retry_in))
+
+    async def _write_pending(self) -> bool:
+        async with self._write_lock:
+            return await self._write_batch()
+
+    async def _write_batch(self) -> bool:
+        """Writes everything buffered; returns False if it failed and was put back."""
+        if not self._pending:
+            return True
+        pending, self._pending = self._pending, {}
+        self._writing = pending
+        operations = [
+            DeleteOne({"_id": doc_id}) if doc is None else ReplaceOne({"_id": doc_id}, doc, upsert=True)
+            for doc_id, doc in pending.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to persist {len(operations)} bot state changes: {str(e)}")
+            # Keep the changes for the next flush unless something newer replaced them
+            for doc_id, doc in pending.items():
+                self._pending.setdefault(doc_id, doc)
+            return False
+        finally:
+            self._writing = {}
+
+    async def flush(self) -> None:
+        """Write everything still buffered, retrying with backoff; PTB calls this on shutdown."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+        for attempt in range(self.flush_attempts):
+            if await self._write_pending():
+                self._failures = 0
+                return
+            if attempt + 1 < self.flush_attempts:
+                await asyncio.sleep(self._backoff(attempt + 1))
+        logger.error(f"Dropping {len(self._pending)} bot state changes after {self.flush_attempts} failed flushes")
+
+
+class SharedStateApplication(Application):
+    """
+    Application whose conversations can move between replicas.
+
+    Before each update the chat's persistent conversation state is refreshed from
+    MongoPersistence, and afterwards the changes are handed to the persistence right
+    away instead of on the next update_interval tick, so the next replica to get one
+    of this chat's updates sees them once the debounced flush lands.
+    """
+    async def process_update(self, update: object) -> None:
+        if isinstance(update, Update) and isinstance(self.persistence, MongoPersistence):
+            await self.persistence.refresh_conversations(update, self.handlers)
+        await super().process_update(update)
+        if self.persistence is not None:
+            await self.update_persistence()
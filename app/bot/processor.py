@@ -0,0 +1,90 @@
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from typing import Any, Awaitable, Dict, Hashable, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates concurrently across chats while keeping each chat's updates
+    strictly in arrival order, so ConversationHandler state transitions stay correct.
+
+    process_update is marked @final in BaseUpdateProcessor, whose version takes a worker
+    slot before anything else; it is overridden here so the chat lock comes first. Worker
+    slots still come from the base class's semaphore, so current_concurrent_updates holds.
+    """
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        # chat key -> [lock, number of updates holding or waiting on it]
+        self._chat_locks: Dict[Hashable, list] = {}
+        self.in_flight = 0
+        self.waiting = 0
+
+    @staticmethod
+    def _ordering_key(update: object) -> Optional[Hashable]:
+        if isinstance(update, Update):
+            if update.effective_chat is not None:
+                return ("chat", update.effective_chat.id)
+            if update.effective_user is not None:
+                return ("user", update.effective_user.id)
+        return None
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        # The chat lock must be requested before anything else awaits: tasks start in
+        # the order updates left the queue, and asyncio.Lock wakes waiters FIFO.
+        # It is taken before a worker slot so one busy chat can't hold the pool.
+        key = self._ordering_key(update)
+        if key is None:
+            await self._run(update, coroutine)
+            return
+
+        entry = self._chat_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def _run(self, update: object, coroutine: Awaitable[Any]) -> None:
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            await self.do_process_update(update, coroutine)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def blocked_on_chat(self) -> int:
+        """Updates queued behind an earlier update of the same chat"""
+        return sum(count - 1 for _, count in self._chat_locks.values())
+
+    def metrics(self) -> Dict[str, int]:
+        blocked = self.blocked_on_chat
+        return {
+            "max_concurrent_updates": self.max_concurrent_updates,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,  # Waiting for a worker slot
+            "blocked_on_chat": blocked,
+            "backlog": self.waiting + blocked,
+            "active_chats": len(self._chat_locks),
+        }
@@ -1,5 +1,12 @@
 from dotenv import load_dotenv
+from telegram.ext import ContextTypes
+from api.container import ServiceContainer
 import os
 
 load_dotenv()
 
+
+def get_container(context: ContextTypes.DEFAULT_TYPE) -> ServiceContainer:
+    """Return the service container the bot was started with."""
+    return context.bot_data["container"]
+
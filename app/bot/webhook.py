@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Header, HTTPException, Request
+from telegram import Update
+from .bot import get_bot_app, get_bot_metrics
+from .config.config import config
+from typing import Optional
+import secrets
+import logging
+
+logger = logging.getLogger(__name__)
+
+telegram_router = APIRouter(prefix="/telegram", tags=["telegram"])
+
+
+@telegram_router.post("/webhook")
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None)
+):
+    """
+    Receives Telegram updates in webhook mode and queues them for the bot
+    """
+    bot_app = get_bot_app()
+    if config.TELEGRAM_MODE != "webhook" or bot_app is None:
+        raise HTTPException(status_code=404, detail="Webhook mode is not enabled")
+    if not x_telegram_bot_api_secret_token or not secrets.compare_digest(
+        x_telegram_bot_api_secret_token, config.TELEGRAM_WEBHOOK_SECRET
+    ):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Body is not a Telegram update")
+    try:
+        update = Update.de_json(data, bot_app.bot)
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Body is not a Telegram update")
+    await bot_app.update_queue.put(update)
+    return {"ok": True}
+
+
+@telegram_router.get("/metrics")
+async def telegram_metrics():
+    """
+    Bot update queue depth and in-flight counts
+    """
+    return get_bot_metrics()
@@ -1,10 +1,14 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from api.database import init_db
+from api.container import ServiceContainer
 from bot.bot import start_bot,stop_bot
+from bot.webhook import telegram_router
 import logging
 from api.routes.users import users_router
 from api.routes.wallets import wallet_router
+from api.routes.transactions import transaction_router
+from api.routes.metrics import metrics_router
 
 
 @asynccontextmanager
@@ -12,22 +16,29 @@ async def lifespan(app: FastAPI):
     """Manage application lifespan events."""
     # Startup
     logging.info("Starting up FastAPI application...")
-    await start_bot()
     await init_db()
-    logging.info("FastAPI application started successfully")
     logging.info("MongoDB database connected successfully")
+    container = ServiceContainer()
+    await container.start()
+    app.state.container = container
+    await start_bot(container)
+    logging.info("FastAPI application started successfully")
     
     yield
     
     # Shutdown
     logging.info("Shutting down FastAPI application...")
     await stop_bot()
+    await container.close()
     logging.info("FastAPI application shut down successfully")
 
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(users_router)
 app.include_router(wallet_router)
+app.include_router(transaction_router)
+app.include_router(metrics_router)
+app.include_router(telegram_router)
 
 @app.get("/")
 async def root():
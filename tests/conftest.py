@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The application imports its packages as top-level modules (api, bot), as main.py does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
@@ -0,0 +1,228 @@
+from copy import copy
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple
+from api.models.paymentlink import Status, WebhookStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import itertools
+import json
+import threading
+import time
+import websockets
+
+
+async def wait_until(predicate: Callable[[], bool], timeout: float = 3.0) -> None:
+    """Polls predicate until it holds, failing the test after timeout seconds"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        await asyncio.sleep(0.01)
+
+
+class FakeSolanaNode:
+    """
+    Local stand-in for a Solana RPC websocket: acknowledges (un)subscribe requests
+    with fresh subscription ids and pushes notifications when the test asks it to
+    """
+    NOTIFICATIONS = {"signatureSubscribe": "signatureNotification", "accountSubscribe": "accountNotification"}
+
+    def __init__(self, ack_delay: float = 0):
+        self.ack_delay = ack_delay
+        self.url: Optional[str] = None
+        self.requests: List[Dict[str, Any]] = []
+        self.connections = 0
+        # server subscription id -> (method, params)
+        self.subscriptions: Dict[int, Tuple[str, List[Any]]] = {}
+        self._ids = itertools.count(100)
+        self._server: Any = None
+        self._ws: Any = None
+
+    async def start(self) -> "FakeSolanaNode":
+        self._server = await websockets.serve(self._handler, "127.0.0.1", 0)
+        port = next(iter(self._server.sockets)).getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}"
+        return self
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handler(self, ws: Any, *args: Any) -> None:
+        self.connections += 1
+        self._ws = ws
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                self.requests.append(message)
+                if self.ack_delay:
+                    await asyncio.sleep(self.ack_delay)
+                if message["method"].endswith("Unsubscribe"):
+                    result: Any = self.subscriptions.pop(message["params"][0], None) is not None
+                else:
+                    result = next(self._ids)
+                    self.subscriptions[result] = (message["method"], message["params"])
+                await ws.send(json.dumps({"jsonrpc": "2.0", "id": message["id"], "result": result}))
+        except websockets.ConnectionClosed:
+            pass
+
+    def subscribed(self, method: str, target: str) -> Optional[int]:
+        """Server id of the live subscription for a signature/account, if any"""
+        for server_id, (sub_method, params) in self.subscriptions.items():
+            if sub_method == method and params[0] == target:
+                return server_id
+        return None
+
+    def requests_for(self, method: str) -> List[Dict[str, Any]]:
+        return [message for message in self.requests if message["method"] == method]
+
+    async def notify(self, method: str, target: str, result: Dict[str, Any]) -> None:
+        server_id = self.subscribed(method, target)
+        assert server_id is not None, f"No {method} for {target}"
+        if method == "signatureSubscribe":
+            # The node drops signature subscriptions after their single notification
+            del self.subscriptions[server_id]
+        await self._ws.send(json.dumps({
+            "jsonrpc": "2.0",
+            "method": self.NOTIFICATIONS[method],
+            "params": {"subscription": server_id, "result": result},
+        }))
+
+    async def drop_connection(self) -> None:
+        """Closes the current socket as a node restart would, forgetting its subscriptions"""
+        self.subscriptions.clear()
+        await self._ws.close()
+
+
+class FakeMerchantServer:
+    """
+    Local stand-in for merchants' webhook endpoints: records every POST and answers with
+    the next scripted status for its path (200 once the script runs out)
+    """
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.requests: List[Dict[str, Any]] = []
+        # path -> statuses to answer with, in order
+        self.script: Dict[str, List[int]] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.max_in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> "FakeMerchantServer":
+        merchant = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with merchant._lock:
+                    merchant.in_flight[self.path] = merchant.in_flight.get(self.path, 0) + 1
+                    merchant.max_in_flight[self.path] = max(
+                        merchant.max_in_flight.get(self.path, 0), merchant.in_flight[self.path]
+                    )
+                    script = merchant.script.get(self.path, [])
+                    status = script.pop(0) if script else 200
+                time.sleep(merchant.delay)
+                with merchant._lock:
+                    merchant.in_flight[self.path] -= 1
+                    merchant.requests.append({"path": self.path, "headers": dict(self.headers), "body": body})
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}{path}"
+
+    def requests_for(self, path: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [request for request in self.requests if request["path"] == path]
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def make_link(link_id: str, webhook_url: str, merchant: str = "merchant-1", paid: bool = True) -> Any:
+    now = datetime.utcnow()
+    return SimpleNamespace(
+        link_id=link_id, merchant_user_id=merchant, amount="5", token_symbol="USDC",
+        token_address="mint", chain="solana", webhook_url=webhook_url, expires_at=None,
+        status=Status.PAID if paid else Status.ACTIVE,
+        payment_tx_hash="sig" if paid else None, paid_by_user_id="payer" if paid else None,
+        paid_at=now if paid else None,
+        webhook_status=WebhookStatus.PENDING if paid else None, webhook_attempts=0,
+        webhook_next_attempt_at=now if paid else None, webhook_lease_until=None, webhook_last_error=None,
+    )
+
+
+class FakePaymentLinkRepository:
+    """In-memory stand-in for the webhook queue operations of PaymentLinkRepository"""
+    def __init__(self, links: List[Any]):
+        self.links = {link.link_id: link for link in links}
+
+    def _leased(self, link_id: str, attempt: int) -> Optional[Any]:
+        link = self.links[link_id]
+        if link.webhook_status == WebhookStatus.DELIVERING and link.webhook_attempts == attempt:
+            return link
+        return None
+
+    async def claim_webhook(self, lease: timedelta, exclude_merchants: Collection[str] = ()) -> Optional[Any]:
+        # A database round trip, during which other workers can claim too
+        await asyncio.sleep(0)
+        now = datetime.utcnow()
+        due = [
+            link for link in self.links.values()
+            if link.status == Status.PAID and link.webhook_url and link.merchant_user_id not in exclude_merchants
+            and (
+                (link.webhook_status == WebhookStatus.PENDING and link.webhook_next_attempt_at <= now)
+                or (link.webhook_status == WebhookStatus.DELIVERING and link.webhook_lease_until < now)
+            )
+        ]
+        if not due:
+            return None
+        link = min(due, key=lambda link: link.webhook_next_attempt_at)
+        link.webhook_status = WebhookStatus.DELIVERING
+        link.webhook_lease_until = now + lease
+        link.webhook_attempts += 1
+        return copy(link)
+
+    async def complete_webhook(self, link_id: str, attempt: int) -> Optional[Any]:
+        link = self._leased(link_id, attempt)
+        if link is not None:
+            link.webhook_status = WebhookStatus.DELIVERED
+        return link
+
+    async def fail_webhook(self, link_id: str, attempt: int, error: str, next_attempt_at: Optional[datetime]) -> Optional[Any]:
+        link = self._leased(link_id, attempt)
+        if link is not None:
+            link.webhook_status = WebhookStatus.PENDING if next_attempt_at else WebhookStatus.DEAD
+            link.webhook_next_attempt_at = next_attempt_at
+            link.webhook_last_error = error
+        return link
+
+    async def release_webhook(self, link_id: str, attempt: int) -> Optional[Any]:
+        link = self._leased(link_id, attempt)
+        if link is not None:
+            link.webhook_status = WebhookStatus.PENDING
+            link.webhook_attempts -= 1
+        return link
+
+    async def get_by_link_id(self, link_id: str) -> Optional[Any]:
+        return copy(self.links.get(link_id))
+
+    async def mark_as_paid(self, link_id: str, tx_hash: str, paid_by_user_id: str) -> Optional[Any]:
+        link = self.links.get(link_id)
+        if link is None or link.status != Status.ACTIVE:
+            return None
+        paid = make_link(link_id, link.webhook_url, link.merchant_user_id)
+        self.links[link_id] = paid
+        return copy(paid)
@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from api.models.transaction import TransactionType
+from api.services.deposits import DepositWatcher, _WatchedAccount, account_delta
+import asyncio
+
+OWNER = "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin"
+OTHER = "So11111111111111111111111111111111111111112"
+
+
+def make_transaction(keys: List[str], pre: List[int], post: List[int], err: Any = None) -> Any:
+    meta = SimpleNamespace(
+        err=err, pre_balances=pre, post_balances=post, loaded_addresses=None,
+        pre_token_balances=[], post_token_balances=[]
+    )
+    message = SimpleNamespace(account_keys=keys)
+    return SimpleNamespace(transaction=SimpleNamespace(meta=meta, transaction=SimpleNamespace(message=message)))
+
+
+class FakeRPC:
+    """Serves a fixed newest-first signature history and the transactions behind it"""
+    def __init__(self, history: List[tuple]):
+        self.history = history
+        self.lamports = 0
+
+    async def get_signatures_for_address(self, address: Any, **kwargs: Any) -> List[Any]:
+        return [SimpleNamespace(signature=signature, err=None) for signature, _ in self.history][:kwargs["limit"]]
+
+    async def get_transaction(self, signature: str, **kwargs: Any) -> Any:
+        return dict(self.history)[signature]
+
+    async def get_multiple_accounts(self, pubkeys: List[Any], **kwargs: Any) -> List[Any]:
+        return [SimpleNamespace(lamports=self.lamports)]
+
+
+class FakeTransactionService:
+    def __init__(self, failures: int = 0, on_record: Optional[Dict[str, TransactionType]] = None):
+        self.failures = failures
+        self.on_record = on_record or {}
+        self.recorded: List[tuple] = []
+
+    async def record_transaction(self, user_id: str, tx_type: TransactionType, chain: str, **kwargs: Any) -> Any:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        tx_hash = kwargs["tx_hash"]
+        if tx_hash in self.on_record:
+            return SimpleNamespace(tx_type=self.on_record[tx_hash])
+        self.recorded.append((tx_hash, kwargs["amount"]))
+        return SimpleNamespace(tx_type=tx_type)
+
+
+def make_watcher(rpc: FakeRPC, transactions: FakeTransactionService) -> DepositWatcher:
+    wallet_service = SimpleNamespace(balance_cache=SimpleNamespace(set_sol=lambda address, balance: None))
+    watcher = DepositWatcher(
+        wallet_service, transactions, rpc, signature_lookback=10, retry_delay=0.01, max_retry_delay=0.01
+    )
+    wallet = SimpleNamespace(id="wallet-1", user_id="user-1", address=OWNER)
+    watcher._accounts[OWNER] = _WatchedAccount(wallet, "sol", None, 9, 1.0)
+    return watcher
+
+
+def test_account_delta_reads_the_account_by_index():
+    transaction = make_transaction([OTHER, OWNER], [5, 10], [2, 13])
+    assert account_delta(transaction, OWNER, None) == 3
+    assert account_delta(transaction, "missing", None) == 0
+    assert account_delta(make_transaction([OWNER], [0], [5], err={"fail": 1}), OWNER, None) == 0
+
+
+def test_deposits_are_attributed_to_the_transactions_that_credited_the_account():
+    rpc = FakeRPC([
+        ("outgoing", make_transaction([OWNER, OTHER], [10, 0], [7, 3])),
+        ("second", make_transaction([OTHER, OWNER], [9, 5], [5, 9])),
+        ("first", make_transaction([OWNER], [0], [1])),
+        ("older", make_transaction([OWNER], [0], [100])),
+    ])
+    transactions = FakeTransactionService()
+    watcher = make_watcher(rpc, transactions)
+
+    asyncio.run(watcher._on_account(OWNER, {"value": {"lamports": 1_000_000_005}}))
+
+    assert transactions.recorded == [("second", "0.000000004"), ("first", "0.000000001")]
+    assert watcher._accounts[OWNER].raw_balance == 1_000_000_005
+
+
+def test_swaps_already_on_record_are_not_counted_as_deposits():
+    rpc = FakeRPC([("swap", make_transaction([OWNER], [0], [5]))])
+    transactions = FakeTransactionService(on_record={"swap": TransactionType.BUY})
+    watcher = make_watcher(rpc, transactions)
+
+    asyncio.run(watcher._on_account(OWNER, {"value": {"lamports": 1_000_000_005}}))
+
+    assert transactions.recorded == []
+    assert watcher.deposits == 0
+
+
+def test_failed_recording_hands_the_delta_back_and_re_reads_the_account():
+    async def test() -> None:
+        rpc = FakeRPC([("deposit", make_transaction([OWNER], [0], [5]))])
+        rpc.lamports = 1_000_000_005
+        transactions = FakeTransactionService(failures=1)
+        watcher = make_watcher(rpc, transactions)
+
+        await watcher._on_account(OWNER, {"value": {"lamports": 1_000_000_005}})
+        assert watcher._accounts[OWNER].raw_balance == 1_000_000_000
+
+        await asyncio.gather(*watcher._resyncs.values())
+        assert transactions.recorded == [("deposit", "0.000000005")]
+        assert watcher._accounts[OWNER].raw_balance == 1_000_000_005
+        assert not watcher._resync_attempts
+
+    asyncio.run(test())
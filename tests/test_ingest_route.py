@@ -0,0 +1,64 @@
+from typing import Any, List
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.models.transaction import IngestReport
+from api.routes.transactions import MAX_INGEST_LINE_BYTES, get_transaction_service, transaction_router
+import json
+import pytest
+
+TOKEN = "service-token"
+
+
+class FakeTransactionService:
+    """Drains the record stream the route hands over, as ingest_transactions does"""
+    def __init__(self):
+        self.records: List[Any] = []
+
+    async def ingest_transactions(self, records: Any) -> IngestReport:
+        async for record in records:
+            self.records.append(record)
+        return IngestReport(received=len(self.records))
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("INGEST_SERVICE_TOKEN", TOKEN)
+    service = FakeTransactionService()
+    app = FastAPI()
+    app.include_router(transaction_router)
+    app.dependency_overrides[get_transaction_service] = lambda: service
+    client = TestClient(app)
+    client.service = service
+    return client
+
+
+def record(tx_hash: str) -> bytes:
+    return json.dumps({"user_id": "u1", "chain": "solana", "tx_type": "receive", "tx_hash": tx_hash}).encode()
+
+
+def test_ingest_requires_the_service_token(client: TestClient):
+    assert client.post("/transactions/ingest", content=record("a")).status_code == 403
+    assert client.post("/transactions/ingest", content=record("a"), headers={"X-Service-Token": "nope"}).status_code == 403
+    assert client.service.records == []
+
+
+def test_ingest_is_hidden_without_a_configured_token(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("INGEST_SERVICE_TOKEN")
+    assert client.post("/transactions/ingest", content=record("a"), headers={"X-Service-Token": ""}).status_code == 404
+
+
+def test_ingest_streams_ndjson_records(client: TestClient):
+    def body():
+        # Records split across chunks, a blank line, a bad line and no trailing newline
+        yield record("a")[:10]
+        yield record("a")[10:] + b"\n\n" + record("b") + b"\nnot json\n"
+        yield b"x" * (MAX_INGEST_LINE_BYTES + 1)
+        yield b"\n" + record("c")
+
+    response = client.post("/transactions/ingest", content=body(), headers={"X-Service-Token": TOKEN})
+
+    assert response.status_code == 200
+    assert response.json()["received"] == 5
+    records = client.service.records
+    assert [r["tx_hash"] for r in (records[0], records[1], records[4])] == ["a", "b", "c"]
+    assert records[2:4] == ["not json", "line too long"]
@@ -0,0 +1,107 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pymongo.errors import DuplicateKeyError
+from api.migrations import CLAIM_LEASE, MIGRATIONS_COLLECTION, drop_payment_link_expiry_ttl, run_migrations
+import asyncio
+import pytest
+
+
+class FakeMigrationsCollection:
+    """The few operations run_migrations makes on its bookkeeping collection"""
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+
+    async def insert_one(self, doc: Dict[str, Any]) -> None:
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one_and_update(self, query: Dict[str, Any], update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        doc = self.docs.get(query["_id"])
+        if doc is None or "applied_at" in doc or doc["started_at"] >= query["started_at"]["$lt"]:
+            return None
+        doc.update(update["$set"])
+        return doc
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> None:
+        self.docs[query["_id"]].update(update["$set"])
+
+    async def delete_one(self, query: Dict[str, Any]) -> None:
+        self.docs.pop(query["_id"], None)
+
+
+def make_database() -> Dict[str, Any]:
+    return {MIGRATIONS_COLLECTION: FakeMigrationsCollection()}
+
+
+def test_migrations_run_once():
+    database = make_database()
+    runs: List[str] = []
+
+    async def first(db: Any) -> None:
+        runs.append("first")
+
+    async def second(db: Any) -> None:
+        runs.append("second")
+
+    assert asyncio.run(run_migrations(database, [("first", first)])) == ["first"]
+    assert asyncio.run(run_migrations(database, [("first", first), ("second", second)])) == ["second"]
+    assert runs == ["first", "second"]
+    assert all("applied_at" in doc for doc in database[MIGRATIONS_COLLECTION].docs.values())
+
+
+def test_failed_migration_is_retried_on_next_start():
+    database = make_database()
+    attempts: List[int] = []
+
+    async def flaky(db: Any) -> None:
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("database unavailable")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run_migrations(database, [("flaky", flaky)]))
+    assert asyncio.run(run_migrations(database, [("flaky", flaky)])) == ["flaky"]
+    assert len(attempts) == 2
+
+
+def test_claims_in_progress_are_left_alone_until_abandoned():
+    database = make_database()
+    collection = database[MIGRATIONS_COLLECTION]
+    runs: List[str] = []
+
+    async def migration(db: Any) -> None:
+        runs.append("ran")
+
+    collection.docs["busy"] = {"_id": "busy", "started_at": datetime.utcnow()}
+    collection.docs["abandoned"] = {"_id": "abandoned", "started_at": datetime.utcnow() - 2 * CLAIM_LEASE}
+
+    applied = asyncio.run(run_migrations(database, [("busy", migration), ("abandoned", migration)]))
+
+    assert applied == ["abandoned"]
+    assert runs == ["ran"]
+
+
+class FakeIndexedCollection:
+    def __init__(self, indexes: Dict[str, Dict[str, Any]]):
+        self.indexes = indexes
+
+    async def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self.indexes)
+
+    async def drop_index(self, name: str) -> None:
+        del self.indexes[name]
+
+
+def test_only_the_old_expiry_ttl_index_is_dropped():
+    collection = FakeIndexedCollection({
+        "_id_": {"key": [("_id", 1)]},
+        "expires_at_1": {"key": [("expires_at", 1)], "expireAfterSeconds": 0},
+        "status_1_expires_at_1": {"key": [("status", 1), ("expires_at", 1)]},
+        "expired_at_1": {"key": [("expired_at", 1)], "expireAfterSeconds": 2592000},
+        "operator_added": {"key": [("amount", 1)]},
+    })
+
+    asyncio.run(drop_payment_link_expiry_ttl({"payment_links": collection}))
+
+    assert sorted(collection.indexes) == ["_id_", "expired_at_1", "operator_added", "status_1_expires_at_1"]
@@ -0,0 +1,42 @@
+from api.models.paymentlink import Status
+from api.services.balancecache import BalanceCache, LocalInvalidationBroker
+from api.services.paymentlink import PaymentLinkService
+from fakes import FakePaymentLinkRepository, make_link
+import asyncio
+import pytest
+
+
+def test_paying_a_link_evicts_it_from_other_services_on_the_broker():
+    async def test() -> None:
+        repository = FakePaymentLinkRepository([make_link("pl_1", "http://merchant/hook", paid=False)])
+        broker = LocalInvalidationBroker()
+        here = PaymentLinkService(repository, broker=broker)
+        elsewhere = PaymentLinkService(repository, broker=broker)
+        balances = BalanceCache(broker)
+        balances.set_sol("pl_1", 1.0)
+
+        assert (await elsewhere.get_payment_link("pl_1")).status == Status.ACTIVE
+        await here.process_payment_confirmation("pl_1", "sig", "payer")
+
+        assert (await elsewhere.get_payment_link("pl_1")).status == Status.PAID
+        # Link invalidations travel on their own topic
+        assert balances.get_sol("pl_1") == 1.0
+
+    asyncio.run(test())
+
+
+def test_confirming_a_link_paid_elsewhere_is_rejected():
+    async def test() -> None:
+        repository = FakePaymentLinkRepository([make_link("pl_1", "http://merchant/hook", paid=False)])
+        here = PaymentLinkService(repository)
+        elsewhere = PaymentLinkService(repository)
+
+        # Cached as active here before the other process (on its own broker) takes the payment
+        await here.get_payment_link("pl_1")
+        await elsewhere.process_payment_confirmation("pl_1", "sig", "payer")
+
+        with pytest.raises(ValueError):
+            await here.process_payment_confirmation("pl_1", "sig-2", "payer-2")
+        assert repository.links["pl_1"].payment_tx_hash == "sig"
+
+    asyncio.run(test())
@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import List
+from telegram import Chat, Message, Update
+from bot.processor import ChatOrderedUpdateProcessor
+import asyncio
+
+
+def chat_update(update_id: int, chat_id: int) -> Update:
+    message = Message(message_id=update_id, date=datetime.now(), chat=Chat(id=chat_id, type=Chat.PRIVATE))
+    return Update(update_id=update_id, message=message)
+
+
+def test_chats_stay_ordered_and_blocked_updates_count_as_backlog():
+    async def test() -> None:
+        processor = ChatOrderedUpdateProcessor(2)
+        release = asyncio.Event()
+        handled: List[int] = []
+
+        async def handle(update_id: int) -> None:
+            await release.wait()
+            handled.append(update_id)
+
+        updates = [chat_update(1, 10), chat_update(2, 10), chat_update(3, 10), chat_update(4, 20), chat_update(5, 30)]
+        tasks = [asyncio.create_task(processor.process_update(u, handle(u.update_id))) for u in updates]
+        await asyncio.sleep(0.01)
+
+        # Chat 10 runs one update with two behind it; chat 20 runs; chat 30 waits for a slot
+        metrics = processor.metrics()
+        assert metrics["in_flight"] == 2
+        assert metrics["blocked_on_chat"] == 2
+        assert metrics["waiting"] == 1
+        assert metrics["backlog"] == 3
+        assert processor.current_concurrent_updates == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert [u for u in handled if u in (1, 2, 3)] == [1, 2, 3]
+        assert processor.metrics()["backlog"] == 0
+        assert processor.current_concurrent_updates == 0
+
+    asyncio.run(test())
@@ -0,0 +1,174 @@
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from solders.transaction_status import TransactionConfirmationStatus
+from api.models.transaction import TransactionStatus
+from api.services.confirmations import ConfirmationTracker
+from api.services.subscriptions import SubscriptionManager
+from fakes import FakeSolanaNode, wait_until
+import asyncio
+
+ACCOUNT = "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin"
+SIGNATURE = "5VERv8NMvzbJMEkV8xnrLkEaWRtSz9CosKDYjCJjBRnbJLgp8uirBgmQpjKhoR4tjF3ZpRzrFmBV6UjKdiSZkQUW"
+
+
+def make_manager(node: FakeSolanaNode) -> SubscriptionManager:
+    manager = SubscriptionManager(node.url, ping_interval=5, max_backoff=0.05, name="test")
+    manager.backoff_base = 0.01
+    return manager
+
+
+async def with_node(test, **node_kwargs) -> None:
+    node = await FakeSolanaNode(**node_kwargs).start()
+    manager = make_manager(node)
+    manager.start()
+    try:
+        await asyncio.wait_for(manager.connected.wait(), 3)
+        await test(node, manager)
+    finally:
+        await manager.stop()
+        await node.stop()
+
+
+def test_account_notifications_reach_the_callback():
+    async def test(node: FakeSolanaNode, manager: SubscriptionManager) -> None:
+        received: List[Dict[str, Any]] = []
+
+        async def on_account(result: Dict[str, Any]) -> None:
+            received.append(result)
+
+        await manager.subscribe_account(ACCOUNT, on_account)
+        await wait_until(lambda: node.subscribed("accountSubscribe", ACCOUNT) is not None)
+        await node.notify("accountSubscribe", ACCOUNT, {"value": {"lamports": 1}})
+        await node.notify("accountSubscribe", ACCOUNT, {"value": {"lamports": 2}})
+        await wait_until(lambda: len(received) == 2)
+
+        assert [r["value"]["lamports"] for r in received] == [1, 2]
+        assert manager.metrics()["active"] == 1
+
+    asyncio.run(with_node(test))
+
+
+def test_reconnect_resubscribes_live_subscriptions():
+    async def test(node: FakeSolanaNode, manager: SubscriptionManager) -> None:
+        received: List[Dict[str, Any]] = []
+
+        async def on_account(result: Dict[str, Any]) -> None:
+            received.append(result)
+
+        await manager.subscribe_account(ACCOUNT, on_account)
+        await wait_until(lambda: node.subscribed("accountSubscribe", ACCOUNT) is not None)
+        await node.drop_connection()
+
+        await wait_until(lambda: node.connections == 2 and node.subscribed("accountSubscribe", ACCOUNT) is not None)
+        await wait_until(lambda: manager.metrics()["active"] == 1)
+        await node.notify("accountSubscribe", ACCOUNT, {"value": {"lamports": 3}})
+        await wait_until(lambda: len(received) == 1)
+
+        assert manager.reconnects >= 1
+        assert len(node.requests_for("accountSubscribe")) == 2
+
+    asyncio.run(with_node(test))
+
+
+def test_unsubscribe_before_acknowledgement_is_sent_once_acknowledged():
+    async def test(node: FakeSolanaNode, manager: SubscriptionManager) -> None:
+        async def on_account(result: Dict[str, Any]) -> None:
+            raise AssertionError("Cancelled subscription was notified")
+
+        handle = await manager.subscribe_account(ACCOUNT, on_account)
+        await manager.unsubscribe(handle)
+
+        await wait_until(lambda: len(node.requests_for("accountUnsubscribe")) == 1 and not node.subscriptions)
+        assert manager.metrics()["subscriptions"] == 0
+
+    asyncio.run(with_node(test, ack_delay=0.05))
+
+
+class FakeTransactionRepository:
+    def __init__(self, transactions: List[Any]):
+        self.transactions = transactions
+
+    async def get_pending_with_hash(self, limit: int = 5000, tx_hashes: Optional[List[str]] = None) -> List[Any]:
+        return [tx for tx in self.transactions if tx.status == TransactionStatus.PENDING][:limit]
+
+    async def bulk_update(self, updates: List[Any]) -> int:
+        for query, update in updates:
+            for tx in self.transactions:
+                if tx.id == query["_id"]:
+                    tx.status = TransactionStatus(update["$set"].get("status", tx.status))
+        return len(updates)
+
+
+class FakeTransactionService:
+    def __init__(self, transactions: List[Any]):
+        self.repository = FakeTransactionRepository(transactions)
+
+    async def update_transaction_status(self, tx_id: str, status: TransactionStatus) -> Any:
+        for tx in self.repository.transactions:
+            if str(tx.id) == tx_id:
+                tx.status = status
+                return tx
+        return None
+
+    async def invalidate_balances(self, transaction: Any) -> None:
+        pass
+
+
+class FakeRPC:
+    """Reports every signature as confirmed, as a poll after the push would see it"""
+    async def get_signature_statuses(self, signatures: List[Any], **kwargs: Any) -> List[Any]:
+        return [
+            SimpleNamespace(err=None, confirmations=1, confirmation_status=TransactionConfirmationStatus.Confirmed)
+            for _ in signatures
+        ]
+
+
+def test_watch_settles_once_when_push_and_poll_both_see_the_result():
+    async def test(node: FakeSolanaNode, manager: SubscriptionManager) -> None:
+        transaction = SimpleNamespace(
+            id="tx-1", tx_hash=SIGNATURE, status=TransactionStatus.PENDING,
+            created_at=datetime.utcnow(), confirmations=0
+        )
+        service = FakeTransactionService([transaction])
+        tracker = ConfirmationTracker(service, FakeRPC(), manager, interval=60)
+        settled: List[TransactionStatus] = []
+
+        async def on_settled(tx: Any, status: TransactionStatus) -> None:
+            settled.append(status)
+
+        await tracker.watch(transaction, on_settled)
+        await wait_until(lambda: node.subscribed("signatureSubscribe", SIGNATURE) is not None)
+        await node.notify("signatureSubscribe", SIGNATURE, {"value": {"err": None}})
+        await wait_until(lambda: settled == [TransactionStatus.CONFIRMED])
+
+        # A poll racing the push finds nothing left to settle
+        transaction.status = TransactionStatus.PENDING
+        await tracker.check_once()
+        await asyncio.sleep(0.05)
+
+        assert settled == [TransactionStatus.CONFIRMED]
+        assert manager.metrics()["subscriptions"] == 0
+
+    asyncio.run(with_node(test))
+
+
+def test_watch_reports_failed_signatures():
+    async def test(node: FakeSolanaNode, manager: SubscriptionManager) -> None:
+        transaction = SimpleNamespace(
+            id="tx-2", tx_hash=SIGNATURE, status=TransactionStatus.PENDING,
+            created_at=datetime.utcnow(), confirmations=0
+        )
+        tracker = ConfirmationTracker(FakeTransactionService([transaction]), FakeRPC(), manager, interval=60)
+        settled: List[TransactionStatus] = []
+
+        async def on_settled(tx: Any, status: TransactionStatus) -> None:
+            settled.append(status)
+
+        await tracker.watch(transaction, on_settled)
+        await wait_until(lambda: node.subscribed("signatureSubscribe", SIGNATURE) is not None)
+        await node.notify("signatureSubscribe", SIGNATURE, {"value": {"err": {"InstructionError": [0, "Custom"]}}})
+        await wait_until(lambda: settled == [TransactionStatus.FAILED])
+        assert transaction.status == TransactionStatus.FAILED
+
+    asyncio.run(with_node(test))
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+from typing import Any, List
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from bot import webhook
+import pytest
+
+SECRET = "telegram-secret"
+HEADERS = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+
+class FakeQueue:
+    def __init__(self):
+        self.items: List[Any] = []
+
+    async def put(self, item: Any) -> None:
+        self.items.append(item)
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch):
+    bot_app = SimpleNamespace(bot=None, update_queue=FakeQueue())
+    monkeypatch.setattr(webhook, "get_bot_app", lambda: bot_app)
+    monkeypatch.setattr(webhook.config, "TELEGRAM_MODE", "webhook")
+    monkeypatch.setattr(webhook.config, "TELEGRAM_WEBHOOK_SECRET", SECRET)
+    app = FastAPI()
+    app.include_router(webhook.telegram_router)
+    client = TestClient(app)
+    client.queue = bot_app.update_queue
+    return client
+
+
+def test_updates_are_queued(client: TestClient):
+    response = client.post("/telegram/webhook", json={"update_id": 7}, headers=HEADERS)
+
+    assert response.status_code == 200
+    assert [update.update_id for update in client.queue.items] == [7]
+
+
+@pytest.mark.parametrize("body", [b"not json", b"[1, 2]", b"\xff\xfe", b"{}"])
+def test_malformed_bodies_are_rejected_as_bad_requests(client: TestClient, body: bytes):
+    response = client.post("/telegram/webhook", content=body, headers=HEADERS)
+
+    assert response.status_code == 400
+    assert client.queue.items == []
+
+
+def test_wrong_secret_is_forbidden(client: TestClient):
+    response = client.post("/telegram/webhook", json={"update_id": 7}, headers={"X-Telegram-Bot-Api-Secret-Token": "nope"})
+    assert response.status_code == 403
@@ -0,0 +1,103 @@
+from typing import Any, List
+from api.models.paymentlink import WebhookStatus
+from api.services.paymentlink import PaymentLinkService
+from api.services.webhooks import PAYMENT_LINK_PAID, SIGNATURE_HEADER, WebhookDeliveryEngine, sign_payload
+from fakes import FakeMerchantServer, FakePaymentLinkRepository, make_link, wait_until
+import asyncio
+import json
+
+SECRET = "test-secret"
+
+
+async def with_engine(test, links: List[Any], merchant: FakeMerchantServer, **engine_kwargs: Any) -> None:
+    service = PaymentLinkService(FakePaymentLinkRepository(links))
+    options = {"workers": 2, "poll_interval": 0.01, "backoff_base": 0.01, "backoff_max": 0.02, "timeout": 5}
+    options.update(engine_kwargs)
+    engine = WebhookDeliveryEngine(service, signing_secret=SECRET, **options)
+    engine.start()
+    try:
+        await test(service, engine)
+    finally:
+        await engine.stop()
+        merchant.stop()
+
+
+def status_of(service: PaymentLinkService, link_id: str) -> WebhookStatus:
+    return service.repository.links[link_id].webhook_status
+
+
+def test_delivery_is_signed_with_the_shared_secret():
+    merchant = FakeMerchantServer().start()
+
+    async def test(service: PaymentLinkService, engine: WebhookDeliveryEngine) -> None:
+        await wait_until(lambda: status_of(service, "pl_1") == WebhookStatus.DELIVERED)
+        [request] = merchant.requests_for("/hook")
+        timestamp = int(request["headers"][SIGNATURE_HEADER].split(",")[0][2:])
+
+        assert request["headers"][SIGNATURE_HEADER] == sign_payload(SECRET, timestamp, request["body"])
+        payload = json.loads(request["body"])
+        assert payload["event"] == PAYMENT_LINK_PAID
+        assert payload["link_id"] == "pl_1"
+        assert payload["attempt"] == 1
+
+    asyncio.run(with_engine(test, [make_link("pl_1", merchant.url("/hook"))], merchant))
+
+
+def test_failed_deliveries_are_retried_until_accepted():
+    merchant = FakeMerchantServer().start()
+    merchant.script["/hook"] = [500, 503]
+
+    async def test(service: PaymentLinkService, engine: WebhookDeliveryEngine) -> None:
+        await wait_until(lambda: status_of(service, "pl_1") == WebhookStatus.DELIVERED)
+
+        assert [json.loads(r["body"])["attempt"] for r in merchant.requests_for("/hook")] == [1, 2, 3]
+        assert engine.retried == 2
+        assert engine.delivered == 1
+
+    asyncio.run(with_engine(test, [make_link("pl_1", merchant.url("/hook"))], merchant))
+
+
+def test_deliveries_are_dead_lettered_after_max_attempts():
+    merchant = FakeMerchantServer().start()
+    merchant.script["/hook"] = [500] * 10
+
+    async def test(service: PaymentLinkService, engine: WebhookDeliveryEngine) -> None:
+        await wait_until(lambda: status_of(service, "pl_1") == WebhookStatus.DEAD)
+        await asyncio.sleep(0.05)
+
+        assert len(merchant.requests_for("/hook")) == 3
+        assert service.repository.links["pl_1"].webhook_last_error == "HTTP 500"
+        assert engine.dead == 1
+
+    asyncio.run(with_engine(test, [make_link("pl_1", merchant.url("/hook"))], merchant, max_attempts=3))
+
+
+def test_merchant_concurrency_holds_when_workers_claim_at_once():
+    merchant = FakeMerchantServer(delay=0.05).start()
+    links = [make_link(f"pl_{i}", merchant.url("/busy")) for i in range(6)]
+    links.append(make_link("pl_other", merchant.url("/other"), merchant="merchant-2"))
+
+    async def test(service: PaymentLinkService, engine: WebhookDeliveryEngine) -> None:
+        await wait_until(lambda: all(
+            link.webhook_status == WebhookStatus.DELIVERED for link in service.repository.links.values()
+        ))
+
+        assert merchant.max_in_flight["/busy"] <= 2
+        assert len(merchant.requests_for("/busy")) == 6
+        assert all(json.loads(r["body"])["attempt"] == 1 for r in merchant.requests_for("/busy"))
+
+    asyncio.run(with_engine(test, links, merchant, workers=6, merchant_concurrency=2))
+
+
+def test_paying_a_link_wakes_idle_workers():
+    merchant = FakeMerchantServer().start()
+
+    async def test(service: PaymentLinkService, engine: WebhookDeliveryEngine) -> None:
+        # Let the workers find the queue empty and go to sleep
+        await asyncio.sleep(0.05)
+        await service.process_payment_confirmation("pl_1", "sig", "payer")
+
+        await wait_until(lambda: status_of(service, "pl_1") == WebhookStatus.DELIVERED, timeout=2)
+
+    link = make_link("pl_1", merchant.url("/hook"), paid=False)
+    asyncio.run(with_engine(test, [link], merchant, poll_interval=30))